@@ -0,0 +1,4 @@
+"""
+Benchmarks of msimunitgen.py and msim_unittest.py, and generators of the
+synthetic unit test files and transcripts they run on.
+"""
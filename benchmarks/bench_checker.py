@@ -0,0 +1,50 @@
+"""
+Benchmark the throughput and peak memory of msim_unittest.py on a synthetic
+transcript. Usage: python bench_checker.py [size in MB, default 1024]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import msim_unittest
+
+ASSERTION = 'run 4ns\necho "assert 1010 case_{0:d}"\n# assert 1010 case_{0:d}\n# St1\n# St0\n# St1\n# St{1:d}\n'
+
+
+def write_transcript(filename, size):
+    """
+    Write a synthetic transcript of roughly size bytes, where one in every
+    thousand assertions fails.
+    """
+    written = 0
+    i = 0
+    with open(filename, 'w') as out:
+        while written < size:
+            chunk = ''.join(ASSERTION.format(i + j, 1 if (i + j) % 1000 == 999 else 0) for j in range(10000))
+            out.write(chunk)
+            written += len(chunk)
+            i += 10000
+    return i
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    filename = os.path.join(tempfile.mkdtemp(), 'transcript.txt')
+    num_asserts = write_transcript(filename, size * 1000000)
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    checker = msim_unittest.check_transcript(filename)
+    elapsed = time.perf_counter() - start
+    sys.stdout = sys.__stdout__
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    msim_unittest.print_summary(checker, elapsed)
+    print('{0:d} assertions, peak RSS {1:.1f} MiB ({2:.1f} MiB while checking)'.format(
+        num_asserts, peak / 1024.0, (peak - baseline) / 1024.0))
+    os.remove(filename)
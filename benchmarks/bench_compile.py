@@ -0,0 +1,34 @@
+"""
+Benchmark the compile time of msimunitgen.py on synthetic unit test files with
+an increasing number of test blocks. The time per test should stay constant.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import msimunitgen
+from benchmarks import synthetic
+
+
+def compile_lines(lines):
+    """
+    Compile the test blocks of a file into .do lines, without writing them.
+    """
+    metablock, tests = msimunitgen.parse(msimunitgen.tokenize(lines))
+    settings = msimunitgen.Settings()
+    out_lines = []
+    for test in tests:
+        out_lines += msimunitgen.emit_commands(msimunitgen.expand_body(test.body, {}, test.name, settings), settings)
+    return out_lines
+
+
+if __name__ == '__main__':
+    print('{0:>8s} {1:>10s} {2:>10s} {3:>14s}'.format('tests', 'lines', 'seconds', 'us per test'))
+    for num_tests in [1000, 2000, 4000, 8000]:
+        lines = synthetic.test_file(num_tests, permute_width=3, for_depth=1)
+        start = time.perf_counter()
+        out_lines = compile_lines(lines)
+        elapsed = time.perf_counter() - start
+        print('{0:8d} {1:10d} {2:10.3f} {3:14.1f}'.format(num_tests, len(out_lines), elapsed, elapsed / num_tests * 1e6))
@@ -0,0 +1,42 @@
+"""
+Benchmark the peak memory of msimunitgen.py while generating a .do file for
+increasingly wide permute blocks. The peak should not grow with the width.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import msimunitgen
+
+PERMUTE_FILE = """meta {{
+    vfile = bench.v;
+    vmodule = bench;
+    genfile = {0:s};
+}}
+test wide_permute {{
+    SELECT[1:0] = 0;
+    permute {{
+        ARBITRARY[{1:d}:0] = *;
+        assert OUTPUT == 1;
+    }}
+}}
+"""
+
+
+if __name__ == '__main__':
+    genfile = os.path.join(tempfile.mkdtemp(), 'bench.do')
+    print('{0:>6s} {1:>12s} {2:>10s} {3:>12s}'.format('width', 'bytes', 'seconds', 'peak KiB'))
+    for width in [8, 10, 12, 14, 16]:
+        lines = PERMUTE_FILE.format(genfile, width - 1).splitlines(True)
+        tracemalloc.start()
+        start = time.perf_counter()
+        msimunitgen.compile(lines)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('{0:6d} {1:12d} {2:10.3f} {3:12.1f}'.format(width, os.path.getsize(genfile), elapsed, peak / 1024.0))
+    os.remove(genfile)
@@ -0,0 +1,220 @@
+"""
+Run the benchmark suite of msimunitgen.py and msim_unittest.py, measuring the
+compile time, peak memory, output size and simulator commands of synthetic unit
+test files (with and without optimize), and the throughput of the checker on
+their transcripts.
+
+Times are divided by the time of a fixed calibration workload, so that results
+from different machines (or from a machine whose speed varies) can be compared. With --check, the results are compared
+with a baseline file and the exit status is 1 if any of them regressed by more
+than the tolerance. Times are noisier than sizes, and have a tolerance of their own. With --update, the baseline file is rewritten.
+
+Usage: python benchmarks/run.py [--check | --update] [--baseline FILE] [--tolerance T] [--time-tolerance T]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import msimunitgen
+import msim_unittest
+from benchmarks import synthetic
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Benchmark cases, each scaling one dimension of the synthetic test file
+COMPILE_CASES = {
+    'tests_500': dict(num_tests=500),
+    'tests_2000': dict(num_tests=2000),
+    'permute_12': dict(permute_width=12),
+    'permute_15': dict(permute_width=15),
+    'for_depth_3': dict(num_tests=16, for_depth=3),
+    'for_depth_5': dict(num_tests=4, for_depth=5),
+    'bus_64': dict(num_tests=500, bus_width=64),
+    'bus_1024': dict(num_tests=100, bus_width=1024),
+}
+# Cases compiled with optimize, whose commands can be compared with the cases above
+OPTIMIZE_CASES = {
+    'optimize_tests_2000': dict(num_tests=2000),
+    'optimize_permute_12': dict(permute_width=12),
+    'optimize_for_depth_3': dict(num_tests=16, for_depth=3),
+}
+CHECKER_CASES = {
+    'checker_tests_2000': dict(num_tests=2000, for_depth=2),
+    'checker_permute_14': dict(permute_width=14),
+}
+REPEATS = 5
+
+
+def calibrate():
+    """
+    Return the time of a fixed pure Python workload, by which the measured
+    times are divided.
+    """
+    start = time.perf_counter()
+    parts = {}
+    for i in range(50000):
+        key = format(i & 0xFFF, 'b')
+        parts[key] = parts.get(key, '')[:8] + key[-1:]
+    return time.perf_counter() - start
+
+
+def best_time(function):
+    """
+    Run function several times, returning the fastest time relative to the
+    calibration time measured just before it, and that time in seconds. The
+    speed of the machine can change during the suite, so each run is
+    calibrated separately.
+    """
+    best = None
+    for _ in range(REPEATS):
+        calibration = calibrate()
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed / calibration < best[0]:
+            best = (elapsed / calibration, elapsed)
+    return best
+
+
+def compile_file(lines, genfile, options=None):
+    """
+    Generate a .do file from the lines of a unit test file.
+    """
+    result = msimunitgen.compile(lines, dict(options or {}, genfile=genfile, logfile=genfile + '.log'))
+    if not result.success:
+        raise RuntimeError('the synthetic unit test file could not be compiled: ' + '\n'.join(result.messages))
+
+
+def count_commands(genfile):
+    """
+    Return the number of force, run and examine commands of a .do file.
+    """
+    with open(genfile, 'r') as do_file:
+        return sum(1 for line in do_file if line.startswith(('force ', 'run ', 'examine ')))
+
+
+def measure_compile(lines, genfile, options=None):
+    """
+    Return the compile time (fastest of several runs), peak memory, output
+    size and number of simulator commands of a unit test file.
+    """
+    relative, seconds = best_time(lambda: compile_file(lines, genfile, options))
+
+    # Memory is traced in a separate run, since tracing slows everything down
+    tracemalloc.start()
+    compile_file(lines, genfile, options)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'compile_relative': relative, 'compile_seconds': seconds, 'compile_peak_kib': peak / 1024.0,
+            'output_bytes': os.path.getsize(genfile), 'commands': count_commands(genfile)}
+
+
+def measure_checker(lines, genfile):
+    """
+    Return the checking time (fastest of several runs) and peak memory of the
+    transcript of a unit test file.
+    """
+    compile_file(lines, genfile)
+    transcript = genfile + '.txt'
+    with open(genfile, 'r') as do_file, open(transcript, 'w') as out:
+        out.writelines(synthetic.transcript_lines(do_file, fail_every=1000))
+
+    relative, seconds = best_time(lambda: msim_unittest.scan_transcript(
+        transcript, msim_unittest.TranscriptChecker(report=lambda message: None)))
+    size = os.path.getsize(transcript)
+
+    tracemalloc.start()
+    msim_unittest.scan_transcript(transcript, msim_unittest.TranscriptChecker(report=lambda message: None))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'checker_relative': relative, 'checker_seconds': seconds, 'checker_peak_kib': peak / 1024.0, 'transcript_bytes': size,
+            'checker_mb_per_second': size / 1e6 / max(seconds, 1e-9)}
+
+
+def run_suite():
+    """
+    Run every benchmark case, returning the results as a dict.
+    """
+    results = {'cases': {}}
+    directory = tempfile.mkdtemp()
+    genfile = os.path.join(directory, 'bench.do')
+    for name, parameters in sorted(COMPILE_CASES.items()):
+        results['cases'][name] = measure_compile(synthetic.test_file(**parameters), genfile)
+        print_case(name, results['cases'][name])
+    for name, parameters in sorted(OPTIMIZE_CASES.items()):
+        results['cases'][name] = measure_compile(synthetic.test_file(**parameters), genfile, {'optimize': '1'})
+        print_case(name, results['cases'][name])
+    for name, parameters in sorted(CHECKER_CASES.items()):
+        results['cases'][name] = measure_checker(synthetic.test_file(**parameters), genfile)
+        print_case(name, results['cases'][name])
+    for filename in os.listdir(directory):
+        os.remove(os.path.join(directory, filename))
+    os.rmdir(directory)
+    return results
+
+
+def print_case(name, metrics):
+    """
+    Print the results of a benchmark case.
+    """
+    print('{0:20s} '.format(name) + ', '.join('{0:s} {1:.4g}'.format(metric, value) for metric, value in sorted(metrics.items())))
+
+
+def find_regressions(results, baseline, tolerance, time_tolerance):
+    """
+    Return descriptions of the results which are worse than the baseline by
+    more than the tolerance (a fraction), or the time tolerance for times.
+    Every compared metric is better when lower. Times are only compared
+    relative to the calibration, their values in seconds (and throughputs)
+    being kept for reference.
+    """
+    regressions = []
+    for name, base_metrics in sorted(baseline['cases'].items()):
+        metrics = results['cases'].get(name)
+        if metrics is None:
+            continue
+        for metric, base_value in sorted(base_metrics.items()):
+            if metric.endswith('_seconds') or metric.endswith('_per_second') or metric not in metrics:
+                continue
+            value = metrics[metric]
+            allowed = time_tolerance if metric.endswith('_relative') else tolerance
+            if value > base_value * (1 + allowed):
+                regressions.append('{0:s} {1:s}: {2:.4g} against a baseline of {3:.4g} ({4:+.1f}%)'.format(
+                    name, metric, value, base_value, 100.0 * (value / base_value - 1)))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark msimunitgen.py and msim_unittest.py on synthetic unit test files.')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--check', action='store_true', help='exit with status 1 if any result regressed from the baseline')
+    group.add_argument('--update', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='the baseline file (defaults to benchmarks/baseline.json)')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='the allowed regression of memory and output sizes, as a fraction (defaults to 0.1)')
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help='the allowed regression of times, as a fraction (defaults to 0.5)')
+    args = parser.parse_args()
+
+    results = run_suite()
+
+    if args.update:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print('Baseline written to ' + args.baseline)
+    elif args.check:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance, args.time_tolerance)
+        for regression in regressions:
+            print('Regression - ' + regression)
+        if regressions:
+            sys.exit(1)
+        print('No regressions from ' + args.baseline)
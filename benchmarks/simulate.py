@@ -0,0 +1,46 @@
+"""
+A stand-in for ModelSim which writes the transcript of an unrolled .do file
+gradually, as a running simulation would, so that following a transcript
+(and stopping the simulation after a number of failures) can be tried
+without a simulator. Every assertion passes, except one in every
+--fail-every assertions.
+
+Usage: python benchmarks/simulate.py DOFILE LOGFILE [--fail-every N] [--lines-per-second N]
+
+For example, to follow a transcript and stop after 3 failures:
+
+    python msim_unittest.py out.txt --max-failures 3 --sim "python benchmarks/simulate.py out.do out.txt --fail-every 10"
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmarks import synthetic
+
+# Lines written between pauses
+BATCH = 100
+
+
+def simulate(dofile, logfile, fail_every=0, lines_per_second=10000):
+    """
+    Write the transcript of dofile to logfile at about lines_per_second.
+    """
+    with open(dofile, 'r') as do_lines, open(logfile, 'w') as transcript:
+        for number, line in enumerate(synthetic.transcript_lines(do_lines, fail_every), 1):
+            transcript.write(line)
+            if number % BATCH == 0:
+                transcript.flush()
+                time.sleep(float(BATCH) / lines_per_second)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write the transcript of an unrolled .do file as a simulation would.')
+    parser.add_argument('dofile', help='the .do file to simulate')
+    parser.add_argument('logfile', help='the transcript to write')
+    parser.add_argument('--fail-every', type=int, default=0, help='fail one in every N assertions (default: none fail)')
+    parser.add_argument('--lines-per-second', type=float, default=10000, help='the rate at which lines are written (default: %(default)s)')
+    args = parser.parse_args()
+    simulate(args.dofile, args.logfile, args.fail_every, args.lines_per_second)
@@ -0,0 +1,180 @@
+"""
+A stand-in for vsim which runs a generated .do file without a design: forced
+signals keep their value until a restart and any other examined signal reads
+as 0. Tcl procedures are not run. The SystemVerilog testbench compiled by the
+.do file is interpreted in the same way when it is run. The transcript is
+written to the logfile named by the .do file's vsim command.
+Usage: python stub_vsim.py <dofile>
+"""
+
+import re
+import sys
+
+FORCE = re.compile(r'^force \{(.+?)\} (\S+)')
+EXAMINE = re.compile(r'\{(.+?)\}')
+SLICE = re.compile(r'^(\w+)\[(\d+):(\d+)\]$')
+SIZED = re.compile(r'^(\d+)\'([bh])(\w+)$')
+TIMESCALE = re.compile(r'-timescale (\d+)(\w+)/')
+
+# Statements of the testbench's tasks and initial block
+SV_TASK = re.compile(r'^task automatic (\w+)\(\);')
+SV_CALL = re.compile(r'^(\w+)\(\);$')
+SV_DONE = re.compile(r'^`msim_done\("(.*)"\)$')
+SV_FORCE = re.compile(r'^force dut\.(\S+) = (\S+);$')
+SV_DELAY = re.compile(r'^#(\d+)(\w*);$')
+SV_CHECK = re.compile(r'^`msim_check\("(.*)", (\S+), \{?(.+?)\}?\)$')
+SV_DISPLAY = re.compile(r'^\$display\("(.*)"\);$')
+FEMTOSECONDS = {'fs': 1, 'ps': 10 ** 3, 'ns': 10 ** 6, 'us': 10 ** 9, 'ms': 10 ** 12, 's': 10 ** 15}
+
+
+def slice_bits(signal):
+    """
+    Return the per-bit signals of a slice such as SW[7:0], or None.
+    """
+    match = SLICE.match(signal)
+    if match is None:
+        return None
+    first, last = int(match.group(2)), int(match.group(3))
+    step = -1 if first > last else 1
+    return ['{0:s}[{1:d}]'.format(match.group(1), i) for i in range(first, last + step, step)]
+
+
+def sized_bits(value):
+    """
+    Return the bits of a sized literal such as 4'hA, or the value unchanged.
+    """
+    sized = SIZED.match(value)
+    if sized is None:
+        return value
+    width = int(sized.group(1))
+    return format(int(sized.group(3), 2 if sized.group(2) == 'b' else 16), '0{0:d}b'.format(width))[-width:]
+
+
+def force(values, signal, value):
+    """
+    Force a signal, or each bit of a slice, to a value.
+    """
+    value = sized_bits(value)
+    bits = slice_bits(signal)
+    if bits is None:
+        values[signal] = value
+    else:
+        values.update(zip(bits, value))
+
+
+def signal_bits(values, signal):
+    """
+    Return the bits of a signal, or of each bit of a slice.
+    """
+    bits = slice_bits(signal)
+    if bits is None:
+        return values.get(signal, '0')
+    return ''.join(values.get(bit, '0') for bit in bits)
+
+
+def run_testbench(testbench, unit, transcript):
+    """
+    Run the tasks of a testbench in the order of its initial block, writing
+    its failures and results to the transcript as $display would.
+    """
+    tasks = {}
+    initial = []
+    task = None
+    with open(testbench, 'r') as statements:
+        for statement in statements:
+            statement = statement.strip()
+            match = SV_TASK.match(statement)
+            if match is not None:
+                task = tasks[match.group(1)] = []
+            elif statement == 'endtask':
+                task = None
+            elif task is not None:
+                task.append(statement)
+            elif SV_CALL.match(statement) or SV_DONE.match(statement):
+                initial.append(statement)
+
+    values = {}
+    time = tests = failed = 0
+    for call in initial:
+        match = SV_DONE.match(call)
+        if match is not None:
+            transcript.write('# msim_done {0:d} {1:d} {2:s}\n'.format(tests - failed, time, match.group(1)))
+            tests = failed = 0
+            continue
+        for statement in tasks[SV_CALL.match(call).group(1)]:
+            match = SV_FORCE.match(statement)
+            if match is not None:
+                force(values, match.group(1), match.group(2))
+                continue
+            match = SV_DELAY.match(statement)
+            if match is not None:
+                time += int(match.group(1)) * (FEMTOSECONDS[match.group(2)] if match.group(2) else unit)
+                continue
+            match = SV_CHECK.match(statement)
+            if match is not None:
+                expected = sized_bits(match.group(2))
+                actual = ''.join(signal_bits(values, signal[4:]) for signal in match.group(3).split(', '))
+                tests += 1
+                if actual != expected:
+                    failed += 1
+                    transcript.write('# msim_fail {0:s} {1:s} {2:d} {3:s}\n'.format(expected, actual, time, match.group(1)))
+                continue
+            match = SV_DISPLAY.match(statement)
+            if match is not None:
+                transcript.write('# ' + re.sub(r'\\(.)', r'\1', match.group(1)).replace('%%', '%') + '\n')
+
+
+def simulate(dofile):
+    """
+    Interpret the force, restart, echo and examine commands of a .do file,
+    and the testbench it runs with "run -all".
+    """
+    values = {}
+    transcript = None
+    testbench = None
+    depth = 0
+    with open(dofile, 'r') as commands:
+        for command in commands:
+            command = command.strip()
+            if command.startswith('vlog -sv '):
+                timescale = TIMESCALE.search(command)
+                unit = int(timescale.group(1)) * FEMTOSECONDS[timescale.group(2)] if timescale else FEMTOSECONDS['ns']
+                testbench = command.split()[-1]
+            if command.startswith('vsim '):
+                transcript = open(command.split(' -l ')[1].split()[0], 'w')
+                continue
+            if transcript is None:
+                continue
+
+            transcript.write(command + '\n')
+            if depth > 0 or command.startswith('proc '):
+                # Procedures are only run by Tcl loops, which are not interpreted
+                depth += command.count('{') - command.count('}')
+                continue
+            match = FORCE.match(command)
+            if match is not None:
+                force(values, match.group(1), match.group(2))
+            elif command == 'restart' or command.startswith('restart '):
+                values.clear()
+            elif command == 'run -all' and testbench is not None:
+                run_testbench(testbench, unit, transcript)
+            elif command.startswith('echo '):
+                transcript.write('# ' + command[5:].strip('"') + '\n')
+            elif command.startswith('examine '):
+                results = []
+                for signal in EXAMINE.findall(command):
+                    bits = signal_bits(values, signal)
+                    if slice_bits(signal) is None:
+                        results.append('St' + bits)
+                    elif ' -radix hex ' in command:
+                        results.append('{0:0{1:d}X}'.format(int(bits, 2), (len(bits) + 3) // 4))
+                    else:
+                        results.append(bits)
+                transcript.write('# ' + ' '.join(results) + '\n')
+
+    if transcript is not None:
+        transcript.close()
+
+
+if __name__ == '__main__':
+    simulate(sys.argv[1])
@@ -0,0 +1,110 @@
+"""
+Generators of synthetic unit test files, and of the transcripts which ModelSim
+would write when running the .do files generated from them.
+"""
+
+import re
+
+META_BLOCK = """meta {
+    vfile = bench.v;
+    vmodule = bench;
+}
+"""
+
+ECHO = re.compile(r'^echo "assert (\S+)')
+EXAMINE_SLICE = re.compile(r'\[(-?\d+):(-?\d+)\]\}$')
+
+
+def for_blocks(depth, bus_width, indent):
+    """
+    Return the lines of for blocks nested depth times, each looping over four
+    values, around an assignment and an assertion of a bus.
+    """
+    if depth == 0:
+        return []
+    lines = []
+    for level in range(depth):
+        lines.append('{0:s}for i{1:d} in [0:3] {{'.format(indent * (level + 1), level))
+    total = ' + '.join('i{0:d}'.format(level) for level in range(depth))
+    inner = indent * (depth + 1)
+    lines.append('{0:s}DATA[{1:d}:0] = bin({2:s}, {3:d});'.format(inner, bus_width - 1, total, bus_width))
+    lines.append('{0:s}assert RESULT[{1:d}:0] == bin({2:s}, {3:d});'.format(inner, bus_width - 1, total, bus_width))
+    for level in reversed(range(depth)):
+        lines.append(indent * (level + 1) + '}')
+    return lines
+
+
+def test_block(number, permute_width=0, for_depth=0, bus_width=8):
+    """
+    Return the text of a test block. Each of its parameters scales a different
+    part of the generator: the width of a permute block, the nesting depth of
+    for blocks and the width of the assigned and asserted buses.
+    """
+    indent = '    '
+    lines = ['test case_{0:d} {{'.format(number),
+             indent + 'SELECT[1:0] = bin({0:d}, 2);'.format(number % 4),
+             indent + 'INPUT[{0:d}:0] = bin({1:d}, {2:d});'.format(bus_width - 1, number % 256, bus_width),
+             indent + 'assert OUTPUT[{0:d}:0] == bin({1:d}, {2:d});'.format(bus_width - 1, number % 256, bus_width)]
+    lines += for_blocks(for_depth, bus_width, indent)
+    if permute_width > 0:
+        lines += [indent + 'permute {',
+                  indent * 2 + 'ARBITRARY[{0:d}:0] = *;'.format(permute_width - 1),
+                  indent * 2 + 'assert VALID == 1;',
+                  indent + '}']
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def test_file(num_tests=1, permute_width=0, for_depth=0, bus_width=8):
+    """
+    Return the lines of a unit test file with num_tests test blocks.
+    """
+    text = META_BLOCK + ''.join(test_block(i, permute_width, for_depth, bus_width) for i in range(num_tests))
+    return text.splitlines(True)
+
+
+def examine_width(command):
+    """
+    Return the number of bits printed by an examine command of a .do file.
+    """
+    match = EXAMINE_SLICE.search(command)
+    if match is None:
+        return 1
+    return abs(int(match.group(1)) - int(match.group(2))) + 1
+
+
+def transcript_lines(do_lines, fail_every=0):
+    """
+    Generate the transcript of an unrolled .do file run against a design which
+    passes every assertion, except one in every fail_every assertions (if not
+    zero) whose last examined digit is changed. Commands are echoed as ModelSim
+    does, per-bit examines print a signal strength, and examines in hexadecimal
+    print the digits of the echoed literal.
+    """
+    expected = ''
+    position = 0
+    num_asserts = 0
+    for line in do_lines:
+        if line.startswith('examine'):
+            yield line
+            width = len(expected) if ' -radix hex ' in line else examine_width(line.rstrip())
+            bits = expected[position:position + width]
+            position += width
+            if position >= len(expected) and fail_every and num_asserts % fail_every == 0:
+                bits = bits[:-1] + ('0' if bits[-1:] == '1' else '1')
+            if ':' in line:
+                yield '# ' + bits + '\n'
+            else:
+                yield '# St' + bits + '\n'
+        elif line.startswith('echo'):
+            yield line
+            match = ECHO.match(line)
+            if match is not None:
+                yield '# ' + line[6:].rstrip().rstrip('"') + '\n'
+                expected = match.group(1)
+                if "'" in expected:
+                    expected = expected[expected.index("'") + 2:]
+                position = 0
+                num_asserts += 1
+        elif line.strip() != '':
+            yield line
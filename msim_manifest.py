@@ -0,0 +1,68 @@
+"""
+Reads and writes the manifests of expected values which msimunitgen.py writes next to a .do file, so that
+assertions do not have to be echoed into the transcript. A manifest is MAGIC followed by test and assertion records.
+"""
+
+import os
+import struct
+
+MAGIC = b'MSIMMAN1'
+
+# Records start with their kind, followed by the length of the test name or the number of expected bits
+TEST = b'T'
+ASSERTION = b'A'
+HEX_ASSERTION = b'H'
+TEST_LENGTH = struct.Struct('<H')
+ASSERTION_WIDTH = struct.Struct('<I')
+
+
+def manifest_filename(genfile):
+    """
+    Return the name of the manifest of a .do file, e.g. out.do -> out.manifest
+    """
+    return os.path.splitext(genfile)[0] + '.manifest'
+
+
+def test_record(name):
+    """
+    Encode the record which starts the assertions of a test block.
+    """
+    encoded = name.encode()
+    return TEST + TEST_LENGTH.pack(len(encoded)) + encoded
+
+
+def assertion_record(value, width, hexadecimal=False):
+    """
+    Encode the expected value of an assertion, of width bits packed eight to
+    a byte. The value of an assertion examined in hexadecimal is read back as
+    hexadecimal digits.
+    """
+    return (HEX_ASSERTION if hexadecimal else ASSERTION) + ASSERTION_WIDTH.pack(width) + value.to_bytes((width + 7) // 8, 'big')
+
+
+def read_manifest(filename):
+    """
+    Generate the (expected digits, test name) of each assertion of a manifest,
+    in order. The digits are binary, or hexadecimal for assertions examined in
+    hexadecimal.
+    """
+    test_name = ''
+    with open(filename, 'rb') as manifest:
+        if manifest.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{0:s} is not a manifest of expected values'.format(filename))
+        while True:
+            kind = manifest.read(1)
+            if kind == ASSERTION or kind == HEX_ASSERTION:
+                width = ASSERTION_WIDTH.unpack(manifest.read(ASSERTION_WIDTH.size))[0]
+                value = int.from_bytes(manifest.read((width + 7) // 8), 'big')
+                if kind == HEX_ASSERTION:
+                    yield format(value, '0{0:d}X'.format((width + 3) // 4)), test_name
+                else:
+                    yield format(value, '0{0:d}b'.format(width)), test_name
+            elif kind == TEST:
+                length = TEST_LENGTH.unpack(manifest.read(TEST_LENGTH.size))[0]
+                test_name = manifest.read(length).decode()
+            elif kind == b'':
+                return
+            else:
+                raise ValueError('{0:s} is corrupt'.format(filename))
@@ -0,0 +1,138 @@
+"""
+Writes the results of checked transcripts in formats which other tools can read. JSON lines are written as they
+are found, so that a dashboard can read them while the simulation runs: a failure record for each failed assertion,
+a test record as each test block ends, and a transcript record once a transcript has been checked. A JUnit XML
+report is written once every transcript has been checked, with a test suite for each transcript and a test case
+for each test block.
+
+Simulation times are the offsets from the start of the simulation, in nanoseconds. The time of a test block runs
+from the assertion before its first one to its last one (or to its end, for SystemVerilog testbenches).
+"""
+
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+
+FEMTOSECONDS_PER_NS = 10 ** 6
+FEMTOSECONDS_PER_SECOND = 10 ** 15
+
+
+def nanoseconds(time):
+    """
+    Return a simulation time of the checker, in femtoseconds, in nanoseconds.
+    """
+    return time / float(FEMTOSECONDS_PER_NS)
+
+
+def seconds(time):
+    """
+    Format a simulation time of the checker as a number of seconds, without an exponent.
+    """
+    return '{0:.15f}'.format(time / float(FEMTOSECONDS_PER_SECOND)).rstrip('0').rstrip('.')
+
+
+class JsonLinesWriter(object):
+    """
+    Writes the results of transcripts to a stream of JSON objects, one per line.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        """
+        Write a record, flushing it so that it can be read at once.
+        """
+        self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
+
+    def failure(self, transcript, failure):
+        """
+        Write the record of a failed assertion as soon as it is found.
+        """
+        self.write({'type': 'failure', 'transcript': transcript, 'test': failure.test, 'line': failure.line,
+                    'expected': failure.expected, 'actual': failure.actual, 'time_ns': nanoseconds(failure.time)})
+
+    def test(self, transcript, block):
+        """
+        Write the record of a test block once it has ended.
+        """
+        self.write({'type': 'test', 'transcript': transcript, 'test': block.test, 'passed': block.tests - block.failed,
+                    'failed': block.failed, 'start_ns': nanoseconds(block.start), 'end_ns': nanoseconds(block.end)})
+
+    def transcript(self, transcript, checker):
+        """
+        Write the totals of a checked transcript.
+        """
+        self.write({'type': 'transcript', 'transcript': transcript, 'tests': checker.num_tests, 'failed': checker.num_failed,
+                    'time_ns': nanoseconds(checker.time), 'lines': checker.num_lines, 'bytes': checker.num_bytes})
+
+    def close(self):
+        self.stream.close()
+
+
+class JUnitWriter(object):
+    """
+    Collects the results of transcripts into a JUnit XML report, which is written to filename on close.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.root = ElementTree.Element('testsuites')
+        self.failures = {}
+        self.blocks = {}
+
+    def failure(self, transcript, failure):
+        """
+        Keep a failed assertion until its transcript has been checked.
+        """
+        self.failures.setdefault(failure.test, []).append(failure)
+
+    def test(self, transcript, block):
+        """
+        Keep the results of a test block until its transcript has been checked, adding up blocks of the same name.
+        """
+        kept = self.blocks.get(block.test)
+        if kept is not None:
+            block = block._replace(tests=kept.tests + block.tests, failed=kept.failed + block.failed,
+                                   start=min(kept.start, block.start), end=max(kept.end, block.end))
+        self.blocks[block.test] = block
+
+    def transcript(self, transcript, checker):
+        """
+        Add the test suite of a checked transcript, with a test case for each test block. A failed test case
+        lists each of its failed assertions.
+        """
+        classname = os.path.splitext(os.path.basename(transcript))[0]
+        suite = ElementTree.SubElement(self.root, 'testsuite', name=transcript, tests=str(len(self.blocks)),
+                                       failures=str(sum(1 for block in self.blocks.values() if block.failed)),
+                                       errors='0', time=seconds(checker.time))
+        for name, tests, failed, start, end in sorted(self.blocks.values()):
+            case = ElementTree.SubElement(suite, 'testcase', name=name or '(unnamed)', classname=classname,
+                                          assertions=str(tests), time=seconds(end - start))
+            if failed:
+                element = ElementTree.SubElement(case, 'failure', type='AssertionError',
+                                                 message='{0:d} of {1:d} assertions failed'.format(failed, tests))
+                element.text = '\n'.join('Line {0:d} at {1:g}ns: Expected {2:s}, Actual: {3:s}'.format(
+                    failure.line, nanoseconds(failure.time), failure.expected, failure.actual or 'nothing')
+                    for failure in self.failures.get(name, []))
+        self.failures = {}
+        self.blocks = {}
+
+    def close(self):
+        suites = list(self.root)
+        self.root.set('tests', str(sum(int(suite.get('tests')) for suite in suites)))
+        self.root.set('failures', str(sum(int(suite.get('failures')) for suite in suites)))
+        ElementTree.ElementTree(self.root).write(self.filename, encoding='utf-8', xml_declaration=True)
+
+
+def open_writers(json_filename=None, junit_filename=None):
+    """
+    Return the writers of the results requested on the command line.
+    """
+    writers = []
+    if json_filename is not None:
+        writers.append(JsonLinesWriter(open(json_filename, 'w')))
+    if junit_filename is not None:
+        writers.append(JUnitWriter(junit_filename))
+    return writers
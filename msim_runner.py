@@ -0,0 +1,129 @@
+"""
+Runs the shards of a unit test file across a pool of simulator processes, and merges their results.
+The simulator command is a template which is formatted with the {dofile} and {logfile} of each shard.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import msimunitgen
+import msim_manifest
+import msim_results
+import msim_unittest
+
+DEFAULT_SIMULATOR = 'vsim -c -do "do {dofile}; quit -f"'
+
+
+def run_shard(simulator, dofile, logfile, manifest=False, max_failures=0):
+    """
+    Simulate a single shard, checking its transcript as it is written,
+    against the manifest of the shard if manifest is set. The simulator is
+    stopped once max_failures assertions have failed (if not zero). Returns
+    the simulator's return code, whether it was stopped, the checker, the
+    failures it reported and recorded, and its test blocks.
+    """
+    if os.path.exists(logfile):
+        os.remove(logfile)
+    process = msim_unittest.start_simulator(simulator.format(dofile=dofile, logfile=logfile))
+
+    messages = []
+    failures = []
+    blocks = []
+    expected = msim_manifest.read_manifest(msim_manifest.manifest_filename(dofile)) if manifest else None
+    checker = msim_unittest.TranscriptChecker(report=messages.append, manifest=expected, record=failures.append,
+                                             results=blocks.append)
+    stopped = False
+    try:
+        checker, stopped = msim_unittest.follow_transcript(logfile, checker, lambda: process.poll() is None,
+                                                           lambda: msim_unittest.stop_simulator(process), max_failures)
+    except FileNotFoundError as e:
+        messages.append('Missing transcript {0:s}: {1:s}'.format(logfile, e.strerror))
+    returncode = process.wait()
+    checker.report = checker.manifest = checker.record = checker.results = None
+    return returncode, stopped, checker, messages, failures, blocks
+
+
+def run_shards(files, simulator=DEFAULT_SIMULATOR, jobs=None, manifest=False, max_failures=0, writers=()):
+    """
+    Simulate the (.do file, logfile) shards across a process pool, printing
+    the failures of each shard, and passing the results of each to the
+    writers of msim_results. If manifest is set, the .do files were
+    generated with manifests of expected values. Each shard is stopped after
+    max_failures failures (if not zero). Returns a checker holding the merged counts,
+    and whether every simulator run succeeded.
+    """
+    merged = msim_unittest.TranscriptChecker()
+    succeeded = True
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_shard, simulator, dofile, logfile, manifest, max_failures) for dofile, logfile in files]
+        for (dofile, logfile), future in zip(files, futures):
+            returncode, stopped, checker, messages, failures, blocks = future.result()
+            if stopped:
+                print('{0:s}: simulation stopped after {1:d} failures'.format(dofile, checker.num_failed))
+            elif returncode != 0:
+                succeeded = False
+                print('{0:s}: simulator exited with code {1:d}'.format(dofile, returncode))
+            for message in messages:
+                print('{0:s}: {1:s}'.format(logfile, message))
+            for writer in writers:
+                for failure in failures:
+                    writer.failure(logfile, failure)
+                for block in blocks:
+                    writer.test(logfile, block)
+                writer.transcript(logfile, checker)
+            merged.num_tests += checker.num_tests
+            merged.num_failed += checker.num_failed
+            merged.num_lines += checker.num_lines
+            merged.num_bytes += checker.num_bytes
+    return merged, succeeded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate, simulate and check a unit test file in parallel shards.')
+    parser.add_argument('filename', help='the unit test file')
+    parser.add_argument('--shards', type=int, default=os.cpu_count(), help='number of .do files to split the tests into (default: number of cores)')
+    parser.add_argument('--jobs', type=int, default=None, help='number of simulators to run at once (default: number of cores)')
+    parser.add_argument('--sim', default=DEFAULT_SIMULATOR, help='simulator command template (default: %(default)s)')
+    parser.add_argument('--manifest', action='store_true', help='check the transcripts against manifests of expected values instead of echoed assertions')
+    parser.add_argument('--backend', choices=msimunitgen.BACKENDS, help='run the tests from .do files (do) or SystemVerilog testbenches (sv)')
+    parser.add_argument('--optimize', action='store_true', help='generate optimized .do files, see msimunitgen.py --optimize')
+    parser.add_argument('--max-failures', type=int, default=0, help='stop the simulation of a shard after this many failures (default: never)')
+    parser.add_argument('--json', help='write the results as JSON lines to this file, as each shard finishes')
+    parser.add_argument('--junit', help='write the results as a JUnit XML report to this file')
+    parser.add_argument('--watch', action='store_true', help='keep running, and generate, simulate and check the tests again whenever the unit test file or the Verilog files change')
+    args = parser.parse_args()
+
+    options = {'shards': str(args.shards)}
+    if args.manifest:
+        options['manifest'] = '1'
+    if args.backend is not None:
+        options['backend'] = args.backend
+    if args.optimize:
+        options['optimize'] = '1'
+
+    def check(result):
+        start = time.perf_counter()
+        writers = msim_results.open_writers(args.json, args.junit)
+        checker, succeeded = run_shards(result.files, args.sim, args.jobs, args.manifest, args.max_failures, writers)
+        for writer in writers:
+            writer.close()
+        msim_unittest.print_summary(checker, time.perf_counter() - start)
+        return succeeded and checker.num_failed == 0
+
+    if args.watch:
+        try:
+            msimunitgen.watch_file(args.filename, options, check)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    result = msimunitgen.compile_file(args.filename, options)
+    for message in result.messages:
+        print(message)
+    if not result.success:
+        print('Syntax errors are present - file generation aborted')
+        sys.exit(2)
+    sys.exit(0 if check(result) else 1)
@@ -1,28 +1,647 @@
+"""
+Evaluates the transcript written by a .do file generated with msimunitgen.py, and reports a summary of the results.
+The transcript is streamed line by line, so memory use does not depend on its size. When the .do file was
+generated with a manifest of expected values, the examined values are matched with the manifest in order.
+The transcript can also be followed while the simulator writes it, stopping the simulator after a number of failures.
+The results can be written as JSON lines or a JUnit XML report with msim_results.py.
+"""
+
+import argparse
+import errno
+import functools
+import itertools
+import mmap
+import os
+import re
+import signal
+import subprocess
 import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import msim_manifest
+import msim_results
+
+# Signal strengths prefixed to examined net values, e.g. "St1" or "HiZ"
+STRENGTHS = frozenset(['St', 'Su', 'We', 'Pu', 'Sm', 'Me', 'La', 'Hi'])
+
+# Lines at which scan_transcript stops: echoed assertions and the results of
+# testbenches, the lines which may hold examined values after them, and the
+# value of those which hold a single value. Patterns start with the newline
+# before a line, rather than "^", so that the regular expression engine can
+# search for them.
+MARKER = re.compile(rb'\n# (?:assert|msim_)')
+VALUE_LINE = re.compile(rb'\n(#[^\n]*)')
+SINGLE_VALUE = re.compile(rb'\n# ?(?:St|Su|We|Pu|Sm|Me|La|Hi)?(\S*)[ \t\r]*(?![^\n])')
+# Commands which advance the simulation time, or set the timestep of compact .do files
+COMMAND = re.compile(rb'\n(?:run|set msim_timestep)[ \t][^\n]*')
+# Bytes of a memory map whose lines are counted at once
+COUNT_CHUNK = 1 << 20
+
+# Seconds between reads of a followed transcript, and without a simulator process,
+# the seconds after which a transcript which stopped growing is considered complete
+POLL_INTERVAL = 0.1
+DEFAULT_IDLE = 10.0
+
+# Simulation times are counted in femtoseconds. Durations of run commands
+# without a unit are in nanoseconds, the resolution of the default timescale.
+DURATION_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*$')
+DURATION_UNITS = {'fs': 1, 'ps': 10 ** 3, 'ns': 10 ** 6, 'us': 10 ** 9, 'ms': 10 ** 12, 's': 10 ** 15, 'sec': 10 ** 15}
+
+# A failed assertion: its test block, the line at which it was checked, its
+# expected and examined values, and the simulation time at which it was examined
+Failure = namedtuple('Failure', 'test line expected actual time')
+# The results of a test block: its number of assertions and failures, and the
+# simulation times of the assertion before its first one and of its last one
+TestBlock = namedtuple('TestBlock', 'test tests failed start end')
+
+
+@functools.lru_cache(maxsize=256)
+def run_duration(duration):
+    """
+    Return the femtoseconds of a run command's duration such as "4ns", or
+    None if it does not run for a fixed time (e.g. "-all").
+    """
+    match = DURATION_PATTERN.match(duration)
+    if match is None or (match.group(2) and match.group(2) not in DURATION_UNITS):
+        return None
+    return int(round(float(match.group(1)) * DURATION_UNITS[match.group(2) or 'ns']))
+
+
+def examine_values(line):
+    """
+    Return the concatenated values printed by examine on a transcript line,
+    with signal strengths and the sizes and radixes of values such as
+    "32'hDEADBEEF" removed.
+    """
+    tokens = line[1:].split()
+    if len(tokens) == 1:
+        token = tokens[0]
+        if token[:2] in STRENGTHS:
+            return token[2:]
+        return token if "'" not in token else token[token.index("'") + 2:]
+    return ''.join(t[2:] if t[:2] in STRENGTHS else t if "'" not in t else t[t.index("'") + 2:] for t in tokens)
+
+
+def expected_digits(token):
+    """
+    Return the digits of an echoed expected value: its binary digits, or the
+    hexadecimal digits of a sized literal such as 32'hDEADBEEF, which are
+    compared with the values of a bus examined in hexadecimal.
+    """
+    if "'" not in token:
+        return token
+    return token[token.index("'") + 2:].upper()
+
+
+class TranscriptChecker(object):
+    """
+    Checks assertions as transcript lines are fed to it, against the echoed
+    assertions or a manifest (an iterator of expected bits and test names).
+    Failures are passed to report, and to record (if given) as Failure tuples,
+    and each test block to results (if given) as a TestBlock once it ends.
+    """
+
+    def __init__(self, report=print, manifest=None, record=None, results=None):
+        self.report = report
+        self.manifest = manifest
+        self.record = record
+        self.results = results
+        self.examining = False
+        self.echoing = False
+        self.overrun = False
+        self.num_tests = 0
+        self.num_failed = 0
+        self.block = None
+        self.num_lines = 0
+        self.num_bytes = 0
+        self.expected = None
+        self.actual = ''
+        self.test_name = ''
+        self.assert_line = 0
+        self.time = 0
+        self.timestep = None
+        self.assert_time = 0
+        self.last_time = 0
+
+    def feed(self, line):
+        """
+        Process the next line of the transcript.
+        """
+        self.num_lines += 1
+        self.num_bytes += len(line)
+
+        if line[:1] != '#':
+            # Commands echoed into the transcript
+            self.command(line)
+            return
+        echoed, self.echoing = self.echoing, False
+
+        if line[:7] == '# msim_':
+            self.testbench_result(line)
+            return
+
+        if self.manifest is not None:
+            examined = self.examining
+            if line[:10] == '# examine ':
+                line = '#' + line[9:]
+            elif not self.examining:
+                return
+            self.examining = False
+            if self.expected is None:
+                self.next_assertion(examined)
+                if self.expected is None:
+                    return
+            self.actual += examine_values(line)
+            if len(self.actual) >= len(self.expected):
+                self.check()
+        elif line[:8] == '# assert':
+            if self.expected is not None:
+                self.check()
+            tokens = line.split()
+            self.expected = expected_digits(tokens[2]) if len(tokens) > 2 else ''
+            self.test_name = tokens[3] if len(tokens) > 3 else ''
+            self.actual = ''
+            self.assert_line = self.num_lines
+            self.advance(echoed)
+        elif self.expected is not None:
+            self.actual += examine_values(line)
+            if len(self.actual) >= len(self.expected):
+                self.check()
+
+    def command(self, line):
+        """
+        Process a command echoed into the transcript.
+        """
+        self.examining = line[:7] == 'examine'
+        self.echoing = line[:5] == 'echo '
+        if line[:4] == 'run ':
+            duration = run_duration(line[4:])
+            if duration is not None:
+                self.time += duration
+        elif line[:18] == 'set msim_timestep ':
+            self.timestep = run_duration(line[18:])
+
+    def advance(self, echoed):
+        """
+        Set the simulation time of an assertion. Assertions echoed or
+        examined by commands of the .do file follow their echoed run, while
+        those of Tcl loops run a timestep first.
+        """
+        if not echoed and self.timestep is not None:
+            self.time += self.timestep
+        self.assert_time = self.time
+
+    def testbench_result(self, line):
+        """
+        Count a result displayed by a SystemVerilog testbench, which only
+        displays its failed assertions, and the number which passed after
+        each test block, along with the simulation time.
+        """
+        tokens = line.split()
+        if tokens[1] == 'msim_fail' and len(tokens) >= 5 and tokens[4].isdigit():
+            self.expected = tokens[2]
+            self.actual = tokens[3]
+            self.time = self.assert_time = int(tokens[4])
+            self.test_name = tokens[5] if len(tokens) > 5 else ''
+            self.assert_line = self.num_lines
+            self.check()
+        elif tokens[1] == 'msim_done' and len(tokens) >= 4 and tokens[2].isdigit() and tokens[3].isdigit():
+            self.time = self.assert_time = int(tokens[3])
+            self.count(tokens[4] if len(tokens) > 4 else '', int(tokens[2]), 0)
+
+    def count(self, test_name, tests, failed):
+        """
+        Add to the number of tests and failures, in total and of a test block,
+        and extend the time of the test block to the current assertion. A test
+        block starts at the time of the assertion before its first one.
+        """
+        self.num_tests += tests
+        self.num_failed += failed
+        block = self.block
+        if block is None or block[0] != test_name:
+            self.end_block()
+            block = self.block = [test_name, 0, 0, self.last_time, self.assert_time]
+        block[1] += tests
+        block[2] += failed
+        block[4] = self.last_time = self.assert_time
+
+    def end_block(self):
+        """
+        Pass the results of the current test block to results.
+        """
+        if self.block is not None and self.results is not None:
+            self.results(TestBlock(*self.block))
+        self.block = None
+
+    def next_assertion(self, examined=True):
+        """
+        Await the values of the next assertion of the manifest, which were
+        examined by a command of the .do file, or by a Tcl loop if not examined.
+        """
+        assertion = next(self.manifest, None)
+        if assertion is None:
+            if not self.overrun:
+                self.overrun = True
+                self.assert_time = self.time
+                self.fail(Failure('', self.num_lines, '', '', self.time))
+                self.report('Examined values on line {0:d} do not belong to any assertion of the manifest'.format(self.num_lines))
+            return
+        self.expected, self.test_name = assertion
+        self.actual = ''
+        self.assert_line = self.num_lines
+        self.advance(examined)
+
+    def check(self):
+        """
+        Compare the examined values of the pending assertion with its expected values.
+        """
+        if self.actual.upper() == self.expected:
+            self.count(self.test_name, 1, 0)
+        else:
+            self.fail(Failure(self.test_name, self.assert_line, self.expected, self.actual, self.assert_time))
+            self.report('Test {0:s}failed on line {1:d}: Expected {2:s}, Actual: {3:s}'.format(
+                self.test_name + ' ' if self.test_name else '', self.assert_line, self.expected, self.actual or 'nothing'))
+        self.expected = None
+
+    def fail(self, failure):
+        """
+        Count a failed assertion, passing it to record.
+        """
+        self.count(failure.test, 1, 1)
+        if self.record is not None:
+            self.record(failure)
+
+    def finish(self):
+        """
+        Check the final assertion once the end of the transcript is reached,
+        and pass on the last test block. Assertions of the manifest which were
+        never examined fail.
+        """
+        if self.expected is not None:
+            self.check()
+        if self.manifest is not None:
+            for self.expected, self.test_name in self.manifest:
+                self.actual = ''
+                self.assert_line = self.num_lines
+                self.assert_time = self.time
+                self.check()
+        self.end_block()
+
+
+def check_transcript(filename, checker=None):
+    """
+    Stream a transcript file through a checker, returning the checker.
+    """
+    if checker is None:
+        checker = TranscriptChecker()
+    with open(filename, 'r', errors='replace') as transcript:
+        for line in transcript:
+            checker.feed(line)
+    checker.finish()
+    return checker
+
+
+def scan_transcript(filename, checker=None):
+    """
+    Check a complete transcript through a memory map, returning the checker.
+    Only the echoed assertions, the values examined after them and the run
+    commands are visited, with the regular expression engine skipping every
+    other line, and lines are only counted to report a failure. The results are the
+    same as those of check_transcript, which is needed for manifests.
+    """
+    if checker is None:
+        checker = TranscriptChecker()
+    with open(filename, 'rb') as transcript:
+        size = os.fstat(transcript.fileno()).st_size
+        if size == 0:
+            checker.finish()
+            return checker
+        with mmap.mmap(transcript.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            counted = [0, 1]
+
+            def line_number(position):
+                # Lines are counted from the last failure onwards
+                checker.num_lines = counted[1] = counted[1] + data[counted[0]:position].count(b'\n')
+                counted[0] = position
+                return counted[1]
+
+            def follow_commands(block):
+                # Advance the simulation time through the commands between two marked lines,
+                # returning whether the second was echoed by a command of the .do file
+                for command in COMMAND.findall(block):
+                    checker.command(command[1:].decode(errors='replace'))
+                last_line = block.rfind(b'\n') + 1
+                return block[last_line:last_line + 5] == b'echo '
+
+            # The positions of the marked lines, including a first line without a newline before it
+            markers = (match.start() + 1 for match in MARKER.finditer(data))
+            if data[:8] == b'# assert' or data[:7] == b'# msim_':
+                markers = itertools.chain([0], markers)
+            start = next(markers, None)
+            echoed = start is not None and follow_commands(b'\n' + data[:max(start - 1, 0)])
+            while start is not None:
+                following = next(markers, None)
+                end = following - 1 if following is not None else size
+                line_end = data.find(b'\n', start, end)
+                if line_end < 0:
+                    line_end = end
+                header = data[start:line_end].decode(errors='replace')
+                block = data[line_end:end]
+
+                if header[:7] == '# msim_':
+                    if header[:11] == '# msim_fail':
+                        line_number(start)
+                    checker.testbench_result(header)
+                else:
+                    tokens = header.split()
+                    checker.expected = expected_digits(tokens[2]) if len(tokens) > 2 else ''
+                    checker.test_name = tokens[3] if len(tokens) > 3 else ''
+                    checker.advance(echoed)
+                    # When every line after the assertion holds a single value, and together they
+                    # are the expected values, the assertion passes without looking at each line
+                    values = SINGLE_VALUE.findall(block)
+                    checker.actual = b''.join(values).decode(errors='replace')
+                    if checker.actual.upper() != checker.expected or len(values) != block.count(b'\n#'):
+                        checker.actual = ''
+                        for value in VALUE_LINE.findall(block):
+                            checker.actual += examine_values(value.decode(errors='replace'))
+                            if len(checker.actual) >= len(checker.expected):
+                                break
+                        if checker.actual.upper() != checker.expected:
+                            checker.assert_line = line_number(start)
+                    checker.check()
+                echoed = follow_commands(block)
+                start = following
+
+            checker.num_lines = sum(data[i:i + COUNT_CHUNK].count(b'\n') for i in range(0, size, COUNT_CHUNK))
+            if data[size - 1:size] != b'\n':
+                checker.num_lines += 1
+    checker.num_bytes += size
+    checker.finish()
+    return checker
+
+
+def scan_file(filename):
+    """
+    Scan a transcript in a worker process of check_transcripts, returning
+    its checker, with the failures it reported and recorded and its test
+    blocks.
+    """
+    messages = []
+    failures = []
+    blocks = []
+    checker = TranscriptChecker(report=messages.append, record=failures.append, results=blocks.append)
+    try:
+        scan_transcript(filename, checker)
+    except OSError as e:
+        messages.append('Cannot read the transcript: {0:s}'.format(e.strerror or str(e)))
+    checker.report = checker.record = checker.results = None
+    return checker, messages, failures, blocks
+
+
+def check_transcripts(filenames, jobs=None, report=print, writers=(), results=None):
+    """
+    Scan many transcripts across a process pool, reporting the failures of
+    each, and passing the results of each to the writers of msim_results,
+    and each test block to results (if given). Returns a checker holding
+    the merged counts.
+    """
+    merged = TranscriptChecker()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for filename, (checker, messages, failures, blocks) in zip(filenames, pool.map(scan_file, filenames)):
+            for message in messages:
+                report('{0:s}: {1:s}'.format(filename, message))
+            for writer in writers:
+                for failure in failures:
+                    writer.failure(filename, failure)
+                for block in blocks:
+                    writer.test(filename, block)
+                writer.transcript(filename, checker)
+            if results is not None:
+                for block in blocks:
+                    results(block)
+            merged.num_tests += checker.num_tests
+            merged.num_failed += checker.num_failed
+            merged.num_lines += checker.num_lines
+            merged.num_bytes += checker.num_bytes
+    return merged
+
+
+def print_test_counts(blocks):
+    """
+    Report the number of passed and failed assertions of each test block,
+    adding up the blocks of the same name.
+    """
+    counts = {}
+    for block in blocks:
+        total = counts.setdefault(block.test, [0, 0])
+        total[0] += block.tests
+        total[1] += block.failed
+    width = max([28] + [len(name) for name in counts])
+    print('{0:{1:d}s} {2:>10s} {3:>10s}'.format('Test block', width, 'passed', 'failed'))
+    for name, (tests, failed) in sorted(counts.items()):
+        print('{0:{1:d}s} {2:10d} {3:10d}'.format(name or '(unnamed)', width, tests - failed, failed))
+
+
+def follow_transcript(filename, checker, running, stop=None, max_failures=0, poll=POLL_INTERVAL):
+    """
+    Check a transcript while the simulator writes it, feeding lines to the
+    checker as they are completed, until running() returns False and the
+    rest of the transcript has been read. Once max_failures assertions have
+    failed (if not zero), stop() is called and the rest of the transcript
+    is ignored. Returns the checker, and whether the simulation was stopped.
+    Raises FileNotFoundError if the simulator finished without writing the
+    transcript.
+    """
+    while not os.path.exists(filename) and running():
+        time.sleep(poll)
+    if not os.path.exists(filename):
+        raise FileNotFoundError(errno.ENOENT, 'the simulator finished without writing it', filename)
+
+    pending = ''
+    with open(filename, 'r', errors='replace') as transcript:
+        while True:
+            # Checked before reading, so that nothing written before the simulator finished is missed
+            finished = not running()
+            line = transcript.readline()
+            while line:
+                pending += line
+                if pending[-1] == '\n':
+                    checker.feed(pending)
+                    pending = ''
+                    if max_failures and checker.num_failed >= max_failures:
+                        if stop is not None:
+                            stop()
+                        checker.end_block()
+                        return checker, True
+                line = transcript.readline()
+            if finished:
+                break
+            time.sleep(poll)
+    if pending:
+        checker.feed(pending)
+    checker.finish()
+    return checker, False
+
+
+def transcript_growing(filename, idle=DEFAULT_IDLE):
+    """
+    Return a running() function for follow_transcript, for when there is no
+    simulator process to watch, which returns False once the transcript has
+    not grown for idle seconds.
+    """
+    state = {'size': -1, 'changed': time.monotonic()}
+
+    def running():
+        size = os.path.getsize(filename) if os.path.exists(filename) else -1
+        if size != state['size']:
+            state['size'] = size
+            state['changed'] = time.monotonic()
+        return time.monotonic() - state['changed'] < idle
+    return running
+
+
+def process_running(pid):
+    """
+    Return a running() function for follow_transcript which returns False
+    once the process pid has exited. Only supported on POSIX systems.
+    """
+    def running():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    return running
+
+
+def stop_process(pid):
+    """
+    Terminate the simulator process pid, if it is still running.
+    """
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def start_simulator(command):
+    """
+    Start a simulator command. On POSIX systems it is given its own process
+    group, so that stop_simulator also stops any processes it started.
+    """
+    return subprocess.Popen(command, shell=True, stdout=subprocess.DEVNULL, start_new_session=os.name == 'posix')
+
+
+def stop_simulator(process):
+    """
+    Terminate a simulator started with start_simulator.
+    """
+    if os.name == 'posix':
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        process.terminate()
+
+
+def print_summary(checker, elapsed):
+    """
+    Report the results of the checked transcript and the checker throughput.
+    """
+    if checker.num_failed == 0:
+        print("All {0:d} test passed! (100.00%)".format(checker.num_tests))
+    else:
+        print('{0:d} tests failed ({1:.2f}%)'.format(checker.num_failed, 100.0 * checker.num_failed / checker.num_tests))
+
+    elapsed = max(elapsed, 1e-9)
+    print('Checked {0:d} lines ({1:.1f} MB) in {2:.2f}s - {3:.0f} lines/s, {4:.1f} MB/s'.format(
+        checker.num_lines, checker.num_bytes / 1e6, elapsed, checker.num_lines / elapsed, checker.num_bytes / 1e6 / elapsed))
+
 
-num_failed = 0
-num_tests = 0
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the transcripts of .do files generated with msimunitgen.py.')
+    parser.add_argument('filenames', nargs='*', metavar='filename', help='the transcripts (the logfiles of the .do files)')
+    parser.add_argument('--jobs', type=int, default=None, help='number of processes checking several transcripts at once (default: number of cores)')
+    parser.add_argument('--manifest', help='the manifest of expected values written next to the .do file')
+    parser.add_argument('--follow', action='store_true', help='check the transcript while the simulator writes it')
+    parser.add_argument('--sim', help='a simulator command to start, whose transcript is followed (implies --follow)')
+    parser.add_argument('--pid', type=int, help='the process id of the simulator writing the transcript (implies --follow)')
+    parser.add_argument('--max-failures', type=int, default=0, help='stop the simulator after this many failures (default: never)')
+    parser.add_argument('--idle', type=float, default=DEFAULT_IDLE,
+                        help='without --sim or --pid, the seconds after which a transcript which stopped growing is complete (default: %(default)s)')
+    parser.add_argument('--json', help='write the results as JSON lines to this file, each failure as soon as it is found')
+    parser.add_argument('--junit', help='write the results as a JUnit XML report to this file')
+    args = parser.parse_args()
+    if not args.filenames:
+        print("Missing argument: <filename>")
+        input()
+        sys.exit(0)
+    if len(args.filenames) > 1 and (args.manifest is not None or args.follow or args.sim is not None or args.pid is not None):
+        parser.error('--manifest, --follow, --sim and --pid can only be used with a single transcript')
+    if args.sim is not None and args.pid is not None:
+        parser.error('--sim and --pid cannot be used together')
+    if args.pid is not None and os.name != 'posix':
+        parser.error('--pid is only supported on POSIX systems')
+    if args.max_failures < 0:
+        parser.error('--max-failures cannot be negative')
 
-if len(sys.argv) < 2:
-    print("Missing argument: <filename>")
-    input()
-    sys.exit(0)
+    start = time.perf_counter()
+    writers = msim_results.open_writers(args.json, args.junit)
+    if len(args.filenames) > 1:
+        blocks = []
+        checker = check_transcripts(args.filenames, args.jobs, writers=writers, results=blocks.append)
+        for writer in writers:
+            writer.close()
+        print_test_counts(blocks)
+        print_summary(checker, time.perf_counter() - start)
+        sys.exit(1 if checker.num_failed else 0)
 
-with open(sys.argv[1], 'r') as transcript:
-    lines = transcript.readlines()
+    filename = args.filenames[0]
+    manifest = msim_manifest.read_manifest(args.manifest) if args.manifest is not None else None
 
-    for i in range(len(lines)):
-        line = lines[i]
-        if line.startswith("# assert"):
-            tokens = ["# St" + str(x) for x in line.split()[2:]]
-            for j in range(len(tokens)):
-                if tokens[j] != lines[i+j+1]:
-                    num_failed += 1
-                    print("Test failed on line " + str(i+1) + ": Expected " + tokens[j] + ", Actual: " + lines[i+j+i])
+    def record(failure):
+        for writer in writers:
+            writer.failure(filename, failure)
 
-if num_failed == 0:
-    print("All {0:d} test passed! (100.00%)".format(num_tests))
-else:
-    print('{0:d} tests failed ({1:.2f}%)'.format(num_failed, float(num_failed)/num_tests))
+    def results(block):
+        for writer in writers:
+            writer.test(filename, block)
+    checker = TranscriptChecker(manifest=manifest, record=record, results=results)
+    stopped = False
+    try:
+        if args.sim is not None:
+            if os.path.exists(filename):
+                os.remove(filename)
+            process = start_simulator(args.sim)
+            checker, stopped = follow_transcript(filename, checker, lambda: process.poll() is None,
+                                                 lambda: stop_simulator(process), args.max_failures)
+        elif args.pid is not None:
+            checker, stopped = follow_transcript(filename, checker, process_running(args.pid),
+                                                 lambda: stop_process(args.pid), args.max_failures)
+        elif args.follow:
+            checker, stopped = follow_transcript(filename, checker, transcript_growing(filename, args.idle),
+                                                 None, args.max_failures)
+        elif manifest is not None:
+            check_transcript(filename, checker)
+        else:
+            scan_transcript(filename, checker)
+    except FileNotFoundError as e:
+        print('Missing transcript {0:s}: {1:s}'.format(filename, e.strerror))
+        sys.exit(2)
+    for writer in writers:
+        writer.transcript(filename, checker)
+        writer.close()
+    if stopped:
+        print('Simulation stopped after {0:d} failures'.format(checker.num_failed))
+    print_summary(checker, time.perf_counter() - start)
 
-input()
+    # Keep the window open when run by double-clicking the script
+    if sys.stdin.isatty():
+        input()
+    sys.exit(1 if checker.num_failed else 0)
@@ -3,33 +3,362 @@ A simple unit test framework for Model Sim which allows for the generation of .d
 Author: Griffin Yacynuk
 """
 
+import argparse
+import ast
+import contextlib
+import functools
+import hashlib
+import heapq
+import io
+import itertools
+import operator
+import os
+import random
+import shutil
 import sys
 import re
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-filename = 'meta_test.txt'
+import msim_manifest
 
 OPEN_BRACKETS = ['(', '{', '[']
 CLOSE_BRACKETS = [')', '}', ']']
 
+WRITE_BUFFER_SIZE = 1 << 16
+
+# Seconds between checks of the files watched by --watch
+WATCH_INTERVAL = 0.2
+
+# Meta values which change the generated output of a test block, and so are
+# part of its cache key
+CACHE_META = ['timestep', 'compact', 'bus', 'manifest', 'backend', 'optimize']
+# Part of every cache key, to be incremented whenever the text generated for a
+# test block changes, so that entries written by older versions are not reused
+CACHE_VERSION = 1
+
 REQUIRED_META = ['vfile', 'vmodule']
-meta_commands = []
-meta_dict = {'vlib': 'work', 'timescale': '1ns/1ns', 'timestep': '4ns', 'logfile': 'output.txt', 'genfile': 'out.do'}
-meta = []
+META_DEFAULTS = {'vlib': 'work', 'timescale': '1ns/1ns', 'timestep': '4ns', 'logfile': 'output.txt', 'genfile': 'out.do', 'shards': '1',
+                 'cache': '', 'cache_size': '256', 'compact': '0', 'bus': '0', 'manifest': '0', 'backend': 'do',
+                 'optimize': '0'}
+
+# Tokens produced by tokenize(). Kind is one of 'open', 'stmt' or 'close'.
+Token = namedtuple('Token', 'kind text line header')
+
+# Nodes of the syntax tree produced by parse()
+Meta = namedtuple('Meta', 'statements line')
+Test = namedtuple('Test', 'name body line source')
+For = namedtuple('For', 'var start stop body line')
+Permute = namedtuple('Permute', 'mode args body line')
+Assign = namedtuple('Assign', 'target value text line')
+Assert = namedtuple('Assert', 'target value text line')
+Raw = namedtuple('Raw', 'text line')
+Target = namedtuple('Target', 'name index')
+
+# Bit vectors: an integer holding width bits, the first bit being the most
+# significant. Values are evaluated into vectors, so wide buses are handled
+# with integer operations rather than strings of digits.
+Vector = namedtuple('Vector', 'value width')
+BIT_VECTORS = (Vector(0, 1), Vector(1, 1))
+
+# Parts of an assigned or asserted value. A value is a tuple of parts which are
+# concatenated once evaluated, e.g. "bin(i, 4)01" is (Call('bin', ('i', '4')), Vector(1, 2)),
+# or WILDCARD for the "= *" assignments of permute blocks. Binary digits and
+# sized literals such as 32'hDEADBEEF are parsed into vectors.
+Call = namedtuple('Call', 'func args')
+WILDCARD = '*'
+
+# A decoder declared in the meta block: a function of one argument which looks
+# its value up in a table of vectors, and the definition the table was built from
+Decoder = namedtuple('Decoder', 'name definition table')
+
+# The result of compile(): whether it succeeded, the errors and reports of the
+# compilation, and the (.do file, logfile) pairs written
+Result = namedtuple('Result', 'success messages files')
+
+BLOCK_HEADERS = [
+    ('meta', re.compile(r'^meta$')),
+    ('test', re.compile(r'^test\s*(\w+)?$')),
+    ('for', re.compile(r'^for\s+(\w+)\s+in\s+\[(.+?):(.+)\]$')),
+    ('permute', re.compile(r'^permute(?:\s+(.+))?$')),
+]
+
+BRACKETS = re.compile(r'[(){}\[\]]')
+DELIMITERS = re.compile(r'[{};]')
+ASSERT_PATTERN = re.compile(r'^assert\s+(\w+)\s*(?:\[([^\]]+)\])?\s*==\s*(.+)$')
+ASSIGN_PATTERN = re.compile(r'^(\w+)\s*(?:\[([^\]]+)\])?\s*=\s*([^=].*)$')
+VALUE_PART = re.compile(r"\s*(?:(\w+)\s*\(|(\d+)'([bodhBODH])([0-9a-fA-F_]+)|(\d+))")
+LITERAL_BASES = {'b': 2, 'o': 8, 'd': 10, 'h': 16}
+
+TCL_INDENT = '    '
+TCL_OPERATORS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.FloorDiv: '/', ast.Mod: '%', ast.Pow: '**',
+    ast.LShift: '<<', ast.RShift: '>>', ast.BitAnd: '&', ast.BitOr: '|', ast.BitXor: '^',
+    ast.USub: '-', ast.UAdd: '+', ast.Invert: '~',
+}
+# Operators which Tcl only applies to integers, or applies differently to the
+# floating point results of true division than Python does
+TCL_INTEGER_OPERATORS = (ast.FloorDiv, ast.Mod, ast.LShift, ast.RShift, ast.BitAnd, ast.BitOr, ast.BitXor, ast.Invert)
+
+# Procedures used by the Tcl loops of compact .do files
+TCL_PROCS = """proc msim_range {first last} {
+    set step [expr {$first > $last ? -1 : 1}]
+    set values {}
+    for {set k $first} {$k != $last + $step} {incr k $step} {lappend values $k}
+    return $values
+}
+proc msim_bin {value width} {
+    if {$value < 0 || $value >= (1 << $width)} {error "overflow from the bin() function: $value cannot be represented with $width binary bits"}
+    set bits ""
+    for {set k [expr {$width - 1}]} {$k >= 0} {incr k -1} {append bits [expr {($value >> $k) & 1}]}
+    return $bits
+}
+proc msim_7seg {value} {
+    if {$value < 0 || $value > 15} {error "7seg() argument $value cannot be displayed on a 7 segment display"}
+    return [lindex {SEVEN_SEG_TABLE} $value]
+}
+proc msim_decode {name value} {
+    upvar #0 msim_decoder_$name table
+    if {$value < 0 || $value >= [llength $table]} {error "$name() argument $value is not between 0 and [expr {[llength $table] - 1}]"}
+    return [lindex $table $value]
+}
+proc msim_bits {first last value} {
+    set n [expr {abs($first - $last) + 1}]
+    if {[string length $value] == 1} {return [string repeat $value $n]}
+    if {[string length $value] != $n} {error "wrong amount of values: $value, provide 1 or $n values instead"}
+    return $value
+}
+proc msim_hex {bits} {
+    set n [string length $bits]
+    binary scan [binary format B* [string repeat 0 [expr {(8 - $n % 8) % 8}]]$bits] H* hex
+    return "$n'h[string toupper [string range $hex end-[expr {($n + 3) / 4 - 1}] end]]"
+}
+proc msim_force {name first last value} {
+    set value [msim_bits $first $last $value]
+    set k 0
+    foreach i [msim_range $first $last] {force "$name\\[$i\\]" [string index $value $k]; incr k}
+}
+proc msim_assert {test name first last expected} {
+    global msim_timestep msim_manifest
+    set expected [msim_bits $first $last $expected]
+    run $msim_timestep
+    if {$msim_manifest} {
+        foreach i [msim_range $first $last] {echo "examine [examine "$name\\[$i\\]"]"}
+    } else {
+        echo "assert $expected $test"
+        foreach i [msim_range $first $last] {echo [examine "$name\\[$i\\]"]}
+    }
+}"""
+
+# The testbench written by the sv backend. The design is instantiated as "dut" and
+# driven through hierarchical forces, each test block being a task of the module.
+# Failed assertions, and the number of passed assertions of each test block, are
+# displayed with the simulation time (in femtoseconds) in lines which
+# msim_unittest.py reads from the transcript.
+SV_INDENT = '    '
+SV_HEADER = """`define msim_check(test, expected, actual) \\
+    msim_tests++; \\
+    if ((actual) !== (expected)) begin \\
+        msim_failed++; \\
+        $display("msim_fail %b %b %0t %s", expected, actual, $time, test); \\
+    end
+`define msim_done(test) \\
+    $display("msim_done %0d %0t %s", msim_tests - msim_failed, $time, test); \\
+    msim_tests = 0; \\
+    msim_failed = 0;
+
+module TESTBENCH;
+    int msim_tests = 0;
+    int msim_failed = 0;
+
+    VMODULE dut();
+
+"""
+SV_FOOTER = """        $stop;
+    end
+endmodule
+"""
+SV_FORCE_PATTERN = re.compile(r'^\{?(\w+(?:\[\d+(?::\d+)?\])?)\}?\s+([01xzXZ]+)$')
+SV_TIME_UNITS = {'fs': 'fs', 'ps': 'ps', 'ns': 'ns', 'us': 'us', 'ms': 'ms', 's': 's', 'sec': 's'}
+BACKENDS = ['do', 'sv']
+
+# The number of loop variable patterns kept by loop_var_pattern()
+MAX_LOOP_VAR_PATTERNS = 1 << 10
+TIME_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([a-z]+)\s*$')
+TIME_UNITS = {'fs': 1e-15, 'ps': 1e-12, 'ns': 1e-9, 'us': 1e-6, 'ms': 1e-3, 's': 1.0, 'sec': 1.0}
+SIGNAL_PATTERN = re.compile(r'^(\w+)(?:\[(-?\d+)(?::(-?\d+))?\])?$')
+
+# The number of compiled integer expressions kept by compile_expression(), and
+# memoized results for each binding of the loop variables they use
+MAX_COMPILED_EXPRESSIONS = 1 << 16
+EVALUATIONS = {}
+MAX_EVALUATIONS = 1 << 16
+# Below the number of digits Python converts to a string, so values can be reported
+MAX_VALUE_BITS = 1 << 13
+# The largest number of entries in the table of a decoder
+MAX_TABLE_SIZE = 1 << 16
+
+# Errors raised by evaluate() for expressions which cannot be evaluated
+EVALUATION_ERRORS = (NameError, SyntaxError, ZeroDivisionError, TypeError, ValueError, OverflowError)
+
+# Orders in which permute blocks go through the combinations of their wildcards,
+# or subsets of the combinations they run instead, with their arguments
+PERMUTE_MODES = ['binary', 'gray', 'sample N [seed S]', 'pairwise', 'cover T']
+# Permute modes which run a subset of the combinations, the strength of the
+# t-wise coverage reported for sampled blocks, and the number of combinations
+# written on each line of their Tcl loops
+SUBSET_MODES = ['sample', 'cover']
+SAMPLE_STRENGTH = 2
+COMBINATIONS_PER_LINE = 16
+
+SEVEN_SEG = {
+    0: '1000000',
+    1: '1111001',
+    2: '0100100',
+    3: '0110000',
+    4: '0011001',
+    5: '0010010',
+    6: '0000010',
+    7: '1111000',
+    8: '0000000',
+    9: '0010000',
+    10: '0001000',
+    11: '0000011',
+    12: '1000110',
+    13: '0100001',
+    14: '0000110',
+    15: '0001110'
+}
+SEVEN_SEG_VECTORS = dict((digit, Vector(int(bits, 2), len(bits))) for digit, bits in SEVEN_SEG.items())
+
+
+class GenerationError(Exception):
+    """
+    Raised when the unit test file cannot be compiled. The message is printed
+    to the user as-is.
+    """
+    pass
+
+
+class Settings(dict):
+    """
+    The meta values of a single compilation, starting from META_DEFAULTS, and
+    the other statements of the meta block, which are written to the .do file
+    as-is. Every compilation has its own, so nothing is shared between them
+    (other than the BlockCache of a watched file, if any). A dry run sets
+    measuring, so that permute blocks are measured rather than expanded.
+    """
+
+    def __init__(self, defaults=None):
+        dict.__init__(self, META_DEFAULTS)
+        if defaults is not None:
+            self.update(defaults)
+        self.commands = []
+        self.blocks = None
+        self.functions = Functions()
+        self.measuring = False
+
+
+class BlockCache(dict):
+    """
+    The output of test blocks kept in memory by cache key, for a file which is
+    compiled again and again by --watch, so that only the test blocks which
+    changed are generated again. Entries which the last compilation did not
+    use are dropped. The Verilog files named by the meta block are kept too,
+    so that they can be watched.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.sources = []
+        self.used = set()
+        self.built = 0
+
+    def start(self, settings):
+        """
+        Start a compilation with the given settings.
+        """
+        self.sources = settings['vfile'].split()
+        self.used = set()
+        self.built = 0
+
+    def sweep(self):
+        """
+        Drop the entries which were not used since the compilation started.
+        """
+        for key in set(self) - self.used:
+            del self[key]
+
+
+class LimitedCopy(object):
+    """
+    Writes to a stream, keeping a copy of what was written until it grows
+    beyond limit characters (or bytes), when the copy is dropped.
+    """
+
+    def __init__(self, out, limit, empty=''):
+        self.out = out
+        self.limit = limit
+        self.empty = empty
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.out.write(text)
+        if self.parts is not None:
+            self.size += len(text)
+            if self.size <= self.limit:
+                self.parts.append(text)
+            else:
+                self.parts = None
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def getvalue(self):
+        """
+        Return the copy of what was written, or None if it was dropped.
+        """
+        return None if self.parts is None else self.empty.join(self.parts)
 
 
-def log_bracket_error(lines, line, pos, open=True):
+def log_bracket_error(lines, line, pos, open=True, report=print):
     """
     Logs an error due to a missing closing bracket, or an extra closing bracket.
     """
     if open:
-        print('Syntax Error - Unclosed bracket on line {0:d} at position {1:d}:'.format(line+1, pos))
+        message = 'Syntax Error - Unclosed bracket on line {0:d} at position {1:d}:'.format(line+1, pos)
     else:
-        print('Syntax Error - Extra closing bracket on line {0:d} at position {1:d}:'.format(line+1, pos))
-    print('\t\"'+str(lines[line].strip()) + '\"')
-    print('\t ' + ' '*pos + '^')
+        message = 'Syntax Error - Extra closing bracket on line {0:d} at position {1:d}:'.format(line+1, pos)
+    report(message + '\n\t\"' + str(lines[line].strip()) + '\"\n\t ' + ' '*pos + '^')
 
 
-def check_bracket_pairing(lines):
+def strip_comment(line):
+    """
+    Return a line without its comment, which starts with a '#' at the start
+    of the line or after a ';', outside of quotes.
+    """
+    if '#' not in line:
+        return line
+    quoted = False
+    statement_end = True
+    for i, c in enumerate(line):
+        if c == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == '#' and statement_end:
+            return line[:i]
+        if not c.isspace():
+            statement_end = c == ';'
+    return line
+
+
+def check_bracket_pairing(lines, report=print):
     """
     Ensures all brackets come in pairs.
     """
@@ -37,29 +366,28 @@ def check_bracket_pairing(lines):
     passed = True
     stacks = [[], [], []]
     for i in range(len(lines)):
-        line = lines[i].strip()
-        # ignore comments
-        if not line.startswith("#"):
-            for j in range(len(line)):
-                if line[j] in OPEN_BRACKETS:
-                    stacks[OPEN_BRACKETS.index(line[j])].append((i, j))
-                elif line[j] in CLOSE_BRACKETS:
-                    if len(stacks[CLOSE_BRACKETS.index(line[j])]) != 0:
-                        stacks[CLOSE_BRACKETS.index(line[j])].pop()
-                    else:
-                        log_bracket_error(lines, i, j, False)
-                        passed = False
+        line = strip_comment(lines[i].strip())
+        for match in BRACKETS.finditer(line):
+            j = match.start()
+            if line[j] in OPEN_BRACKETS:
+                stacks[OPEN_BRACKETS.index(line[j])].append((i, j))
+            else:
+                if len(stacks[CLOSE_BRACKETS.index(line[j])]) != 0:
+                    stacks[CLOSE_BRACKETS.index(line[j])].pop()
+                else:
+                    log_bracket_error(lines, i, j, False, report)
+                    passed = False
 
     for stack in stacks:
         for unclosed in stack:
             line, pos = unclosed
-            log_bracket_error(lines, line, pos)
+            log_bracket_error(lines, line, pos, True, report)
             passed = False
 
     return passed
 
 
-def check_assert_double_equals(lines):
+def check_assert_double_equals(lines, report=print):
     """
     Ensures double equals (==) are used in assertion statements. Single equals
     are reserved for assignment.
@@ -69,462 +397,2473 @@ def check_assert_double_equals(lines):
         match = re.search(r'assert\s+[\w\:\[\]]+\s*\=\s*\d+', l)
         if match is not None:
             passed = False
-            print('Syntax Error - double equals (\"==\") must be used in assert statements:\n\t\"{0:s}\"'.format(match.group()))
-            print('\t ' + ' '*match.group().index('=') + '^')
+            report('Syntax Error - double equals (\"==\") must be used in assert statements:\n\t\"{0:s}\"\n\t {1:s}^'.format(
+                match.group(), ' '*match.group().index('=')))
 
     return passed
 
 
-def find_block_end(file_string, start_index=0, bracket_type='{}'):
+def match_block_header(text):
+    """
+    Return the block kind and header match if the text preceding a '{' declares
+    a block, otherwise None (the bracket then belongs to a statement).
+    """
+    for kind, pattern in BLOCK_HEADERS:
+        match = pattern.match(text)
+        if match is not None:
+            return kind, match
+    return None
+
+
+def tokenize(lines):
+    """
+    Split the user's input file into block headers, statements and block ends
+    in a single pass. Brackets which do not open a block (such as "log {/*}")
+    are kept as part of their statement.
+    """
+    source = '\n'.join(strip_comment(l.rstrip('\r\n')) for l in lines)
+    tokens = []
+    line = 1
+    line_pos = 0
+    start = 0
+    depth = 0
+
+    for match in DELIMITERS.finditer(source):
+        c = match.group()
+        if depth > 0:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+            continue
+
+        line += source.count('\n', line_pos, match.start())
+        line_pos = match.start()
+        raw = source[start:match.start()]
+        text = ' '.join(raw.split())
+        stmt_line = line - raw.count('\n', len(raw) - len(raw.lstrip()))
+        if c == '{':
+            header = match_block_header(text)
+            if header is None:
+                depth = 1
+                continue
+            tokens.append(Token('open', text, stmt_line, header))
+        elif c == '}':
+            if text != '':
+                tokens.append(Token('stmt', text, stmt_line, None))
+            tokens.append(Token('close', c, line, None))
+        elif text != '':
+            tokens.append(Token('stmt', text, stmt_line, None))
+        start = match.end()
+
+    return tokens
+
+
+def find_call_end(text, start):
     """
-    Given a string, starting fron the start index, assuming that one bracket
-    exists at start_index -1, return the index of the last bracket + 1.
+    Given a string where a bracket exists at start - 1, return the index of
+    the matching closing bracket.
     """
     bcount = 1
-    for i in range(start_index, len(file_string)):
-        if file_string[i] == bracket_type[0]:
+    for i in range(start, len(text)):
+        if text[i] == '(':
             bcount += 1
-        elif file_string[i] == bracket_type[1]:
+        elif text[i] == ')':
             bcount -= 1
-        if bcount == 0:
-            return i + 1
-    return len(file_string) - start_index
+            if bcount == 0:
+                return i
+    raise GenerationError('Syntax Error - unclosed function call: \"{0:s}\"'.format(text))
 
 
-def generate_7seg_func(testblocks):
+def parse_value(text):
     """
-    Convert the shorthand 7seg syntax into its full expanded form.
+    Parse the right hand side of an assignment or assertion into its parts.
+    Returns None if the text is not a value.
     """
-    for i in range(len(testblocks)):
-        match = re.search(r'7seg\s*\(', testblocks[i])
-        while match is not None:
-            end = find_block_end(testblocks[i][match.end(0):], bracket_type='()') - 1
-            arg = testblocks[i][match.end(0):match.end(0) + end]
-            binval = 0
+    if text == WILDCARD:
+        return WILDCARD
+
+    parts = []
+    pos = 0
+    while pos < len(text):
+        match = VALUE_PART.match(text, pos)
+        if match is None:
+            return None
+        if match.group(1) is not None:
+            end = find_call_end(text, match.end())
+            parts.append(Call(match.group(1), tuple(arg.strip() for arg in text[match.end():end].split(','))))
+            pos = end + 1
+        elif match.group(2) is not None:
+            parts.append(parse_literal(match.group().strip(), int(match.group(2)), match.group(3).lower(), match.group(4)))
+            pos = match.end()
+        else:
+            if match.group(5).strip('01'):
+                raise GenerationError('Syntax Error - values must be binary digits, or sized literals such as 8\'hFF: \"{0:s}\"'.format(text))
+            parts.append(Vector(int(match.group(5), 2), len(match.group(5))))
+            pos = match.end()
 
-            if arg.startswith('0x'):
-                try:
-                    binval = int(arg, 16)
-                except NameError or SyntaxError or ZeroDivisionError:
-                    print('Semantic Error - the equation (\"{0:s}\") passed to the 7seg() function cannot be evaluated.'.format(arg))
-                    return False
-            else:
-                try:
-                    binval = int(eval(arg))
-                except NameError or SyntaxError or ZeroDivisionError:
-                    print('Semantic Error - the equation (\"{0:s}\") passed to the 7seg() function cannot be evaluated.'.format(arg))
-                    return False
+    return tuple(parts)
 
-            if binval > 15 or binval < 0:
-                print('Semantic Error - the equation (\"{0:s}\") passed to the 7seg() evaluates to {1:d} and cannot be displayed on a 7 segment display.'.format(arg, binval))
-                return False
 
-            decoder = {
-                0: '1000000',
-                1: '1111001',
-                2: '0100100',
-                3: '0110000',
-                4: '0011001',
-                5: '0010010',
-                6: '0000010',
-                7: '1111000',
-                8: '0000000',
-                9: '0010000',
-                10: '0001000',
-                11: '0000011',
-                12: '1000110',
-                13: '0100001',
-                14: '0000110',
-                15: '0001110'
-            }
-
-            testblocks[i] = testblocks[i][:match.start()] + decoder[binval] + testblocks[i][end + match.end() + 1:]
-            match = re.search(r'7seg\s*\(', testblocks[i])
-
-
-def generate_bin_func(testblocks):
-    """
-    Convert the shorthand bin function into its full expanded form.
-    """
-    for i in range(len(testblocks)):
-        match = re.search(r'bin\s*\(', testblocks[i])
-        dec_val = 0
-        num_bits = 0
-        bin_val = ''
-        while match is not None:
-            end = find_block_end(testblocks[i][match.end(0):], bracket_type='()') - 1
-            args = testblocks[i][match.end(0):match.end(0) + end].split(',')
-            if len(args) != 2:
-                print('Semantic Error - the bin() function takes exactly 2 arguments.')
-                return False, ''
-
-            if args[0].startswith('0x'):
-                try:
-                    dec_val = int(args[0], 16)
-                except ValueError:
-                    print('Semantic Error - the first argument to the bin function "{0:s}" is invalid. Only integer or hex values are accepted.'.format(args[0]))
-                    return False, ''
+def parse_literal(text, width, base, digits):
+    """
+    Parse a sized Verilog literal such as 32'hDEADBEEF into a vector.
+    """
+    try:
+        value = int(digits.replace('_', ''), LITERAL_BASES[base])
+    except ValueError:
+        raise GenerationError('Syntax Error - invalid digits in the literal \"{0:s}\"'.format(text))
+    if width == 0 or value >> width:
+        raise GenerationError('Syntax Error - the literal \"{0:s}\" does not fit in {1:d} bits.'.format(text, width))
+    return Vector(value, width)
+
+
+def parse_target(name, index):
+    """
+    Parse an (optionally indexed) variable into a Target.
+    """
+    if index is None:
+        return Target(name, None)
+    return Target(name, tuple(i.strip() for i in index.split(':', 1)))
+
+
+def parse_statement(token, in_permute):
+    """
+    Parse a single statement of a test block. Statements which are neither
+    assignments nor assertions are passed through to the .do file as-is.
+    """
+    text = token.text
+    match = ASSERT_PATTERN.match(text)
+    if match is not None:
+        value = parse_value(match.group(3))
+        if value is None or value == WILDCARD:
+            raise GenerationError('Syntax Error - invalid value in assert statement: \"{0:s}\"'.format(text))
+        return Assert(parse_target(match.group(1), match.group(2)), value, text, token.line)
+
+    match = ASSIGN_PATTERN.match(text)
+    if match is not None:
+        value = parse_value(match.group(3))
+        if value is not None:
+            if value == WILDCARD and not in_permute:
+                raise GenerationError('Semantic Error - wildcard assignments (\"{0:s}\") are only valid inside permute blocks.'.format(text))
+            return Assign(parse_target(match.group(1), match.group(2)), value, text, token.line)
+
+    return Raw(text, token.line)
+
+
+def parse_permute_mode(words):
+    """
+    Parse the words after "permute" in a permute block header into its mode
+    and integer arguments, or None if they are invalid. "pairwise" is the
+    same as "cover 2", and samples are seeded with 0 unless a seed is given.
+    """
+    if any(not word.isdigit() for word in words[1::2]):
+        return None
+    numbers = tuple(int(word) for word in words[1::2])
+    if words in (['binary'], ['gray']):
+        return words[0], ()
+    elif words == ['pairwise']:
+        return 'cover', (2,)
+    elif words[0] == 'cover' and len(words) == 2 and numbers[0] > 0:
+        return 'cover', numbers
+    elif words[0] == 'sample' and len(words) == 2 and numbers[0] > 0:
+        return 'sample', (numbers[0], 0)
+    elif words[0] == 'sample' and len(words) == 4 and words[2] == 'seed' and numbers[0] > 0:
+        return 'sample', (numbers[0], int(words[3]))
+    return None
+
+
+def parse_body(tokens, pos, in_permute):
+    """
+    Parse the statements and nested blocks of a test, for or permute block
+    starting at tokens[pos]. Returns the body and the position after the
+    closing bracket.
+    """
+    body = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token.kind == 'close':
+            return body, pos + 1
+        elif token.kind == 'stmt':
+            body.append(parse_statement(token, in_permute))
+            pos += 1
+        else:
+            kind, match = token.header
+            if kind == 'test':
+                raise GenerationError('Semantic Error - Nested test blocks are not valid. Generation Failed.')
+            elif kind == 'meta':
+                raise GenerationError('Semantic Error - the meta block must be declared at the top level. Generation Failed.')
+            elif kind == 'permute':
+                if in_permute:
+                    raise GenerationError('Semantic Error - Nested permute blocks are not valid. Generation Failed.')
+                mode = parse_permute_mode((match.group(1) or 'binary').split())
+                if mode is None:
+                    raise GenerationError('Syntax Error - invalid permute block on line {0:d}: \"{1:s}\"\n'
+                                          '             - the permute mode must be one of {2:s}.'.format(token.line, token.text, ', '.join(PERMUTE_MODES)))
+                sub_body, pos = parse_body(tokens, pos + 1, True)
+                body.append(Permute(mode[0], mode[1], tuple(sub_body), token.line))
             else:
-                try:
-                    dec_val = int(eval(args[0]))
-                except NameError or SyntaxError or ZeroDivisionError:
-                    print('Semantic Error - the equation (\"{0:s}\") passed to the bin() function cannot be evaluated.'.format(args[0]))
-                    return False, ''
+                sub_body, pos = parse_body(tokens, pos + 1, in_permute)
+                body.append(For(match.group(1), match.group(2).strip(), match.group(3).strip(), tuple(sub_body), token.line))
+
+    raise GenerationError('Syntax Error - unclosed block on line {0:d}.'.format(tokens[pos - 1].line))
+
+
+def parse(tokens):
+    """
+    Build the syntax tree of the user's input file. Returns the meta block
+    (or None) and the list of test blocks.
+    """
+    metablock = None
+    tests = []
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token.kind != 'open':
+            # Statements outside of any block are ignored
+            pos += 1
+            continue
+
+        kind, match = token.header
+        if kind == 'meta':
+            statements = []
+            pos += 1
+            while pos < len(tokens) and tokens[pos].kind == 'stmt':
+                statements.append(tokens[pos].text)
+                pos += 1
+            if pos == len(tokens) or tokens[pos].kind != 'close':
+                raise GenerationError('Syntax Error - blocks cannot be declared inside of the meta block.')
+            metablock = Meta(tuple(statements), token.line)
+            pos += 1
+        elif kind == 'test':
+            start = pos
+            body, pos = parse_body(tokens, pos + 1, False)
+            source = '\n'.join(t.text for t in tokens[start:pos])
+            tests.append(Test(match.group(1) or '', tuple(body), token.line, source))
+        else:
+            raise GenerationError('Semantic Error - {0:s} blocks must be declared within a test block.'.format(kind))
+
+    return metablock, tests
+
+
+def checked_pow(base, exponent):
+    """
+    Raise base to exponent, refusing results too large to be a bit vector.
+    """
+    if type(base) is int and type(exponent) is int and abs(base).bit_length() * exponent > MAX_VALUE_BITS:
+        raise OverflowError('exponent too large')
+    return base ** exponent
+
 
+def checked_mul(left, right):
+    """
+    Multiply two values, refusing results too large to be a bit vector.
+    """
+    if type(left) is int and type(right) is int and abs(left).bit_length() + abs(right).bit_length() > MAX_VALUE_BITS:
+        raise OverflowError('product too large')
+    return left * right
+
+
+def checked_lshift(value, shift):
+    """
+    Shift value left, refusing results too large to be a bit vector.
+    """
+    if shift > MAX_VALUE_BITS:
+        raise OverflowError('shift too large')
+    return value << shift
+
+
+# Operators allowed in integer expressions (indices and the arguments of bin()
+# and 7seg()). Division is true division, the result being truncated to an
+# integer once the whole expression is evaluated.
+EXPRESSION_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: checked_mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: checked_pow,
+    ast.LShift: checked_lshift, ast.RShift: operator.rshift, ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_, ast.BitXor: operator.xor,
+    ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert,
+}
+
+
+def compile_node(node, names):
+    """
+    Compile an expression node into a function of the loop variables, adding
+    the names of the variables it uses to names. Raises SyntaxError for
+    anything other than integers, variables and the allowed operators.
+    """
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        value = node.value
+        return lambda env: value
+    elif isinstance(node, ast.Name):
+        name = node.id
+        names.append(name)
+
+        def load(env):
             try:
-                num_bits = int(eval(args[1]))
-            except NameError or SyntaxError or ZeroDivisionError:
-                print('Semantic Error - the equation (\"{0:s}\") passed to the bin() function cannot be evaluated.'.format(args[1]))
-                return False, ''
+                return env[name]
+            except KeyError:
+                raise NameError(name)
+        return load
+    elif isinstance(node, ast.BinOp) and type(node.op) in EXPRESSION_OPERATORS:
+        op = EXPRESSION_OPERATORS[type(node.op)]
+        left = compile_node(node.left, names)
+        right = compile_node(node.right, names)
+        return lambda env: op(left(env), right(env))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in EXPRESSION_OPERATORS:
+        op = EXPRESSION_OPERATORS[type(node.op)]
+        operand = compile_node(node.operand, names)
+        return lambda env: op(operand(env))
+    raise SyntaxError('unsupported expression')
+
+
+@functools.lru_cache(maxsize=MAX_COMPILED_EXPRESSIONS)
+def compile_expression(expr):
+    """
+    Compile an integer expression into a function of the loop variables and
+    the tuple of variable names it uses, caching the result. Expressions
+    without variables are evaluated once, the function being None and the
+    value taking the place of the names.
+    """
+    names = []
+    function = compile_node(ast.parse(expr.strip(), mode='eval').body, names)
+    if names:
+        return function, tuple(sorted(set(names)))
+    return None, int(function({}))
+
+
+def evaluate(expr, env):
+    """
+    Evaluate an integer expression (such as an index or a bin() argument) with
+    the current for loop variables. Results are memoized for each binding of
+    the variables the expression uses, since unrolled loops evaluate the same
+    expressions many times.
+    """
+    function, names = compile_expression(expr)
+    if function is None:
+        return names
 
-            bin_val = format(dec_val, '0' + str(num_bits) + 'b')
+    key = (expr,) + tuple([env.get(name) for name in names])
+    value = EVALUATIONS.get(key)
+    if value is None:
+        value = int(function(env))
+        if len(EVALUATIONS) >= MAX_EVALUATIONS:
+            EVALUATIONS.clear()
+        EVALUATIONS[key] = value
+    return value
 
-            if len(bin_val) > int(num_bits):
-                print('Semantic Error - overflow from the bin() function: {0:d} cannot be represented with {1:s} binary bits.'.format(dec_val, num_bits))
-                return False, ''
 
-            testblocks[i] = testblocks[i][:match.start()] + bin_val + testblocks[i][end + match.end() + 1:]
-            match = re.search(r'bin\s*\(', testblocks[i])
+def evaluate_index(target, env):
+    """
+    Evaluate the index expressions of a variable, returning a list of integers.
+    """
+    try:
+        return [evaluate(i, env) for i in target.index]
+    except EVALUATION_ERRORS:
+        raise GenerationError('Semantic Error - the equation used to index the vairable (\"{0:s}[{1:s}]\") cannot be evaluated.'.format(target.name, ':'.join(target.index)))
+
 
-    return True
+def index_range(indices):
+    """
+    Return the ordered list of indices of a ranged variable such as X[7:0].
+    """
+    increment = 1
+    if indices[0] - indices[1] > 0:
+        increment = -1
+    return range(indices[0], indices[1] + increment, increment)
 
 
-def generate_force_calls(testblocks):
-    """
-    Expand the shorthand assignment statements into ModelSim force statements.
-    """
-    for b in range(len(testblocks)):
-        formatted_block = testblocks[b].replace('{', ';')
-        formatted_block = formatted_block.replace('}', ';')
-        tokens = [t.strip() for t in formatted_block.split(';') if t != '']
-
-        for t in tokens:
-            gen_code = ''
-            if re.search(r'^[\w\+\-\*\/\:\[\]]+\s*=\s*\d+$', t):
-                sub_tokens = [st.strip() for st in t.split('=')]
-                variable = sub_tokens[0]
-                assignment = sub_tokens[1]
-
-                # List variable force
-                match = re.search(r'\[.+?:.+?\]', variable)
-                if match is not None:
-                    indices_string = variable[match.start():match.end()]
-                    variable = variable.replace(indices_string, '')
-
-                    indices = []
-                    try:
-                        indices = [int(eval(i)) for i in indices_string[1:-1].split(':')]
-                    except NameError or SyntaxError or ZeroDivisionError:
-                        print('Semantic Error - the equation used to index the vairable (\"{0:s}\") cannot be evaluated.'.format(variable + indices_string))
-                        return False
-
-                    magnitude = abs(indices[0] - indices[1]) + 1
-                    increment = 1
-                    if indices[0] - indices[1] > 0:
-                        increment = -1
-
-                    if len(assignment) == 1:
-                        for i in range(indices[0], indices[1] + increment, increment):
-                            gen_code += 'force {{{0:s}[{1:d}]}} {2:s};'.format(variable, i, assignment)
-                    elif len(assignment) == magnitude:
-                        ai = 0
-                        for i in range(indices[0], indices[1] + increment, increment):
-                            gen_code += 'force {{{0:s}[{1:d}]}} {2:s};'.format(variable, i, assignment[ai])
-                            ai += 1
-                    else:
-                        print('Syntax Error - wrong amount of values passed to assignment: \"{0:s}\"'.format(t))
-                        print('             - in this case provide 1 or {0:d} values instead.'.format(magnitude))
-                        return False
-
-                # Single variable force
-                else:
-                    # Index evaluation
-                    match = re.search(r'\[.+?\]', variable)
-                    if match is not None:
-                        try:
-                            indices_string = str(int(eval(match.group()[1:-1])))
-                            variable = variable.replace(match.group(), '[{0:s}]'.format(indices_string))
-                        except NameError or SyntaxError or ZeroDivisionError:
-                            print('Semantic Error - the equation used to index the vairable (\"{0:s}\") cannot be evaluated.'.format(variable))
-                            return False
-
-                    gen_code = 'force {{{0:s}}} {1:s};'.format(variable, assignment)
-
-                testblocks[b] = testblocks[b].replace(t, gen_code, 1)
-
-
-def generate_assert_func(testblocks):
-    """
-    Convert the shorthand asserion statements into ModelSim assertions.
-    """
-    for b in range(len(testblocks)):
-        formatted_block = testblocks[b].replace('{', ';')
-        formatted_block = formatted_block.replace('}', ';')
-        tokens = [t.strip() for t in formatted_block.split(';') if t != '']
-
-        test_name = ''
-        test_name_tokens = tokens[0].split()
-        if len(test_name_tokens) == 2:
-            test_name = test_name_tokens[1]
-
-        for t in tokens:
-            if re.search(r'^assert\s+[\w\+\-\*\/\:\[\]]+\s*\=\=\s*[01]+$', t):
-                assert_string = t
-                subtokens = t.split('==')
-                variable = subtokens[0].strip().split(' ')[-1]
-                expected = subtokens[1].strip()
-
-                gen_code = ''
-
-                # List variable assertion
-                match = re.search(r'\[.+?:.+?\]', variable)
-                if match is not None:
-                    indices_string = variable[match.start():match.end()]
-                    variable = variable.replace(indices_string, '')
-
-                    indices = []
-                    try:
-                        indices = [int(eval(i)) for i in indices_string[1:-1].split(':')]
-                    except NameError or SyntaxError or ZeroDivisionError:
-                        print('Semantic Error - the equation used to index the vairable (\"{0:s}\") cannot be evaluated.'.format(variable + indices_string))
-                        return False
-
-                    magnitude = abs(indices[0] - indices[1]) + 1
-                    increment = 1
-                    if indices[0] - indices[1] > 0:
-                        increment = -1
-
-                    if len(expected) == 1:
-                        gen_code = 'run {0:s};echo \"assert {1:s} {2:s}\";'.format(meta_dict['timestep'], expected * magnitude, test_name)
-                    elif len(expected) == magnitude:
-                        gen_code = 'run {0:s};echo \"assert {1:s} {2:s}\";'.format(meta_dict['timestep'], expected, test_name)
-                    else:
-                        print('Syntax Error - wrong amount of values passed to assert function: \"{0:s}\"'.format(assert_string))
-                        print('             - in this case provide 1 or {0:d} values instead.'.format(magnitude))
-                        return False
-
-                    for i in range(indices[0], indices[1]+increment, increment):
-                        gen_code += 'examine {{{0:s}[{1:d}]}};'.format(variable, i)
-
-                # Single variable assertion
+def generate_7seg_func(args, env):
+    """
+    Convert the 7seg function into the active-low seven segment bits of its argument.
+    """
+    if len(args) != 1:
+        raise GenerationError('Semantic Error - the 7seg() function takes exactly 1 argument.')
+
+    try:
+        binval = evaluate(args[0], env)
+    except EVALUATION_ERRORS:
+        raise GenerationError('Semantic Error - the equation (\"{0:s}\") passed to the 7seg() function cannot be evaluated.'.format(args[0]))
+
+    if binval > 15 or binval < 0:
+        raise GenerationError('Semantic Error - the equation (\"{0:s}\") passed to the 7seg() evaluates to {1:d} and cannot be displayed on a 7 segment display.'.format(args[0], binval))
+
+    return SEVEN_SEG_VECTORS[binval]
+
+
+def generate_bin_func(args, env):
+    """
+    Convert the bin function into a vector of its first argument.
+    """
+    if len(args) != 2:
+        raise GenerationError('Semantic Error - the bin() function takes exactly 2 arguments.')
+
+    try:
+        dec_val = evaluate(args[0], env)
+    except EVALUATION_ERRORS:
+        raise GenerationError('Semantic Error - the equation (\"{0:s}\") passed to the bin() function cannot be evaluated.'.format(args[0]))
+
+    try:
+        num_bits = evaluate(args[1], env)
+    except EVALUATION_ERRORS:
+        raise GenerationError('Semantic Error - the equation (\"{0:s}\") passed to the bin() function cannot be evaluated.'.format(args[1]))
+
+    if dec_val < 0 or num_bits < 1 or dec_val >> num_bits:
+        raise GenerationError('Semantic Error - overflow from the bin() function: {0:d} cannot be represented with {1:d} binary bits.'.format(dec_val, num_bits))
+
+    return Vector(dec_val, num_bits)
+
+
+def generate_decoder_func(decoder, args, env):
+    """
+    Convert a call of a decoder declared in the meta block into the entry of
+    its table for its argument.
+    """
+    if len(args) != 1:
+        raise GenerationError('Semantic Error - the {0:s}() decoder takes exactly 1 argument.'.format(decoder.name))
+
+    try:
+        index = evaluate(args[0], env)
+    except EVALUATION_ERRORS:
+        raise GenerationError('Semantic Error - the equation (\"{0:s}\") passed to the {1:s}() decoder cannot be evaluated.'.format(args[0], decoder.name))
+
+    if index < 0 or index >= len(decoder.table):
+        raise GenerationError('Semantic Error - the equation (\"{0:s}\") passed to the {1:s}() decoder evaluates to {2:d}, '
+                              'which is not between 0 and {3:d}.'.format(args[0], decoder.name, index, len(decoder.table) - 1))
+
+    return decoder.table[index]
+
+
+FUNCTIONS = {
+    'bin': generate_bin_func,
+    '7seg': generate_7seg_func,
+}
+
+
+@functools.lru_cache(maxsize=64)
+def bcd_table(digits):
+    """
+    Return the binary coded decimal vectors of the numbers with the given number of digits.
+    """
+    return tuple(Vector(int(format(n, '0{0:d}d'.format(digits)), 16), 4 * digits) for n in range(10 ** digits))
+
+
+@functools.lru_cache(maxsize=64)
+def onehot_table(width):
+    """
+    Return the one-hot vectors of width bits, the one set bit of entry n being bit n.
+    """
+    return tuple(Vector(1 << n, width) for n in range(width))
+
+
+@functools.lru_cache(maxsize=64)
+def gray_table(width):
+    """
+    Return the Gray codes of the numbers of width bits.
+    """
+    return tuple(Vector(n ^ (n >> 1), width) for n in range(1 << width))
+
+
+# Kinds of decoders declared with "decoder NAME = KIND N;" in the meta block,
+# the size of the table of each kind, and the function building its table
+DECODER_KINDS = {
+    'bcd': (lambda digits: 10 ** digits, bcd_table),
+    'onehot': (lambda width: width, onehot_table),
+    'gray': (lambda width: 1 << width, gray_table),
+}
+
+
+def parse_decoder(text):
+    """
+    Parse the declaration of a decoder in the meta block, such as
+    "digits = bcd 2" or "state = table 001 010 100", into a Decoder.
+    """
+    match = re.match(r'^(\w+)\s*=\s*(\w+)\s*(.*)$', text)
+    if match is None:
+        raise GenerationError('Syntax Error - decoders are declared as \"decoder NAME = KIND N;\", with a kind of {0:s}, '
+                              'or as \"decoder NAME = table VALUE ...;\": \"decoder {1:s}\"'.format(', '.join(sorted(DECODER_KINDS)), text))
+    name, kind, argument = match.group(1), match.group(2), match.group(3).strip()
+    if name in FUNCTIONS:
+        raise GenerationError('Syntax Error - the decoder \"{0:s}\" cannot replace the built-in {0:s}() function.'.format(name))
+    definition = kind + ' ' + ' '.join(argument.split())
+
+    if kind == 'table':
+        table = []
+        for entry in argument.split():
+            value = parse_value(entry)
+            if value is None or value == WILDCARD or any(isinstance(part, Call) for part in value):
+                raise GenerationError('Syntax Error - the entries of the table of the decoder \"{0:s}\" must be binary digits or sized literals: \"{1:s}\"'.format(name, entry))
+            table.append(evaluate_value(value, {}))
+        if not table or any(vector.width != table[0].width for vector in table):
+            raise GenerationError('Syntax Error - the table of the decoder \"{0:s}\" must have entries of the same width.'.format(name))
+        if len(table) > MAX_TABLE_SIZE:
+            raise GenerationError('Syntax Error - the table of the decoder \"{0:s}\" has more than {1:d} entries.'.format(name, MAX_TABLE_SIZE))
+        return Decoder(name, definition, tuple(table))
+
+    if kind not in DECODER_KINDS or not argument.isdigit() or int(argument) < 1:
+        raise GenerationError('Syntax Error - decoders are declared as \"decoder NAME = KIND N;\", with a kind of {0:s}, '
+                              'or as \"decoder NAME = table VALUE ...;\": \"decoder {1:s}\"'.format(', '.join(sorted(DECODER_KINDS)), text))
+    size, build = DECODER_KINDS[kind]
+    if size(int(argument)) > MAX_TABLE_SIZE:
+        raise GenerationError('Syntax Error - the table of the decoder \"{0:s}\" would have more than {1:d} entries.'.format(name, MAX_TABLE_SIZE))
+    return Decoder(name, definition, build(int(argument)))
+
+
+class Functions(dict):
+    """
+    The functions which the values of a compilation can call, by name: the
+    built-in FUNCTIONS, and the decoders declared in its meta block.
+    """
+
+    def __init__(self):
+        dict.__init__(self, FUNCTIONS)
+        self.decoders = {}
+
+    def declare(self, decoder):
+        """
+        Add a decoder, whose name must not already be declared.
+        """
+        if decoder.name in self.decoders:
+            raise GenerationError('Syntax Error - the decoder \"{0:s}\" is declared more than once.'.format(decoder.name))
+        self[decoder.name] = functools.partial(generate_decoder_func, decoder)
+        self.decoders[decoder.name] = decoder
+
+    def definitions(self):
+        """
+        Return the definitions of the decoders, on which the output of test
+        blocks depends.
+        """
+        return ''.join('\n{0:s}={1:s}'.format(name, decoder.definition) for name, decoder in sorted(self.decoders.items()))
+
+
+def evaluate_value(value, env, functions=FUNCTIONS):
+    """
+    Evaluate the parts of a value into a vector, calling the functions of the
+    Functions registry given (or the built-in functions).
+    """
+    bits = 0
+    width = 0
+    for part in value:
+        if isinstance(part, Call):
+            if part.func not in functions:
+                raise GenerationError('Semantic Error - unknown function \"{0:s}()\".'.format(part.func))
+            part = functions[part.func](part.args, env)
+        if len(value) == 1:
+            return part
+        bits = bits << part.width | part.value
+        width += part.width
+    return Vector(bits, width)
+
+
+def replicate(vector, count):
+    """
+    Repeat a single bit vector count times.
+    """
+    return Vector(vector.value * ((1 << count) - 1), count)
+
+
+def vector_bit(vector, k):
+    """
+    Return the k-th bit of a vector (counting from the most significant) as a vector.
+    """
+    return BIT_VECTORS[(vector.value >> (vector.width - 1 - k)) & 1]
+
+
+def vector_bits(vector):
+    """
+    Return the binary digits of a vector.
+    """
+    return format(vector.value, '0{0:d}b'.format(vector.width))
+
+
+def vector_literal(vector):
+    """
+    Return the sized hexadecimal literal of a vector, e.g. 32'hDEADBEEF.
+    """
+    return '{0:d}\'h{1:0{2:d}X}'.format(vector.width, vector.value, (vector.width + 3) // 4)
+
+
+def examined_in_hex(variables):
+    """
+    Return whether the variables of an assertion are examined in hexadecimal,
+    as slices of a bus are, rather than in binary.
+    """
+    return len(variables) == 1 and ':' in variables[0]
+
+
+def bus_slice(target, indices, settings):
+    """
+    Return the slice (e.g. "SW[7:0]") with which a ranged variable is forced
+    and examined as a whole in bus mode, or None if it is handled bit by bit.
+    Only descending slices are used, matching how Verilog buses are declared.
+    """
+    if settings['bus'] != '1' or indices[0] <= indices[1]:
+        return None
+    return '{0:s}[{1:d}:{2:d}]'.format(target.name, indices[0], indices[1])
+
+
+def generate_force_calls(node, env, settings):
+    """
+    Expand an assignment statement into force commands. Wildcard assignments
+    (inside permute blocks) produce one force per bit with a value of None.
+    In bus mode a ranged variable is forced with a single command.
+    """
+    target = node.target
+    if target.index is None:
+        value = None if node.value == WILDCARD else evaluate_value(node.value, env, settings.functions)
+        return [('force', target.name, value)]
+
+    indices = evaluate_index(target, env)
+    if len(indices) == 1:
+        value = None if node.value == WILDCARD else evaluate_value(node.value, env, settings.functions)
+        return [('force', '{0:s}[{1:d}]'.format(target.name, indices[0]), value)]
+
+    bits = index_range(indices)
+    if node.value == WILDCARD:
+        return [('force', '{0:s}[{1:d}]'.format(target.name, i), None) for i in bits]
+
+    assignment = evaluate_value(node.value, env, settings.functions)
+    if assignment.width == 1:
+        assignment = replicate(assignment, len(bits))
+    elif assignment.width != len(bits):
+        raise GenerationError('Syntax Error - wrong amount of values passed to assignment: \"{0:s}\"\n'
+                              '             - in this case provide 1 or {1:d} values instead.'.format(node.text, len(bits)))
+
+    variable = bus_slice(target, indices, settings)
+    if variable is not None:
+        return [('force', variable, assignment)]
+    return [('force', '{0:s}[{1:d}]'.format(target.name, i), vector_bit(assignment, k)) for k, i in enumerate(bits)]
+
+
+def generate_assert_func(node, env, test_name, settings):
+    """
+    Expand an assertion statement into an assert command over the examined
+    variables, which runs for a timestep before examining them. In bus mode a
+    ranged variable is examined with a single command.
+    """
+    target = node.target
+    expected = evaluate_value(node.value, env, settings.functions)
+
+    if target.index is not None:
+        indices = evaluate_index(target, env)
+        if len(indices) == 2:
+            bits = index_range(indices)
+            if expected.width == 1:
+                expected = replicate(expected, len(bits))
+            elif expected.width != len(bits):
+                raise GenerationError('Syntax Error - wrong amount of values passed to assert function: \"{0:s}\"\n'
+                                      '             - in this case provide 1 or {1:d} values instead.'.format(node.text, len(bits)))
+            variable = bus_slice(target, indices, settings)
+            if variable is not None:
+                return ('assert', [variable], expected, test_name, settings['timestep'])
+            return ('assert', ['{0:s}[{1:d}]'.format(target.name, i) for i in bits], expected, test_name, settings['timestep'])
+        variable = '{0:s}[{1:d}]'.format(target.name, indices[0])
+    else:
+        variable = target.name
+
+    if expected.width != 1:
+        raise GenerationError('Syntax Error - too many values passed to assert for the single variable \"{0:s}\".\n'
+                              '             - to assert multiple variables at once use a list variable instead.'.format(variable))
+
+    return ('assert', [variable], expected, test_name, settings['timestep'])
+
+
+def evaluate_range(node, env):
+    """
+    Evaluate the looping range of a for block, returning a list of integers.
+    """
+    try:
+        return [evaluate(node.start, env), evaluate(node.stop, env)]
+    except EVALUATION_ERRORS:
+        raise GenerationError('Semantic Error - the range of the for block on line {0:d} cannot be evaluated.'.format(node.line))
+
+
+def generate_for_blocks(node, env, test_name, settings):
+    """
+    Expand a for block by evaluating its body once for every value of the
+    looping variable, or into a Tcl for loop in compact mode.
+    """
+    if settings['compact'] == '1':
+        try:
+            lines = compact_for(node, env, set(), test_name, settings)
+        except CompactFallback:
+            lines = None
+        if lines is not None:
+            for line in lines:
+                yield ('raw', line)
+            return
+
+    loop_env = dict(env)
+    for j in index_range(evaluate_range(node, env)):
+        loop_env[node.var] = j
+        for command in expand_body(node.body, loop_env, test_name, settings):
+            yield command
+
+
+@functools.lru_cache(maxsize=16)
+def sample_combinations(stars, count, seed):
+    """
+    Return count distinct combinations of stars wildcard bits drawn at random
+    with the given seed, in ascending order, or every combination if there
+    are no more than count. Only the drawn combinations are held in memory.
+    """
+    space = 1 << stars
+    if count >= space:
+        return tuple(range(space))
+    rng = random.Random(seed)
+    if count * 2 > space:
+        return tuple(sorted(rng.sample(range(space), count)))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.add(rng.getrandbits(stars))
+    return tuple(sorted(chosen))
+
+
+@functools.lru_cache(maxsize=16)
+def covering_array(stars, strength):
+    """
+    Return the combinations of a covering array of stars wildcard bits, in
+    which the values of any strength wildcards take every one of their
+    combinations at least once. The array is built one wildcard at a time
+    (the IPOG strategy): it starts with every combination of the first
+    strength wildcards, and each further wildcard is given the values which
+    cover the most missing tuples in the existing combinations, before
+    combinations are added for the tuples still missing. The full space of
+    combinations is never enumerated.
+    """
+    strength = min(strength, stars)
+    rows = [[(c >> (strength - 1 - k)) & 1 for k in range(strength)] for c in range(1 << strength)]
+    for i in range(strength, stars):
+        column_sets = list(itertools.combinations(range(i), strength - 1))
+        missing = dict((columns, set(range(1 << strength))) for columns in column_sets)
+
+        # Extend the existing combinations with the values which cover the most missing tuples
+        for row in rows:
+            keys = []
+            for columns in column_sets:
+                key = 0
+                for c in columns:
+                    if row[c] is None:
+                        key = None
+                        break
+                    key = key << 1 | row[c]
+                keys.append(key)
+            covered = [0, 0]
+            for columns, key in zip(column_sets, keys):
+                if key is not None:
+                    covered[0] += (key << 1) in missing[columns]
+                    covered[1] += (key << 1 | 1) in missing[columns]
+            value = 1 if covered[1] > covered[0] else 0
+            row.append(value)
+            for columns, key in zip(column_sets, keys):
+                if key is not None:
+                    missing[columns].discard(key << 1 | value)
+
+        # Cover the missing tuples with the free bits of the combinations, or
+        # with added combinations, leaving the bits they do not need free
+        added = []
+        for columns in column_sets:
+            tuple_columns = columns + (i,)
+            for key in sorted(missing[columns]):
+                values = [(key >> (strength - 1 - k)) & 1 for k in range(strength)]
+                for row in itertools.chain(rows, added):
+                    if all(row[c] is None or row[c] == v for c, v in zip(tuple_columns, values)):
+                        break
                 else:
-                    # Index evaluation
-                    match = re.search(r'\[.+?\]', variable)
-                    if match is not None:
-                        try:
-                            indices_string = str(int(eval(match.group()[1:-1])))
-                            variable = variable.replace(match.group(), '[{0:s}]'.format(indices_string))
-                        except NameError or SyntaxError or ZeroDivisionError:
-                            print('Semantic Error - the equation used to index the vairable (\"{0:s}\") cannot be evaluated.'.format(variable))
-                            return False
+                    row = [None] * (i + 1)
+                    added.append(row)
+                for c, v in zip(tuple_columns, values):
+                    row[c] = v
+        rows += added
+
+    return tuple(sum((bit or 0) << (stars - 1 - k) for k, bit in enumerate(row)) for row in rows)
 
-                    if len(expected) != 1:
-                        print('Syntax Error - too many values passed to assert for the single variable \"{0:s}\".'.format(variable))
-                        print('             - to assert multiple variables at once use a list variable instead.')
-                        return False
-                    else:
-                        gen_code = 'run {0:s};echo \"assert {1:s} {2:s}\";examine {{{3:s}}};'.format(meta_dict['timestep'], expected, test_name, variable)
 
-                testblocks[b] = testblocks[b].replace(assert_string, gen_code, 1)
+def permute_combinations(node, stars):
+    """
+    Return the combinations of the stars wildcard bits which a permute block
+    runs, in order. The first wildcard is the most significant bit.
+    """
+    if node.mode == 'sample':
+        return sample_combinations(stars, node.args[0], node.args[1])
+    elif node.mode == 'cover':
+        return covering_array(stars, node.args[0])
+    elif node.mode == 'gray':
+        return (c ^ (c >> 1) for c in range(1 << stars))
+    return range(1 << stars)
 
 
-def generate_for_blocks(testblocks):
+def count_combinations(node, stars):
     """
-    Expand the shorthand for statement into its expanded form.
+    Return the number of combinations a permute block with stars wildcard bits runs.
     """
-    found_match = False
+    if node.mode in SUBSET_MODES:
+        return len(permute_combinations(node, stars))
+    return 1 << stars
 
-    for i in range(len(testblocks)):
-        pattern = re.compile(r'for\s+\w\s+in\s+\[\d+:\d+\]\s*\{')
-        match = pattern.search(testblocks[i])
 
-        if match is not None:
-            found_match = True
-            end = find_block_end(testblocks[i], match.end())
-            find = testblocks[i][match.start():end]
-            find_mut = find
-            replace = ''
-
-            tokens = [t.strip() for t in match.group().split(' ') if t != '']
-            variable = str(tokens[1])
-            raw_range = tokens[3][1:-1]
-            if raw_range[-1] == ']':
-                raw_range = raw_range[:-1]
-
-            indices = [int(t) for t in raw_range.split(':')]
-            magnitude = abs(indices[0] - indices[1]) + 1
-            increment = 1
-            if indices[0] - indices[1] > 0:
-                increment = -1
-
-            for j in range(indices[0], indices[1] + increment, increment):
-                var_pattern = re.compile(r'[\s:%\[\^\*\+\-\/\(\=]' + variable + r'[\s;:%\]\^\*\+\-\/\),]')
-                var_match = var_pattern.search(find_mut)
-                while var_match is not None:
-                    find_mut = find_mut.replace(var_match.group(), var_match.group().replace(variable, str(j)))
-                    var_match = var_pattern.search(find_mut)
-                replace += find_mut[find_mut.index('{') + 1:-1] + ';'
-                find_mut = find
-
-            testblocks[i] = testblocks[i].replace(find, replace)
-
-    # repeat until all for blocks are generated
-    if found_match:
-        generate_for_blocks(testblocks)
-
-
-def add_meta_command(command, value):
+def tuple_coverage(combinations, stars, strength):
     """
-    Add meta command to dict if it has not already been declared.
+    Return the fraction of the tuples (the values of any strength wildcard
+    bits) which the combinations cover. Each wildcard is turned into a mask
+    of the combinations in which it is set, so each tuple is checked with a
+    few operations on the masks.
     """
-    if command in meta_dict or command in REQUIRED_META:
-        meta_dict[command] = value
+    strength = min(strength, stars)
+    if strength == 0:
+        return 1.0
+    everything = (1 << len(combinations)) - 1
+    masks = []
+    for k in range(stars):
+        masks.append(int(''.join('1' if (c >> (stars - 1 - k)) & 1 else '0' for c in reversed(combinations)) or '0', 2))
+
+    covered = 0
+    total = 0
+    for columns in itertools.combinations(range(stars), strength):
+        for values in range(1 << strength):
+            mask = everything
+            for k, c in enumerate(columns):
+                mask &= masks[c] if (values >> (strength - 1 - k)) & 1 else ~masks[c]
+            covered += mask != 0
+            total += 1
+    return covered / float(total)
+
+
+def generate_permute_block(node, env, test_name, settings):
+    """
+    Expand a permute block by evaluating its body once with placeholders for
+    the wildcard bits, then emitting it for each combination its mode runs.
+    A dry run passes the block on as a ('permute', node, template, stars) command.
+    """
+    if settings['compact'] == '1':
+        try:
+            lines = compact_permute(node, env, set(), test_name, settings)
+        except CompactFallback:
+            lines = None
+        if lines is not None:
+            for line in lines:
+                yield ('raw', line)
+            return
+
+    template, stars = permute_template(node, env, test_name, settings)
+    if settings.measuring:
+        yield ('permute', node, template, stars)
+        return
+    for command in replay_permutations(template, stars, permute_combinations(node, stars), node.mode == 'gray'):
+        yield command
+
+
+def permute_template(node, env, test_name, settings):
+    """
+    Expand the body of a permute block once, returning a list of (command, -1)
+    pairs in which the forces of wildcard bits are (signal, star) pairs
+    instead, and the number of wildcard bits.
+    """
+    stars = 0
+    template = []
+    for command in expand_body(node.body, env, test_name, settings):
+        if command[0] == 'force' and command[2] is None:
+            template.append((command[1], stars))
+            stars += 1
+        else:
+            template.append((command, -1))
+    return template, stars
+
+
+def replay_permutations(template, stars, combinations, gray):
+    """
+    Emit the template of a permute block for each of the combinations of its
+    stars wildcard bits, leaving out the forces which would not change a
+    signal in gray mode.
+    """
+    forced = {}
+    for combination in combinations:
+        for command, star in template:
+            if star >= 0:
+                command = ('force', command, BIT_VECTORS[(combination >> (stars - 1 - star)) & 1])
+            if gray:
+                if command[0] == 'force' and redundant_force(forced, command[1], command[2]):
+                    continue
+                elif command[0] == 'permute' or command[0] == 'raw' and not keeps_forces(command[1]):
+                    forced.clear()
+            yield command
+
+
+def keeps_forces(text):
+    """
+    Return whether a raw statement leaves the forced signals as they are.
+    Statements other than run and echo (and Tcl loops) may change any signal.
+    """
+    return text.split(' ', 1)[0] in ('run', 'echo')
+
+
+@functools.lru_cache(maxsize=4096)
+def signal_bits(signal):
+    """
+    Return the name of a forced signal and the indices of the bits it forces
+    (None for a whole variable), or None if it is not a plain signal.
+    """
+    match = SIGNAL_PATTERN.match(signal)
+    if match is None:
+        return None
+    if match.group(2) is None:
+        return match.group(1), None
+    if match.group(3) is None:
+        return match.group(1), (int(match.group(2)),)
+    return match.group(1), tuple(index_range([int(match.group(2)), int(match.group(3))]))
+
+
+def redundant_force(forced, signal, value):
+    """
+    Return whether forcing a signal to a vector would not change it, given the
+    values recorded in forced (a dict of variable name to a dict of bit index,
+    or None for the whole variable, to vector). The force is then recorded.
+    """
+    bits = signal_bits(signal)
+    if bits is None:
+        forced.clear()
+        return False
+
+    name, indices = bits
+    if indices is None:
+        if forced.get(name) == {None: value}:
+            return True
+        forced[name] = {None: value}
+        return False
+
+    bits = forced.get(name)
+    if bits is None or None in bits:
+        bits = forced[name] = {}
+    if len(indices) == 1:
+        updates = ((indices[0], value),)
+    elif value.width != len(indices):
+        bits.clear()
+        return False
     else:
-        meta_commands.append(command + ' ' + value)
+        updates = ((i, vector_bit(value, k)) for k, i in enumerate(indices))
 
+    redundant = True
+    for i, bit in updates:
+        if bits.get(i) != bit:
+            bits[i] = bit
+            redundant = False
+    return redundant
 
-def generate_meta(meta_string):
+
+def copy_forced(forced):
     """
-    Generate ModelSim metadata.
+    Return a copy of the forces recorded by redundant_force.
     """
-    global meta, meta_commands, meta_dict
+    return dict((name, dict(bits)) for name, bits in forced.items())
 
-    lines = [t.strip() for t in meta_string.replace('=', ' ').split(';') if t != '']
-    for line in lines:
-        tokens = [t.strip() for t in line.split(' ') if t != '']
-        command = tokens[0]
-        value = ' '.join(tokens[1:])
-        add_meta_command(command, value)
 
+def permute_forces(command, forced):
+    """
+    Record the forces made by a permute block passed on by a dry run, which
+    are those of the last of its combinations.
+    """
+    node, template, stars = command[1:4]
+    if node.mode in SUBSET_MODES:
+        last = permute_combinations(node, stars)[-1]
+    else:
+        last = (1 << stars) - 1
+        if node.mode == 'gray':
+            last ^= last >> 1
+    for command in replay_permutations(template, stars, [last], False):
+        if command[0] == 'force':
+            redundant_force(forced, command[1], command[2])
+        elif command[0] == 'raw' and not keeps_forces(command[1]):
+            forced.clear()
+
+
+def add_durations(first, second):
+    """
+    Return the duration of two runs one after the other, in the smaller unit of
+    the two (e.g. "10ns" and "500ps" make "10500ps"), or None if they cannot be
+    added up.
+    """
+    if first.strip().isdigit() and second.strip().isdigit():
+        return str(int(first) + int(second))
+    first_match = TIME_PATTERN.match(first)
+    second_match = TIME_PATTERN.match(second)
+    if first_match is None or second_match is None or first_match.group(2) not in TIME_UNITS or second_match.group(2) not in TIME_UNITS:
+        return None
+    unit = min(first_match.group(2), second_match.group(2), key=TIME_UNITS.get)
+    return format((run_time(first) + run_time(second)) / TIME_UNITS[unit], '.12g') + unit
+
+
+def optimize_commands(commands, forced=None):
+    """
+    Pass on the command stream of a test block without redundant forces, and
+    with runs merged into the run or assertion which follows them. forced
+    holds the forces made before the commands (see redundant_force).
+    """
+    forced = {} if forced is None else forced
+    pending = None
+    for command in commands:
+        if command[0] == 'force':
+            if redundant_force(forced, command[1], command[2]):
+                continue
+        elif command[0] == 'permute':
+            # Permute blocks measured by a dry run are passed the forces made
+            # before them, and leave those of their last combination
+            command = command[:4] + (copy_forced(forced),)
+            permute_forces(command, forced)
+        elif command[0] == 'raw':
+            # The indented lines of Tcl loops are neither merged nor trusted
+            words = command[1].split(' ', 1)
+            if words[0] == 'run' and len(words) == 2:
+                if pending is None:
+                    pending = words[1]
+                    continue
+                duration = add_durations(pending, words[1])
+                if duration is not None:
+                    pending = duration
+                    continue
+                yield ('raw', 'run ' + pending)
+                pending = words[1]
+                continue
+            if not keeps_forces(command[1]):
+                forced.clear()
+        elif command[0] == 'assert' and pending is not None:
+            duration = add_durations(pending, command[4])
+            if duration is not None:
+                command = command[:4] + (duration,)
+                pending = None
+
+        if pending is not None:
+            yield ('raw', 'run ' + pending)
+            pending = None
+        yield command
+
+    if pending is not None:
+        yield ('raw', 'run ' + pending)
+
+
+@functools.lru_cache(maxsize=MAX_LOOP_VAR_PATTERNS)
+def loop_var_pattern(var):
+    """
+    Return the pattern matching a loop variable in a raw statement.
+    """
+    return re.compile(r'(?<=[\s:%\[\^\*\+\-\/\(\=])' + var + r'(?=[\s;:%\]\^\*\+\-\/\),]|$)')
+
+
+def substitute_loop_vars(text, env):
+    """
+    Replace the loop variables in a raw statement with their values.
+    """
+    for var, value in env.items():
+        text = loop_var_pattern(var).sub(str(value), text)
+    return text
+
+
+def expand_body(body, env, test_name, settings):
+    """
+    Expand the statements and blocks of a body into a stream of commands.
+    """
+    for node in body:
+        if isinstance(node, Assign):
+            for command in generate_force_calls(node, env, settings):
+                yield command
+        elif isinstance(node, Assert):
+            yield generate_assert_func(node, env, test_name, settings)
+        elif isinstance(node, For):
+            for command in generate_for_blocks(node, env, test_name, settings):
+                yield command
+        elif isinstance(node, Permute):
+            for command in generate_permute_block(node, env, test_name, settings):
+                yield command
+        else:
+            text = substitute_loop_vars(node.text, env)
+            if settings['manifest'] == '1' and text.split(None, 1)[0] == 'examine':
+                raise GenerationError('Semantic Error - examine statements cannot be used with a manifest, use \"echo [{0:s}]\" instead.'.format(text))
+            yield ('raw', text)
+
+
+def emit_commands(commands, settings):
+    """
+    Convert a stream of expanded commands into the lines of a ModelSim .do file.
+    """
+    echo = settings['manifest'] != '1'
+    grouped = settings['optimize'] == '1'
+    for command in commands:
+        if command[0] == 'force':
+            if command[2].width == 1 and ':' not in command[1]:
+                yield 'force {{{0:s}}} {1:d}\n'.format(command[1], command[2].value)
+            else:
+                yield 'force {{{0:s}}} {1:s}\n'.format(command[1], vector_literal(command[2]))
+        elif command[0] == 'assert':
+            yield 'run {0:s}\n'.format(command[4])
+            if examined_in_hex(command[1]):
+                if echo:
+                    yield 'echo \"assert {0:s} {1:s}\"\n'.format(vector_literal(command[2]), command[3])
+                yield 'examine -radix hex {{{0:s}}}\n'.format(command[1][0])
+                continue
+            if echo:
+                yield 'echo \"assert {0:s} {1:s}\"\n'.format(vector_bits(command[2]), command[3])
+            if grouped:
+                yield 'examine {0:s}\n'.format(' '.join('{' + variable + '}' for variable in command[1]))
+                continue
+            for variable in command[1]:
+                yield 'examine {{{0:s}}}\n'.format(variable)
+        else:
+            yield command[1] + '\n'
+
+
+def sv_delay(duration):
+    """
+    Return the SystemVerilog delay statement of a run duration such as
+    "4ns", or None if it has no SystemVerilog equivalent. Durations without
+    a unit are in the unit of the timescale, as with ModelSim's run.
+    """
+    if duration.strip().isdigit():
+        return '#{0:s};'.format(duration.strip())
+    match = TIME_PATTERN.match(duration)
+    if match is None or match.group(2) not in SV_TIME_UNITS:
+        return None
+    return '#{0:s}{1:s};'.format(match.group(1), SV_TIME_UNITS[match.group(2)])
+
+
+def sv_statement(text):
+    """
+    Translate a statement passed through to the .do file into SystemVerilog.
+    Only run, echo and force statements (of binary values) can be translated.
+    """
+    words = text.split(None, 1)
+    argument = words[1] if len(words) == 2 else ''
+    if words[0] == 'run' and sv_delay(argument) is not None:
+        return sv_delay(argument)
+    elif words[0] == 'echo':
+        if len(argument) >= 2 and (argument[0], argument[-1]) in (('"', '"'), ('{', '}')):
+            argument = argument[1:-1]
+        argument = re.sub(r'\\(.)', r'\1', argument)
+        return '$display("{0:s}");'.format(argument.replace('\\', '\\\\').replace('"', '\\"').replace('%', '%%'))
+    elif words[0] == 'force':
+        match = SV_FORCE_PATTERN.match(argument)
+        if match is not None:
+            return 'force dut.{0:s} = {1:d}\'b{2:s};'.format(match.group(1), len(match.group(2)), match.group(2))
+    raise GenerationError('Semantic Error - \"{0:s}\" cannot be written to a SystemVerilog testbench, only assignments, '
+                          'assertions and run, echo and force statements can.'.format(text))
+
+
+def emit_testbench(commands, settings):
+    """
+    Convert a stream of expanded commands into the statements of a task of
+    the SystemVerilog testbench. Signals of the design are forced through
+    the "dut" instance, and assertions wait for a timestep before comparing
+    the examined signals with their expected values.
+    """
+    for command in commands:
+        if command[0] == 'force':
+            yield '{0:s}force dut.{1:s} = {2:s};\n'.format(SV_INDENT * 2, command[1], vector_literal(command[2]))
+        elif command[0] == 'assert':
+            variables = ['dut.' + variable for variable in command[1]]
+            actual = variables[0] if len(variables) == 1 else '{' + ', '.join(variables) + '}'
+            yield SV_INDENT * 2 + sv_delay(command[4]) + '\n'
+            yield '{0:s}`msim_check("{1:s}", {2:s}, {3:s})\n'.format(SV_INDENT * 2, command[3], vector_literal(command[2]), actual)
+        else:
+            yield SV_INDENT * 2 + sv_statement(command[1]) + '\n'
+
+
+class CompactFallback(Exception):
+    """
+    Raised when a block cannot be written as a Tcl loop, in which case it is
+    unrolled instead.
+    """
+    pass
+
+
+def loop_names(expr, loop_vars):
+    """
+    Return the Tcl loop variables an expression refers to.
+    """
     try:
-        meta.append('vlib ' + meta_dict['vlib'])
-        meta.append('vlog -timescale ' + meta_dict['timescale'] + ' ' + meta_dict['vfile'])
-        meta.append('vsim ' + meta_dict['vmodule'] + ' -l ' + meta_dict['logfile'])
-        meta += meta_commands
-    except KeyError as e:
-        print('Syntax Error - missing a definition for {0:s} in the meta block.'.format(str(e)))
-        return False
+        function, names = compile_expression(expr)
+    except EVALUATION_ERRORS:
+        raise CompactFallback()
+    if function is None:
+        return set()
+    return set(names).intersection(loop_vars)
 
-    return True
 
+def float_expr(node):
+    """
+    Return whether an expression node evaluates to a floating point number,
+    because it contains a true division which is not rounded in between.
+    """
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, ast.Div) or float_expr(node.left) or float_expr(node.right)
+    if isinstance(node, ast.UnaryOp):
+        return float_expr(node.operand)
+    return False
+
+
+def translate_expr(node):
+    """
+    Translate an expression node into a Tcl expression, matching the result of
+    evaluate() (true division, truncated to an integer once evaluated). Integer
+    operators applied to the result of a true division are left to evaluate().
+    """
+    if isinstance(node, (ast.BinOp, ast.UnaryOp)) and isinstance(node.op, TCL_INTEGER_OPERATORS) and float_expr(node):
+        raise CompactFallback()
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return str(node.value)
+    elif isinstance(node, ast.Name):
+        return '$_' + node.id
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div):
+        return '(double({0:s}) / {1:s})'.format(translate_expr(node.left), translate_expr(node.right))
+    elif isinstance(node, ast.BinOp) and type(node.op) in TCL_OPERATORS:
+        return '({0:s} {1:s} {2:s})'.format(translate_expr(node.left), TCL_OPERATORS[type(node.op)], translate_expr(node.right))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in TCL_OPERATORS:
+        return '{0:s}{1:s}'.format(TCL_OPERATORS[type(node.op)], translate_expr(node.operand))
+    raise CompactFallback()
+
+
+def tcl_int(expr, env, loop_vars):
+    """
+    Return a Tcl word for an integer expression: its value if it does not
+    depend on a Tcl loop variable, otherwise an expr command.
+    """
+    if not loop_names(expr, loop_vars):
+        try:
+            return str(evaluate(expr, env))
+        except EVALUATION_ERRORS:
+            raise CompactFallback()
+    node = ast.parse(expr.strip(), mode='eval').body
+    if isinstance(node, ast.Name):
+        return '$_' + node.id
+    return '[expr {{int({0:s})}}]'.format(translate_expr(node))
+
+
+def tcl_value(value, env, loop_vars, functions):
+    """
+    Return a Tcl word for the binary digits of a value. Values which do not
+    depend on a Tcl loop variable are evaluated. Decoders look their values
+    up in the tables written to the prologue. The wildcards of permute blocks
+    have no Tcl word, so their blocks are unrolled.
+    """
+    if value == WILDCARD:
+        raise CompactFallback()
+    words = []
+    static = True
+    for part in value:
+        if isinstance(part, Vector):
+            words.append(vector_bits(part))
+            continue
+        if len(part.args) != (2 if part.func == 'bin' else 1):
+            raise CompactFallback()
+        static = static and not any(loop_names(arg, loop_vars) for arg in part.args)
+        args = [tcl_int(arg, env, loop_vars) for arg in part.args]
+        if part.func == 'bin':
+            words.append('[msim_bin {0:s} {1:s}]'.format(args[0], args[1]))
+        elif part.func == '7seg':
+            words.append('[msim_7seg {0:s}]'.format(args[0]))
+        elif part.func in functions.decoders:
+            words.append('[msim_decode {0:s} {1:s}]'.format(part.func, args[0]))
+        else:
+            raise CompactFallback()
+
+    if static:
+        return vector_bits(evaluate_value(value, env, functions))
+    if len(words) == 1:
+        return words[0]
+    return '\"' + ''.join(words) + '\"'
 
-def parse_blocks(lines):
+
+def tcl_signal(target, env, loop_vars):
     """
-    Parse the different program blocks from the user's input file, and process
-    it into a format compatable with ModelSim.
+    Return a Tcl word for a variable with at most one index.
     """
-    file_string = ''.join([l.strip() if not l.strip().startswith("#") else '' for l in lines])
+    if target.index is None:
+        return '{' + target.name + '}'
+    index = tcl_int(target.index[0], env, loop_vars)
+    if not index.isdigit():
+        return '[format {{{0:s}[%d]}} {1:s}]'.format(target.name, index)
+    return '{{{0:s}[{1:s}]}}'.format(target.name, index)
 
-    # Parse top level blocks (meta, test) since they cannot be nested
-    # Meta blocks
-    match = re.search(r'meta\s*\{', file_string)
-    if match is not None:
-        metablock = file_string[match.end():find_block_end(file_string, match.end())-1]
-        generate_meta(metablock)
+
+def tcl_examine(command, settings):
+    """
+    Return the Tcl line which echoes the result of an examine command.
+    """
+    if settings['manifest'] == '1':
+        return 'echo "examine [{0:s}]"'.format(command)
+    return 'echo [{0:s}]'.format(command)
+
+
+def compact_statement(node, env, loop_vars, test_name, settings):
+    """
+    Return the Tcl lines of an assignment, assertion or raw statement inside
+    a Tcl loop. Examined values are echoed since commands in a loop do not
+    print their results, and marked as examined values when the assertions
+    themselves are not echoed.
+    """
+    if isinstance(node, Raw):
+        for var in loop_vars:
+            if loop_var_pattern(var).search(node.text):
+                raise CompactFallback()
+        return [substitute_loop_vars(node.text, env)]
+
+    target = node.target
+    dynamic = set()
+    for expr in target.index or ():
+        dynamic |= loop_names(expr, loop_vars)
+    if dynamic:
+        indices = [tcl_int(i, env, loop_vars) for i in target.index]
+    value = tcl_value(node.value, env, loop_vars, settings.functions)
+
+    if isinstance(node, Assign):
+        if not dynamic and value.isdigit():
+            return [line.rstrip('\n') for line in emit_commands(generate_force_calls(node, env, settings), settings)]
+        if target.index is not None and len(target.index) == 2:
+            if not dynamic:
+                indices = evaluate_index(target, env)
+                variable = bus_slice(target, indices, settings)
+                if variable is not None:
+                    return ['force {{{0:s}}} {1:d}\'b[msim_bits {2:d} {3:d} {4:s}]'.format(variable, len(index_range(indices)), indices[0], indices[1], value)]
+                indices = [str(i) for i in indices]
+            return ['msim_force {0:s} {1:s} {2:s} {3:s}'.format(target.name, indices[0], indices[1], value)]
+        return ['force {0:s} {1:s}'.format(tcl_signal(target, env, loop_vars), value)]
+
+    if not dynamic and value.isdigit():
+        lines = [line.rstrip('\n') for line in emit_commands([generate_assert_func(node, env, test_name, settings)], settings)]
+        return [tcl_examine(line, settings) if line.startswith('examine') else line for line in lines]
+    echo = [] if settings['manifest'] == '1' else ['echo \"assert {0:s} {1:s}\"']
+    if target.index is None:
+        return (['run {0:s}'.format(settings['timestep'])] +
+                [line.format(value.strip('\"'), test_name) for line in echo] +
+                [tcl_examine('examine {{{0:s}}}'.format(target.name), settings)])
+    if not dynamic:
+        indices = evaluate_index(target, env)
+        variable = bus_slice(target, indices, settings) if len(indices) == 2 else None
+        if variable is not None:
+            expected = '[msim_hex [msim_bits {0:d} {1:d} {2:s}]]'.format(indices[0], indices[1], value)
+            return (['run {0:s}'.format(settings['timestep'])] +
+                    [line.format(expected, test_name) for line in echo] +
+                    [tcl_examine('examine -radix hex {{{0:s}}}'.format(variable), settings)])
+        indices = [str(i) for i in indices]
+    elif settings['bus'] == '1' and len(indices) == 2:
+        # Slices are examined in hexadecimal in bus mode, which msim_assert does not do
+        raise CompactFallback()
+    return ['msim_assert {{{0:s}}} {1:s} {2:s} {3:s} {4:s}'.format(test_name, target.name, indices[0], indices[-1], value)]
+
+
+def compact_body(body, env, loop_vars, test_name, settings):
+    """
+    Return the Tcl lines of a body inside a Tcl loop.
+    """
+    lines = []
+    for node in body:
+        if isinstance(node, For):
+            lines += compact_for(node, env, loop_vars, test_name, settings)
+        elif isinstance(node, Permute):
+            lines += compact_permute(node, env, loop_vars, test_name, settings)
+        else:
+            lines += compact_statement(node, env, loop_vars, test_name, settings)
+    return lines
+
+
+def compact_for(node, env, loop_vars, test_name, settings):
+    """
+    Return the Tcl for loop of a for block.
+    """
+    start = tcl_int(node.start, env, loop_vars)
+    stop = tcl_int(node.stop, env, loop_vars)
+    var = '_' + node.var
+    if not (start.lstrip('-').isdigit() and stop.lstrip('-').isdigit()):
+        header = 'foreach {0:s} [msim_range {1:s} {2:s}] {{'.format(var, start, stop)
+    elif int(start) <= int(stop):
+        header = 'for {{set {0:s} {1:s}}} {{${0:s} <= {2:s}}} {{incr {0:s}}} {{'.format(var, start, stop)
     else:
-        print('Syntax Error - No meta block found.')
-
-    # Test blocks
-    testblocks_indices = [(m.start(0), m.end(0)) for m in re.finditer(r'test\s*(\w+)?\s*\{', file_string)]
-    testblocks = [file_string[indices[0]:indices[1] + find_block_end(file_string[indices[1]:])] for indices in testblocks_indices]
-
-    # For blocks need to be generated before permute blocks
-    generate_for_blocks(testblocks)
-
-    # Recursively parse permute blocks (which can only exist in testblocks. Permute blocks cannot be nested in one another)
-    # Permute block
-    permute_blocks = []
-    for block in testblocks:
-        formatted_block = block[block.index('{') + 1:-1]
-        # Check for nested test blocks
-        if re.search(r'test\s*(\w+)?\s*\{', formatted_block) is not None:
-            print('Semantic Error - Nested test blocks are not valid. Generation Failed.')
-            return False
+        header = 'for {{set {0:s} {1:s}}} {{${0:s} >= {2:s}}} {{incr {0:s} -1}} {{'.format(var, start, stop)
+
+    body = compact_body(node.body, env, loop_vars | set([node.var]), test_name, settings)
+    return [header] + [TCL_INDENT + line for line in body] + ['}']
+
+
+def compact_permute(node, env, loop_vars, test_name, settings):
+    """
+    Return the Tcl loop of a permute block, which counts through every
+    combination of its wildcard bits and forces each bit from the counter.
+    In gray mode the counter is converted to a Gray code, and each wildcard
+    is only forced when it changes. The sample and cover modes loop over a
+    list of their combinations instead. Permute blocks containing for blocks
+    are unrolled.
+    """
+    stars = 0
+    for statement in node.body:
+        if isinstance(statement, (For, Permute)):
+            raise CompactFallback()
+        if isinstance(statement, Assign) and statement.value == WILDCARD:
+            for expr in statement.target.index or ():
+                if loop_names(expr, loop_vars):
+                    raise CompactFallback()
+            stars += len(generate_force_calls(statement, env, settings))
+
+    body = []
+    star = 0
+    if node.mode == 'gray':
+        body.append('set msim_g [expr {$msim_p ^ ($msim_p >> 1)}]')
+    for statement in node.body:
+        if isinstance(statement, Assign) and statement.value == WILDCARD:
+            for command in generate_force_calls(statement, env, settings):
+                star += 1
+                if node.mode == 'gray':
+                    body.append('if {{$msim_p == 0 || ($msim_p & -$msim_p) == {0:d}}} {{force {{{1:s}}} [expr {{($msim_g >> {2:d}) & 1}}]}}'.format(
+                        1 << (stars - star), command[1], stars - star))
+                else:
+                    body.append('force {{{0:s}}} [expr {{($msim_p >> {1:d}) & 1}}]'.format(command[1], stars - star))
+        else:
+            body += compact_statement(statement, env, loop_vars, test_name, settings)
+
+    if node.mode in SUBSET_MODES:
+        combinations = [str(c) for c in permute_combinations(node, stars)]
+        header = ['foreach msim_p {'] + [TCL_INDENT + ' '.join(combinations[i:i + COMBINATIONS_PER_LINE])
+                                         for i in range(0, len(combinations), COMBINATIONS_PER_LINE)] + ['} {']
+    else:
+        header = ['for {{set msim_p 0}} {{$msim_p < {0:d}}} {{incr msim_p}} {{'.format(1 << stars)]
+    return header + [TCL_INDENT + line for line in body] + ['}']
+
+
+def estimate_commands(body, env, settings):
+    """
+    Estimate the number of commands a body expands to without expanding it.
+    Returns the estimate and the number of wildcard bits assigned by the body.
+    Loops are estimated from their first iteration.
+    """
+    commands = 0
+    stars = 0
+    for node in body:
+        if isinstance(node, (Assign, Assert)):
+            bits = 1
+            if node.target.index is not None and len(node.target.index) == 2:
+                indices = evaluate_index(node.target, env)
+                bits = len(index_range(indices))
+                if node.value != WILDCARD and bus_slice(node.target, indices, settings) is not None:
+                    bits = 1
+            if isinstance(node, Assert):
+                commands += 2 + bits
+            else:
+                commands += bits
+                if node.value == WILDCARD:
+                    stars += bits
+        elif isinstance(node, For):
+            indices = evaluate_range(node, env)
+            loop_env = dict(env)
+            loop_env[node.var] = indices[0]
+            loop_commands, loop_stars = estimate_commands(node.body, loop_env, settings)
+            commands += loop_commands * len(index_range(indices))
+            stars += loop_stars * len(index_range(indices))
+        elif isinstance(node, Permute):
+            permute_commands, permute_stars = estimate_commands(node.body, env, settings)
+            if node.mode == 'gray':
+                permute_commands -= permute_stars - 1
+            commands += permute_commands * count_combinations(node, permute_stars)
+        else:
+            commands += 1
+    return commands, stars
+
+
+def estimate_test(test, settings):
+    """
+    Estimate the number of commands a test block expands to. Blocks which
+    cannot be evaluated count as a single command, the error is reported
+    when the block is expanded.
+    """
+    try:
+        return max(estimate_commands(test.body, {}, settings)[0], 1)
+    except GenerationError:
+        return 1
+
+
+def run_time(duration):
+    """
+    Return the number of seconds of a run command's duration such as "4ns",
+    or None if it has no unit.
+    """
+    match = TIME_PATTERN.match(duration)
+    if match is None or match.group(2) not in TIME_UNITS:
+        return None
+    return float(match.group(1)) * TIME_UNITS[match.group(2)]
 
-        match = re.search(r'permute\s*\{', formatted_block)
-        while match is not None:
-            end = match.end() + find_block_end(formatted_block[match.end():])
-            permute_blocks.append(formatted_block[match.start(): end])
-            formatted_block = formatted_block[end:]
-            match = re.search(r'permute\s*\{', formatted_block)
-
-    for block in permute_blocks:
-        # Assert that permute blocks are not nested
-        formatted_block = block[block.index('{') + 1:-1]
-        if re.search(r'permute\s*\{', formatted_block) is not None:
-            print('Semantic Error - Nested permute blocks are not valid. Generation Failed.')
-            return False
 
-        perm_sub_blocks = [formatted_block]
-        match = re.search(r'[\w\:\[\]]+\s*\=\s*\*;', perm_sub_blocks[0])
-        while match is not None:
-            new_blocks = []
-
-            # List assignment
-            list_match = re.search(r'\w+\[\d+\:\d+\]\s*\=\s*\*;', perm_sub_blocks[0])
-            if list_match is not None and match.start() == list_match.start():
-                var_pattern = re.compile(r'\[\d+:\d+\]')
-                var_match = var_pattern.search(perm_sub_blocks[0], match.start())
-                src_line = match.group()
-                gen_code = ''
-
-                indices_string = var_match.group()
-                variable = perm_sub_blocks[0][match.start():var_match.start()]
-                indices = [int(i) for i in indices_string[1:-1].split(':')]
-                magnitude = abs(indices[0] - indices[1]) + 1
-                increment = 1
-                if indices[0] - indices[1] > 0:
-                    increment = -1
-
-                for i in range(indices[0], indices[1] + increment, increment):
-                    gen_code += src_line.replace(indices_string, '[{0:d}]'.format(i))
-
-                for b in perm_sub_blocks:
-                    new_blocks.append(b.replace(src_line, gen_code, 1))
-
-            # Single variable assignment
+def count_commands(body, env, settings):
+    """
+    Count the force, run and examine commands a body executes in the simulator
+    (whether it is unrolled or written as Tcl loops), the wildcard bits it
+    assigns and the seconds it simulates, returned as a list. Permute blocks
+    are counted without being expanded.
+    """
+    counts = [0, 0, 0, 0, 0.0]
+    timestep = run_time(settings['timestep']) or 0.0
+    for node in body:
+        if isinstance(node, Assign):
+            forces = len(generate_force_calls(node, env, settings))
+            counts[0] += forces
+            if node.value == WILDCARD:
+                counts[3] += forces
+        elif isinstance(node, Assert):
+            counts[1] += 1
+            counts[2] += len(generate_assert_func(node, env, '', settings)[1])
+            counts[4] += timestep
+        elif isinstance(node, Raw):
+            words = node.text.split(None, 1)
+            if words[0] == 'run':
+                counts[1] += 1
+                counts[4] += run_time(words[1] if len(words) > 1 else '') or 0.0
+        elif isinstance(node, For):
+            loop_env = dict(env)
+            for j in index_range(evaluate_range(node, env)):
+                loop_env[node.var] = j
+                for k, count in enumerate(count_commands(node.body, loop_env, settings)):
+                    counts[k] += count
+        elif isinstance(node, Permute):
+            forces, runs, examines, stars, seconds = count_commands(node.body, env, settings)
+            combinations = count_combinations(node, stars)
+            if settings['compact'] == '1':
+                try:
+                    compact_permute(node, env, set(), '', settings)
+                except CompactFallback:
+                    measured = measuring_settings(settings)
+                    command = ('permute', node) + permute_template(node, env, '', measured)
+                    forces, runs, examines, seconds = measure_permute(command, measured)[:4]
+                    counts[0] += forces
+                    counts[1] += runs
+                    counts[2] += examines
+                    counts[4] += seconds
+                    continue
+            if node.mode == 'gray':
+                # Every wildcard is forced in the first combination, and one in each of the others
+                counts[0] += (forces - stars) * combinations + stars + combinations - 1
             else:
-                for b in perm_sub_blocks:
-                    new_blocks.append(b.replace('*;', '0;', 1))
-                    new_blocks.append(b.replace('*;', '1;', 1))
+                counts[0] += forces * combinations
+            counts[1] += runs * combinations
+            counts[2] += examines * combinations
+            counts[4] += seconds * combinations
+    return counts
+
+
+def measuring_settings(settings):
+    """
+    Return a copy of the settings with which a dry run measures test blocks.
+    """
+    measured = Settings(settings)
+    measured.commands = settings.commands
+    measured.functions = settings.functions
+    measured.measuring = True
+    return measured
+
+
+def line_command(line):
+    """
+    Return the simulator command of an emitted line: "force", "run" or
+    "examine" (the delays and checks of testbenches being runs and examines),
+    or the first word of any other line.
+    """
+    command = line.lstrip()
+    if command[:1] == '#':
+        return 'run'
+    elif command[:11] == '`msim_check':
+        return 'examine'
+    return command[:command.find(' ')]
+
+
+def measure_commands(commands, settings):
+    """
+    Measure the lines a stream of commands is emitted as, without keeping
+    them: the force, run and examine commands among them, the seconds they
+    simulate, their number and their size in bytes, returned as a list.
+    Permute blocks passed on by a dry run are measured by measure_permute().
+    """
+    counts = [0, 0, 0, 0.0, 0, 0]
+    emit = emit_testbench if settings['backend'] == 'sv' else emit_commands
+    for command in commands:
+        if command[0] == 'permute':
+            for k, count in enumerate(measure_permute(command, settings)):
+                counts[k] += count
+            continue
+        if command[0] == 'assert':
+            counts[3] += run_time(command[4]) or 0.0
+        else:
+            words = command[1].split(None, 1) if command[0] == 'raw' else ()
+            if words and words[0] == 'run':
+                counts[3] += run_time(words[1] if len(words) > 1 else '') or 0.0
+        for line in emit([command], settings):
+            command = line_command(line)
+            if command == 'force':
+                counts[0] += 1
+            elif command == 'run':
+                counts[1] += 1
+            elif command == 'examine':
+                counts[2] += 1
+            counts[4] += 1
+            counts[5] += len(line)
+    return counts
+
+
+def measure_permute(command, settings):
+    """
+    Measure a permute block passed on by a dry run without emitting its
+    combinations: what each wildcard adds when it changes is measured once,
+    and multiplied by the number of times it changes.
+    """
+    node, template, stars = command[1:4]
+    forced = command[4] if len(command) > 4 else {}
+    gray = node.mode == 'gray'
+    if node.mode in SUBSET_MODES:
+        combinations = permute_combinations(node, stars)
+        count = len(combinations)
+        first = combinations[0]
+        changes = [0] * stars
+        for previous, combination in zip(combinations, combinations[1:]):
+            for star in range(stars):
+                changes[star] += ((previous ^ combination) >> (stars - 1 - star)) & 1
+    else:
+        count = 1 << stars
+        first = 0
+        # Wildcard k (from the first, the most significant bit) changes 2^k
+        # times in a Gray code, and 2^(k+1)-1 times when counting
+        changes = [1 << star if gray else (2 << star) - 1 for star in range(stars)]
+
+    def measure(combinations):
+        commands = replay_permutations(template, stars, combinations, gray)
+        if settings['optimize'] == '1':
+            commands = optimize_commands(commands, copy_forced(forced))
+        return measure_commands(commands, settings)
+
+    once = measure([first])
+    again = measure([first, first])
+    counts = [once[k] + (again[k] - once[k]) * (count - 1) for k in range(len(once))]
+    if gray or settings['optimize'] == '1':
+        for star in range(stars):
+            changed = measure([first, first ^ (1 << (stars - 1 - star))])
+            for k in range(len(counts)):
+                counts[k] += (changed[k] - again[k]) * changes[star]
+    return counts
+
+
+def subset_permutes(body, env, settings, found):
+    """
+    Add the sampled and covering permute blocks of a body to found, a dict
+    keyed by their line and number of wildcard bits, which may differ from
+    one iteration of an enclosing for block to the next.
+    """
+    for node in body:
+        if isinstance(node, For):
+            loop_env = dict(env)
+            for j in index_range(evaluate_range(node, env)):
+                loop_env[node.var] = j
+                subset_permutes(node.body, loop_env, settings, found)
+        elif isinstance(node, Permute) and node.mode in SUBSET_MODES:
+            found[(node.line, count_commands(node.body, env, settings)[3])] = node
+
+
+def report_coverage(tests, settings, report=print):
+    """
+    Report the share of the combinations which each sampled or covering
+    permute block runs, and the share of the t-wise tuples (the values of
+    any t of its wildcard bits) they cover. Covering arrays cover all of
+    their tuples, the pairs covered by samples are counted.
+    """
+    found = {}
+    for test in tests:
+        subset_permutes(test.body, {}, settings, found)
+    for (line, stars), node in sorted(found.items()):
+        combinations = permute_combinations(node, stars)
+        if node.mode == 'cover':
+            strength = min(node.args[0], stars)
+            coverage = 1.0
+        else:
+            strength = min(SAMPLE_STRENGTH, stars)
+            coverage = tuple_coverage(combinations, stars, strength)
+        report('Permute block on line {0:d}: {1:d} of 2^{2:d} combinations ({3:.4g}%), covering {4:.2f}% of {5:d}-wise tuples'.format(
+            line, len(combinations), stars, 100.0 * len(combinations) / (1 << stars), 100.0 * coverage, strength))
+
+
+def shard_tests(tests, shards, settings):
+    """
+    Split the test blocks into shards with balanced estimated command counts,
+    assigning the largest blocks first. Blocks keep their order in each shard.
+    """
+    loads = [(0, shard) for shard in range(shards)]
+    assigned = [[] for shard in range(shards)]
+    for estimate, index in sorted(((estimate_test(t, settings), i) for i, t in enumerate(tests)), reverse=True):
+        load, shard = heapq.heappop(loads)
+        assigned[shard].append(index)
+        heapq.heappush(loads, (load + estimate, shard))
+    return [[tests[i] for i in sorted(indices)] for indices in assigned]
+
+
+def shard_filename(filename, shard):
+    """
+    Return the name of a shard's file, e.g. out.do -> out_2.do
+    """
+    root, ext = os.path.splitext(filename)
+    return '{0:s}_{1:d}{2:s}'.format(root, shard, ext)
 
-            perm_sub_blocks = new_blocks
-            match = re.search(r'[\w\:\[\]]+\s*\=\s*\*;', perm_sub_blocks[0])
 
-        for i in range(len(testblocks)):
-            if block in testblocks[i]:
-                testblocks[i] = testblocks[i].replace(block, "".join(perm_sub_blocks), 1)
+def shard_files(settings):
+    """
+    Return the (.do file, logfile) pairs written by the last generation.
+    """
+    shards = int(settings['shards'])
+    if shards <= 1:
+        return [(settings['genfile'], settings['logfile'])]
+    return [(shard_filename(settings['genfile'], i), shard_filename(settings['logfile'], i)) for i in range(shards)]
+
+
+class Stats(object):
+    """
+    Collects the wall time and peak traced memory of each phase of the
+    generation, and the same for each test block along with the commands it
+    emitted, for --stats. Memory is traced from when the object is created.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.blocks = []
+        self.max_peak = 0
+        tracemalloc.start()
+
+    def take_peak(self):
+        """
+        Return the peak traced memory since the last call and reset it.
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        self.max_peak = max(self.max_peak, peak)
+        return peak
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Measure the code run in a with statement as a phase.
+        """
+        self.take_peak()
+        self.max_peak = 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.take_peak()
+            self.phases.append((name, elapsed, self.max_peak))
+
+    def count_block(self, test, lines):
+        """
+        Pass on the .do lines of a test block, counting the commands among them.
+        Delays and checks of testbenches count as runs and examines. The time
+        includes that of writing the lines.
+        """
+        counts = {'force': 0, 'run': 0, 'examine': 0}
+        num_lines = 0
+        num_bytes = 0
+        self.take_peak()
+        start = time.perf_counter()
+        for line in lines:
+            num_lines += 1
+            num_bytes += len(line)
+            command = line_command(line)
+            if command in counts:
+                counts[command] += 1
+            yield line
+        self.add_block(test, time.perf_counter() - start, num_lines, num_bytes, counts['force'], counts['run'], counts['examine'])
+
+    def add_block(self, test, elapsed, num_lines, num_bytes, forces, runs, examines):
+        """
+        Add the measurements of a test block, whose peak memory is taken now.
+        """
+        statements = test.source.count('\n') + 1
+        self.blocks.append((test.name, elapsed, self.take_peak(), num_lines, num_bytes, num_lines / float(statements),
+                            forces, runs, examines))
+
+    def report(self):
+        """
+        Print the measurements. Peak memory includes everything traced before
+        the phase or block started, such as the parsed test blocks.
+        """
+        print('{0:28s} {1:>10s} {2:>12s}'.format('Phase', 'seconds', 'peak KiB'))
+        for name, elapsed, peak in self.phases:
+            print('{0:28s} {1:10.3f} {2:12.1f}'.format(name, elapsed, peak / 1024.0))
+        tracemalloc.stop()
+        if not self.blocks:
+            return
+
+        width = max(28, max(len(block[0]) for block in self.blocks))
+        print('')
+        print('{0:{1:d}s} {2:>10s} {3:>12s} {4:>10s} {5:>12s} {6:>8s} {7:>10s} {8:>10s} {9:>10s}'.format(
+            'Test block', width, 'seconds', 'peak KiB', 'lines', 'bytes', 'factor', 'forces', 'runs', 'examines'))
+        for name, elapsed, peak, num_lines, num_bytes, factor, forces, runs, examines in self.blocks:
+            print('{0:{1:d}s} {2:10.3f} {3:12.1f} {4:10d} {5:12d} {6:8.1f} {7:10d} {8:10d} {9:10d}'.format(
+                name, width, elapsed, peak / 1024.0, num_lines, num_bytes, factor, forces, runs, examines))
+
+
+def cache_key(test, settings):
+    """
+    Return the cache key of a test block, a hash of the cache version, its
+    source (without comments or formatting) and of the meta values and
+    decoders its output depends on.
+    """
+    digest = hashlib.sha256('{0:d}\n'.format(CACHE_VERSION).encode())
+    digest.update(test.source.encode())
+    for key in CACHE_META:
+        digest.update('\n{0:s}={1:s}'.format(key, settings[key]).encode())
+    digest.update(settings.functions.definitions().encode())
+    return digest.hexdigest()
+
+
+def record_assertions(commands, manifest):
+    """
+    Pass on a stream of commands, writing the expected values of its
+    assertions to a manifest.
+    """
+    for command in commands:
+        if command[0] == 'assert':
+            manifest.write(msim_manifest.assertion_record(command[2].value, command[2].width, examined_in_hex(command[1])))
+        yield command
+
+
+def block_commands(test, settings, manifest=None):
+    """
+    Expand a test block into commands, writing the expected values of its
+    assertions to the manifest if one is given. The expected values of compact
+    blocks are found by expanding them a second time, unrolled.
+    """
+    commands = expand_body(test.body, {}, test.name, settings)
+    if settings['optimize'] == '1':
+        commands = optimize_commands(commands)
+    if manifest is None:
+        return commands
+
+    manifest.write(msim_manifest.test_record(test.name))
+    if settings['compact'] != '1':
+        return record_assertions(commands, manifest)
+    unrolled = Settings(settings)
+    unrolled['compact'] = '0'
+    unrolled.functions = settings.functions
+    for command in expand_body(test.body, {}, test.name, unrolled):
+        if command[0] == 'assert':
+            manifest.write(msim_manifest.assertion_record(command[2].value, command[2].width, examined_in_hex(command[1])))
+    return commands
+
+
+def emit_block(test, settings, manifest=None):
+    """
+    Return the lines of a test block for the backend of the settings: .do
+    commands, or the statements of a testbench task.
+    """
+    commands = block_commands(test, settings, manifest)
+    if settings['backend'] == 'sv':
+        return emit_testbench(commands, settings)
+    return emit_commands(commands, settings)
+
+
+def write_test_block(out, test, settings, stats=None, manifest=None):
+    """
+    Write the lines of a test block, and the expected values of its
+    assertions to the manifest if one is given. The output of a block which
+    has not changed since the last compilation is copied from the block cache
+    of the settings instead, if it has one.
+    """
+    blocks = settings.blocks
+    if blocks is None:
+        write_cached_block(out, test, settings, stats, manifest)
+        return
+
+    key = cache_key(test, settings)
+    blocks.used.add(key)
+    if key in blocks:
+        text, records = blocks[key]
+        if stats is not None:
+            out.writelines(stats.count_block(test, text.splitlines(True)))
+        else:
+            out.write(text)
+        if manifest is not None:
+            manifest.write(records)
+    else:
+        # The block is streamed, and only kept if it fits in the cache
+        blocks.built += 1
+        limit = int(settings['cache_size']) << 20
+        copy = LimitedCopy(out, limit)
+        records = None if manifest is None else LimitedCopy(manifest, limit, b'')
+        write_cached_block(copy, test, settings, stats, records)
+        text = copy.getvalue()
+        records = None if records is None else records.getvalue()
+        if text is not None and (manifest is None or records is not None):
+            blocks[key] = (text, records)
+
+
+def write_cached_block(out, test, settings, stats=None, manifest=None):
+    """
+    Write the lines of a test block as write_test_block() does. When a cache
+    directory is set, the output of a block which has not changed since it was
+    last generated is copied from the cache instead.
+    """
+    cache = settings['cache']
+    if cache != '':
+        path = os.path.join(cache, cache_key(test, settings))
+        manifest_path = path + '.manifest'
+        # Entries are opened before anything is copied, as other processes may evict them
+        cached = cached_manifest = None
+        try:
+            cached = open(path, 'r')
+            if manifest is not None:
+                cached_manifest = open(manifest_path, 'rb')
+        except FileNotFoundError:
+            if cached is not None:
+                cached.close()
+            cached = None
+        if cached is not None:
+            with cached:
+                if stats is None:
+                    shutil.copyfileobj(cached, out)
+                else:
+                    out.writelines(stats.count_block(test, cached))
+            touch_entry(path)
+            if cached_manifest is not None:
+                with cached_manifest:
+                    shutil.copyfileobj(cached_manifest, manifest)
+                touch_entry(manifest_path)
+            return
+
+    # The expected values of a block are collected before being cached
+    records = manifest if manifest is None or cache == '' else io.BytesIO()
+    lines = emit_block(test, settings, records)
+    if stats is not None:
+        lines = stats.count_block(test, lines)
+    if cache == '':
+        out.writelines(lines)
+        return
+
+    # Blocks whose output would not fit in the cache are not cached
+    limit = int(settings['cache_size']) << 20
+    size = 0
+    complete = False
+    descriptor, temporary = tempfile.mkstemp(suffix='.tmp', dir=cache)
+    entry = os.fdopen(descriptor, 'w')
+    try:
+        for line in lines:
+            out.write(line)
+            if size <= limit:
+                size += len(line)
+                entry.write(line)
+        complete = size <= limit
+    finally:
+        entry.close()
+        if complete:
+            replace_entry(temporary, path)
+        else:
+            remove_entry(temporary)
+
+    if records is not manifest:
+        manifest.write(records.getvalue())
+        if complete:
+            descriptor, temporary = tempfile.mkstemp(suffix='.tmp', dir=cache)
+            try:
+                with os.fdopen(descriptor, 'wb') as entry:
+                    entry.write(records.getvalue())
+            except BaseException:
+                remove_entry(temporary)
+                raise
+            replace_entry(temporary, manifest_path)
+
+
+def touch_entry(path):
+    """
+    Mark an entry of the cache as recently used, unless another process has
+    evicted it since.
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def replace_entry(temporary, path):
+    """
+    Move a complete entry into the cache. Processes compiling the same block
+    into a shared cache write their own temporary files, and when another
+    one has evicted the temporary file first, the entry is simply not cached.
+    """
+    try:
+        os.replace(temporary, path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_entry(path):
+    """
+    Remove an entry of the cache, which another process may already have removed.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict_cache(cache, limit):
+    """
+    Remove the least recently used entries from the cache directory until it
+    holds at most limit bytes.
+    """
+    entries = []
+    for name in os.listdir(cache):
+        path = os.path.join(cache, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Removed by another process sharing the cache
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= limit:
+            break
+        remove_entry(path)
+        total -= size
+
+
+def testbench_filename(genfile):
+    """
+    Return the name of the testbench run by a .do file, e.g. out.do -> out_tb.sv
+    """
+    return os.path.splitext(genfile)[0] + '_tb.sv'
+
+
+def testbench_module(genfile):
+    """
+    Return the name of the testbench module run by a .do file, which is named
+    after its file so that the testbenches of different shards can share a
+    library, e.g. out_2.do -> out_2_tb
+    """
+    name = re.sub(r'\W', '_', os.path.splitext(os.path.basename(testbench_filename(genfile)))[0])
+    return name if not name[0].isdigit() else '_' + name
+
+
+def testbench_parts(genfile, tests, settings):
+    """
+    Return the parts of the SystemVerilog testbench of a .do file, which runs
+    each test block as a task and stops the simulation once every task has
+    run: the text of the testbench, with the test blocks of its tasks in between.
+    """
+    yield SV_HEADER.replace('TESTBENCH', testbench_module(genfile)).replace('VMODULE', settings['vmodule'])
+    for i, test in enumerate(tests):
+        yield '{0:s}task automatic msim_test_{1:d}();  // {2:s}\n'.format(SV_INDENT, i, test.name)
+        yield test
+        yield SV_INDENT + 'endtask\n\n'
+    yield SV_INDENT + 'initial begin\n'
+    yield SV_INDENT * 2 + '$timeformat(-15, 0, "", 1);\n'
+    for i, test in enumerate(tests):
+        yield '{0:s}msim_test_{1:d}();\n'.format(SV_INDENT * 2, i)
+        yield '{0:s}`msim_done("{1:s}")\n'.format(SV_INDENT * 2, test.name)
+    yield SV_FOOTER
+
+
+def write_testbench(out, genfile, tests, settings, stats=None):
+    """
+    Write the SystemVerilog testbench of a .do file.
+    """
+    for part in testbench_parts(genfile, tests, settings):
+        if isinstance(part, Test):
+            write_test_block(out, part, settings, stats)
+        else:
+            out.write(part)
+
+
+def write_do_files(outputs, settings, stats=None):
+    """
+    Write (.do file, prologue, test blocks) outputs, with their manifests or
+    testbenches. Nothing is left behind if the generation fails.
+    """
+    manifests = settings['manifest'] == '1'
+    temporary = []
+    try:
+        for genfile, prologue, tests in outputs:
+            temporary.append((genfile + '.tmp', genfile))
+            if settings['backend'] == 'sv':
+                testbench = testbench_filename(genfile)
+                temporary.append((testbench + '.tmp', testbench))
+                with open(genfile + '.tmp', 'w') as out:
+                    out.writelines(line + '\n' for line in prologue)
+                with open(testbench + '.tmp', 'w', buffering=WRITE_BUFFER_SIZE) as out:
+                    write_testbench(out, genfile, tests, settings, stats)
                 continue
 
-    generate_7seg_func(testblocks)
-    generate_bin_func(testblocks)
-    generate_assert_func(testblocks)
-    generate_force_calls(testblocks)
+            manifest = None
+            if manifests:
+                manifest_file = msim_manifest.manifest_filename(genfile)
+                temporary.append((manifest_file + '.tmp', manifest_file))
+                manifest = open(manifest_file + '.tmp', 'wb', buffering=WRITE_BUFFER_SIZE)
+                manifest.write(msim_manifest.MAGIC)
+            try:
+                with open(genfile + '.tmp', 'w', buffering=WRITE_BUFFER_SIZE) as out:
+                    out.writelines(line + '\n' for line in prologue)
+                    for test in tests:
+                        write_test_block(out, test, settings, stats, manifest)
+            finally:
+                if manifest is not None:
+                    manifest.close()
+
+        for temporary_file, output_file in temporary:
+            os.replace(temporary_file, output_file)
+    except BaseException:
+        for temporary_file, output_file in temporary:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+        raise
+
+
+def dry_run(outputs, settings, stats=None, report=print):
+    """
+    Report the size of each .do file (or testbench) of the outputs, the
+    commands they would execute and the simulated time, without writing anything.
+    """
+    totals = [0, 0, 0, 0.0]
+    measured = measuring_settings(settings)
+    for genfile, prologue, tests in outputs:
+        if settings['backend'] == 'sv':
+            size = sum(len(part) for part in testbench_parts(genfile, tests, settings) if not isinstance(part, Test))
+            genfile = testbench_filename(genfile)
+        else:
+            size = sum(len(line) + 1 for line in prologue)
+        for test in tests:
+            if stats is not None:
+                stats.take_peak()
+            start = time.perf_counter()
+            counts = measure_commands(block_commands(test, measured), measured)
+            size += counts[5]
+            if settings['compact'] == '1':
+                forces, runs, examines, stars, seconds = count_commands(test.body, {}, settings)
+                counts[:4] = forces, runs, examines, seconds
+            if stats is not None:
+                stats.add_block(test, time.perf_counter() - start, counts[4], counts[5], counts[0], counts[1], counts[2])
+            for k in range(4):
+                totals[k] += counts[k]
+        report('{0:s}: {1:d} test blocks, {2:d} bytes'.format(genfile, len(tests), size))
+
+    forces, runs, examines, seconds = totals
+    report('{0:d} force, {1:d} run and {2:d} examine commands would be executed'.format(forces, runs, examines))
+    match = TIME_PATTERN.match(settings['timestep'])
+    unit = match.group(2) if match is not None and match.group(2) in TIME_UNITS else 'ns'
+    report('Simulated time: {0:s}{1:s} ({2:d} runs)'.format(format(seconds / TIME_UNITS[unit], '.12g'), unit, runs))
+
+
+def add_meta_command(command, value, settings):
+    """
+    Add meta command to dict if it has not already been declared.
+    """
+    if command in settings or command in REQUIRED_META:
+        settings[command] = value
+    else:
+        settings.commands.append(command + ' ' + value)
+
 
-    out_test_blocks = meta
+def generate_prologue(genfile, logfile, settings):
+    """
+    Return the ModelSim commands which start every generated .do file. With
+    the sv backend, these compile the testbench and run it to the end.
+    """
+    if settings['backend'] == 'sv':
+        return (['vlib ' + settings['vlib'],
+                 'vlog -timescale ' + settings['timescale'] + ' ' + settings['vfile'],
+                 'vlog -sv -timescale ' + settings['timescale'] + ' ' + testbench_filename(genfile),
+                 'vsim ' + testbench_module(genfile) + ' -l ' + logfile] + settings.commands + ['run -all'])
+
+    prologue = ['vlib ' + settings['vlib'],
+                'vlog -timescale ' + settings['timescale'] + ' ' + settings['vfile'],
+                'vsim ' + settings['vmodule'] + ' -l ' + logfile] + settings.commands
+    if settings['compact'] == '1':
+        prologue.append('set msim_timestep ' + settings['timestep'])
+        prologue.append('set msim_manifest ' + settings['manifest'])
+        prologue += TCL_PROCS.replace('SEVEN_SEG_TABLE', ' '.join(SEVEN_SEG[i] for i in range(16))).split('\n')
+        for name, decoder in sorted(settings.functions.decoders.items()):
+            prologue.append('set msim_decoder_{0:s} {{{1:s}}}'.format(name, ' '.join(vector_bits(vector) for vector in decoder.table)))
+    return prologue
+
+
+def generate_meta(statements, settings, report=print):
+    """
+    Generate ModelSim metadata.
+    """
+    for statement in statements:
+        tokens = re.split(r'\s*=\s*|\s+', statement, 1)
+        command = tokens[0]
+        value = tokens[1] if len(tokens) == 2 else ''
+        if command == 'decoder':
+            try:
+                settings.functions.declare(parse_decoder(value))
+            except GenerationError as e:
+                report(str(e))
+                return False
+            continue
+        add_meta_command(command, value, settings)
 
-    for i in range(len(testblocks)):
-        out_test_blocks.append(testblocks[i][testblocks[i].index('{') + 1:-1])
-    with open(meta_dict['genfile'], 'w') as out:
-        out.writelines(';'.join(out_test_blocks).replace(';', '\n'))
+    for command in REQUIRED_META:
+        if command not in settings:
+            report('Syntax Error - missing a definition for \'{0:s}\' in the meta block.'.format(command))
+            return False
 
     return True
 
-if __name__ == '__main__':
-    if len(sys.argv) == 1:
-        filename = input('Enter filename of unit test file: ')
-    elif len(sys.argv) == 2:
-        filename = sys.argv[1]
-    else:
-        print('A unit test file must be passed in as an argument.')
-        sys.exit(0)
 
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-        passed_syntax = check_bracket_pairing(lines)
-        passed_syntax = passed_syntax and check_assert_double_equals(lines)
+def compile(source, options=None, defaults=None, stats=None, dry=False, blocks=None):
+    """
+    Compile a unit test file, given as its text or its lines, into .do files.
+    Defaults replace the default meta values, and options override the values
+    of the meta block. Errors and reports are returned in the result.
+    """
+    messages = []
+    report = messages.append
+    failed = Result(False, messages, [])
+    lines = source.splitlines(True) if isinstance(source, str) else source
+    phase = stats.phase if stats is not None else lambda name: contextlib.nullcontext()
+
+    with phase('check_bracket_pairing'):
+        passed_syntax = check_bracket_pairing(lines, report)
+    with phase('check_assert_double_equals'):
+        passed_syntax = passed_syntax and check_assert_double_equals(lines, report)
+    if not passed_syntax:
+        return failed
+
+    try:
+        with phase('tokenize'):
+            tokens = tokenize(lines)
+        with phase('parse'):
+            metablock, tests = parse(tokens)
+    except GenerationError as e:
+        report(str(e))
+        return failed
+
+    if metablock is None:
+        report('Syntax Error - No meta block found.')
+        return failed
+    settings = Settings(defaults)
+    with phase('generate_meta'):
+        if not generate_meta(metablock.statements, settings, report):
+            return failed
+    if options is not None:
+        settings.update(options)
+
+    if settings['backend'] not in BACKENDS:
+        report('Syntax Error - the backend must be one of {0:s}.'.format(', '.join(BACKENDS)))
+        return failed
+    if settings['backend'] == 'sv':
+        if settings['manifest'] == '1':
+            report('Syntax Error - the sv backend checks its assertions itself, and cannot write a manifest.')
+            return failed
+        if sv_delay(settings['timestep']) is None:
+            report('Syntax Error - the timestep \"{0:s}\" cannot be written to a SystemVerilog testbench.'.format(settings['timestep']))
+            return failed
+        # Testbenches are always unrolled
+        settings['compact'] = '0'
 
-        if passed_syntax and parse_blocks(lines):
-            print('File generation successful')
+    try:
+        shards = int(settings['shards'])
+    except ValueError:
+        shards = 0
+    if shards < 1:
+        report('Syntax Error - the number of shards must be a positive integer.')
+        return failed
+
+    with phase('shard_tests'):
+        if shards == 1:
+            outputs = [(settings['genfile'], generate_prologue(settings['genfile'], settings['logfile'], settings), tests)]
         else:
-            print('Syntax errors are present - file generation aborted')
+            outputs = [(genfile, generate_prologue(genfile, logfile, settings), shard)
+                       for (genfile, logfile), shard in zip(shard_files(settings), shard_tests(tests, shards, settings))]
+
+    if dry:
+        try:
+            with phase('dry_run'):
+                dry_run(outputs, settings, stats, report)
+            with phase('report_coverage'):
+                report_coverage(tests, settings, report)
+        except GenerationError as e:
+            report(str(e))
+            return failed
+        return Result(True, messages, [])
+
+    try:
+        cache_size = int(settings['cache_size'])
+    except ValueError:
+        report('Syntax Error - the cache size must be an integer number of megabytes.')
+        return failed
+    if settings['cache'] != '':
+        os.makedirs(settings['cache'], exist_ok=True)
+    if blocks is not None:
+        settings.blocks = blocks
+        blocks.start(settings)
+
+    try:
+        with phase('write_do_files'):
+            write_do_files(outputs, settings, stats)
+        with phase('report_coverage'):
+            report_coverage(tests, settings, report)
+    except GenerationError as e:
+        report(str(e))
+        return failed
+
+    if blocks is not None:
+        blocks.sweep()
+    if settings['cache'] != '':
+        with phase('evict_cache'):
+            evict_cache(settings['cache'], cache_size << 20)
+    return Result(True, messages, shard_files(settings))
+
+
+def compile_file(filename, options=None, defaults=None, stats=None, dry=False, blocks=None):
+    """
+    Compile the unit test file with the given name, see compile().
+    """
+    with open(filename, 'r') as file:
+        return compile(file.readlines(), options, defaults, stats, dry, blocks)
+
+
+def modified_times(filenames):
+    """
+    Return the modification time of each file, or None for missing files.
+    """
+    times = {}
+    for filename in filenames:
+        try:
+            times[filename] = os.stat(filename).st_mtime_ns
+        except OSError:
+            times[filename] = None
+    return times
+
+
+def watch_file(filename, options=None, compiled=None, poll=WATCH_INTERVAL, report=print):
+    """
+    Compile a unit test file, then compile it again whenever it changes, until
+    interrupted. Only the test blocks which changed are generated again, and
+    the .do files are replaced once they are complete. compiled(result) is
+    called after each successful compilation, and when one of the Verilog
+    files named by the meta block changes (which does not change the .do
+    files), e.g. to simulate and check the tests again. Files which cannot be
+    read or written are reported, and compiled again once they change.
+    """
+    blocks = BlockCache()
+    seen = {}
+    result = None
+    while True:
+        times = modified_times([filename] + blocks.sources)
+        if times != seen:
+            if result is None or times[filename] != seen.get(filename):
+                start = time.perf_counter()
+                try:
+                    result = compile_file(filename, options, blocks=blocks)
+                except OSError as e:
+                    report('{0:s}: File generation failed - {1}'.format(filename, e))
+                    result = None
+                    seen = times
+                    time.sleep(poll)
+                    continue
+                for message in result.messages:
+                    report(message)
+                if result.success:
+                    report('{0:s}: generated {1:d} of {2:d} test blocks in {3:.3f}s'.format(
+                        filename, blocks.built, len(blocks.used), time.perf_counter() - start))
+                else:
+                    report('{0:s}: Syntax errors are present - file generation aborted'.format(filename))
+            else:
+                report('{0:s}: {1:s} changed'.format(filename, ', '.join(sorted(
+                    path for path in blocks.sources if times[path] != seen.get(path)))))
+            seen = modified_times([filename] + blocks.sources)
+            if compiled is not None and result.success:
+                compiled(result)
+        time.sleep(poll)
+
+
+def batch_defaults(filename):
+    """
+    Return the default .do file and logfile of a unit test file compiled in a
+    batch, named after the unit test file so that files without a genfile or
+    logfile in their meta block do not overwrite each other.
+    """
+    root = os.path.splitext(filename)[0]
+    return {'genfile': root + '.do', 'logfile': root + '_output.txt'}
+
+
+def compile_batch(filenames, options=None, jobs=None, dry=False):
+    """
+    Compile many unit test files across a process pool, returning their results
+    in order. Each process compiles many files, so the cost of starting the
+    interpreter is only paid once per process.
+    """
+    chunksize = max(1, len(filenames) // ((jobs or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(compile_file, filenames, itertools.repeat(options), [batch_defaults(f) for f in filenames],
+                             itertools.repeat(None), itertools.repeat(dry), chunksize=chunksize))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate ModelSim .do files from unit test files.')
+    parser.add_argument('filenames', nargs='*', metavar='filename',
+                        help='the unit test files, several files are compiled in parallel')
+    parser.add_argument('--jobs', type=int, help='the number of files to compile at once (default: number of cores)')
+    parser.add_argument('--shards', type=int, help='split the test blocks into this many .do files, each with its own logfile')
+    parser.add_argument('--cache', help='reuse the output of unchanged test blocks from this directory')
+    parser.add_argument('--compact', action='store_true', help='write for and permute blocks as Tcl loops instead of unrolling them')
+    parser.add_argument('--bus', action='store_true', help='force and examine ranged variables as whole buses instead of bit by bit')
+    parser.add_argument('--manifest', action='store_true', help='write the expected values to a manifest next to the .do file instead of echoing them')
+    parser.add_argument('--backend', choices=BACKENDS, help='write a .do file of Tcl commands (do) or a SystemVerilog testbench run by a minimal .do file (sv)')
+    parser.add_argument('--optimize', action='store_true', help='leave out forces which do not change a signal, merge runs and examine each assertion with a single command')
+    parser.add_argument('--stats', action='store_true', help='report the time and peak memory of each phase and test block, and the commands emitted')
+    parser.add_argument('--dry-run', action='store_true', help='report the size of the .do file and the simulated time without writing anything')
+    parser.add_argument('--watch', action='store_true', help='keep running, and generate the .do file again whenever the unit test file changes')
+    args = parser.parse_args()
+
+    filenames = args.filenames
+    if not filenames:
+        filenames = [input('Enter filename of unit test file: ')]
+    if len(filenames) > 1 and args.stats:
+        parser.error('--stats can only be used with a single unit test file')
+    if args.watch and (len(filenames) > 1 or args.stats or args.dry_run):
+        parser.error('--watch can only be used with a single unit test file, without --stats or --dry-run')
+
+    options = {}
+    if args.shards is not None:
+        options['shards'] = str(args.shards)
+    if args.cache is not None:
+        options['cache'] = args.cache
+    if args.compact:
+        options['compact'] = '1'
+    if args.bus:
+        options['bus'] = '1'
+    if args.manifest:
+        options['manifest'] = '1'
+    if args.backend is not None:
+        options['backend'] = args.backend
+    if args.optimize:
+        options['optimize'] = '1'
+
+    if len(filenames) > 1:
+        results = compile_batch(filenames, options, args.jobs, args.dry_run)
+        for filename, result in zip(filenames, results):
+            for message in result.messages:
+                print('{0:s}: {1:s}'.format(filename, message))
+            if not result.success:
+                print('{0:s}: Syntax errors are present - file generation aborted'.format(filename))
+        succeeded = sum(1 for result in results if result.success)
+        print('{0:d} of {1:d} files generated successfully'.format(succeeded, len(results)))
+        sys.exit(0 if succeeded == len(results) else 1)
+
+    if args.watch:
+        try:
+            watch_file(filenames[0], options)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    stats = Stats() if args.stats else None
+    result = compile_file(filenames[0], options, None, stats, args.dry_run)
+    for message in result.messages:
+        print(message)
+    if not result.success:
+        print('Syntax errors are present - file generation aborted')
+    elif not args.dry_run:
+        print('File generation successful')
+
+    if stats is not None:
+        print('')
+        stats.report()
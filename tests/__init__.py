@@ -0,0 +1,4 @@
+"""
+Tests of msimunitgen.py and msim_unittest.py, which simulate the generated
+.do files and testbenches with the stand-in simulator of the benchmarks.
+"""
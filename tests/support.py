@@ -0,0 +1,89 @@
+"""
+Compiles unit test sources into a temporary directory, simulates the .do files
+with benchmarks/stub_vsim.py and checks their transcripts.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import msim_manifest
+import msim_unittest
+import msimunitgen
+from benchmarks import stub_vsim
+
+META = 'meta {\n    vfile = design.v;\n    vmodule = design;\n}\n'
+
+
+class GeneratorTestCase(unittest.TestCase):
+    """
+    A test case with a temporary directory which the unit test files are
+    compiled into.
+    """
+
+    # The meta block prepended to every source
+    meta = META
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def compile(self, source, options=None, name='out'):
+        """
+        Compile a unit test source (with the meta block prepended) into name.do,
+        failing the test if it does not compile. Returns the result.
+        """
+        defaults = {'genfile': self.path(name + '.do'), 'logfile': self.path(name + '.log')}
+        result = msimunitgen.compile(self.meta + source, options, defaults)
+        self.assertTrue(result.success, result.messages)
+        return result
+
+    def simulate(self, source, options=None, name='out'):
+        """
+        Compile, simulate and check a unit test source, returning the
+        checker, its failures and its test blocks.
+        """
+        options = dict(options or {})
+        result = self.compile(source, options, name)
+        failures = []
+        blocks = []
+        checker = msim_unittest.TranscriptChecker(report=lambda message: None, record=failures.append, results=blocks.append)
+        for dofile, logfile in result.files:
+            stub_vsim.simulate(dofile)
+            if options.get('manifest') == '1':
+                checker.manifest = msim_manifest.read_manifest(msim_manifest.manifest_filename(dofile))
+                msim_unittest.check_transcript(logfile, checker)
+            else:
+                msim_unittest.scan_transcript(logfile, checker)
+        return checker, failures, blocks
+
+    def verdicts(self, source, options=None):
+        """
+        Return the test blocks and failures of a simulated source, without
+        the lines of the transcript and with the values of the failures as
+        integers, since .do files examine slices of a bus in hexadecimal.
+        """
+        options = dict(options or {})
+        base = 16 if options.get('bus') == '1' and options.get('backend') != 'sv' else 2
+        checker, failures, blocks = self.simulate(source, options)
+        return blocks, [failure._replace(line=None, expected=int(failure.expected, base), actual=int(failure.actual, base))
+                        for failure in failures]
+
+    def assertSameVerdicts(self, source, options, changes):
+        """
+        Assert that a source with failing assertions simulates to the same
+        verdicts with the options, and with the options changed by changes.
+        """
+        expected = self.verdicts(source, options)
+        self.assertTrue(expected[1], 'the source should have failing assertions')
+        self.assertEqual(self.verdicts(source, dict(options, **changes)), expected)
+
+    def read(self, name):
+        with open(self.path(name), 'r') as file:
+            return file.read()
@@ -0,0 +1,31 @@
+"""
+Tests of SystemVerilog testbenches, which must simulate to the same verdicts
+as the .do files written for the same tests.
+"""
+
+import unittest
+
+from benchmarks import synthetic
+from tests.support import GeneratorTestCase
+
+SOURCE = ('test forced {\n    A = 1;\n    B[3:0] = 0101;\n    assert A == 1;\n    assert B[3:0] == 0111;\n    run 10ns;\n'
+          '    echo "halfway";\n    force {C} 1;\n    assert C == 1;\n    B[3:0] = 4\'hA;\n    assert B[3:0] == 4\'hB;\n'
+          '    assert B[1:0] == 10;\n}\n'
+          'test permuted {\n    permute {\n        D[1:0] = *;\n        assert D[1] == 1;\n    }\n}\n')
+SV = {'backend': 'sv'}
+
+
+class BackendTest(GeneratorTestCase):
+
+    def test_sample_source(self):
+        self.assertSameVerdicts(SOURCE, {}, SV)
+        self.assertSameVerdicts(SOURCE, {'bus': '1'}, SV)
+
+    def test_synthetic_sources(self):
+        source = ''.join(synthetic.test_block(i, permute_width=3, for_depth=2, bus_width=4) for i in range(6))
+        self.assertSameVerdicts(source, {}, SV)
+        self.assertSameVerdicts(source, {'bus': '1'}, SV)
+
+
+if __name__ == '__main__':
+    unittest.main()
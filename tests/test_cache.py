@@ -0,0 +1,73 @@
+"""
+Tests of the cache of generated test blocks, which several processes may share.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import msimunitgen
+from tests.support import META, GeneratorTestCase
+
+SOURCE = 'test t {\n    permute {\n        A[3:0] = *;\n        assert B == 1;\n    }\n}\n'
+
+
+class SharedCacheTest(GeneratorTestCase):
+
+    def write_files(self, count, meta=''):
+        filenames = []
+        for i in range(count):
+            filename = self.path('f{0:d}.txt'.format(i))
+            with open(filename, 'w') as file:
+                file.write(META.replace('}', meta + '}') + SOURCE)
+            filenames.append(filename)
+        return filenames
+
+    def test_batch_sharing_a_cache(self):
+        for meta in ('', '    cache_size = 0;\n'):
+            filenames = self.write_files(16, meta)
+            options = {'cache': self.path('cache'), 'manifest': '1'}
+            for result in msimunitgen.compile_batch(filenames, options, jobs=8):
+                self.assertTrue(result.success, result.messages)
+            outputs = set()
+            for i in range(16):
+                with open(self.path('f{0:d}.do'.format(i))) as dofile:
+                    outputs.add(dofile.read().replace('f{0:d}_'.format(i), 'f_'))
+            self.assertEqual(len(outputs), 1)
+        self.assertFalse([name for name in os.listdir(self.path('cache')) if name.endswith('.tmp')])
+
+    def test_lost_races_are_ignored(self):
+        cache = self.path('cache')
+        os.mkdir(cache)
+        msimunitgen.replace_entry(os.path.join(cache, 'evicted.tmp'), os.path.join(cache, 'entry'))
+        msimunitgen.remove_entry(os.path.join(cache, 'entry'))
+        msimunitgen.touch_entry(os.path.join(cache, 'entry'))
+        with open(os.path.join(cache, 'kept'), 'w') as entry:
+            entry.write('kept')
+        msimunitgen.evict_cache(cache, 1 << 20)
+        self.assertEqual(os.listdir(cache), ['kept'])
+
+    def test_entries_of_other_versions(self):
+        options = {'cache': self.path('cache')}
+        self.compile(SOURCE, options)
+        entries = os.listdir(self.path('cache'))
+        self.compile(SOURCE, options)
+        self.assertEqual(os.listdir(self.path('cache')), entries)
+        with mock.patch('msimunitgen.CACHE_VERSION', msimunitgen.CACHE_VERSION + 1):
+            self.compile(SOURCE, options)
+        self.assertEqual(len(os.listdir(self.path('cache'))), 2 * len(entries))
+
+    def test_interrupted_generation_leaves_no_temporary_files(self):
+        def interrupted(test, settings, manifest=None):
+            yield 'force {A} 1\n'
+            raise KeyboardInterrupt()
+
+        for options in ({'manifest': '1'}, {'backend': 'sv'}, {'cache': self.path('cache'), 'manifest': '1'}):
+            with mock.patch('msimunitgen.emit_block', interrupted), self.assertRaises(KeyboardInterrupt):
+                self.compile(SOURCE, options)
+            self.assertEqual(os.listdir(self.directory), ['cache'] if 'cache' in options else [])
+        self.assertEqual(os.listdir(self.path('cache')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of compact .do files, in which for and permute blocks are written as Tcl
+loops, and of the blocks which are unrolled instead.
+"""
+
+import unittest
+
+from tests.support import GeneratorTestCase
+
+COMMANDS = ('force ', 'run ', 'echo ', 'examine ')
+
+
+class CompactFallbackTest(GeneratorTestCase):
+
+    def commands(self, source, options):
+        """
+        Return the force, run, echo and examine commands of the .do file of a source.
+        """
+        self.compile(source, options)
+        return [line for line in self.read('out.do').splitlines() if line.startswith(COMMANDS)]
+
+    def assertUnrolled(self, source):
+        self.assertEqual(self.commands(source, {'compact': '1'}), self.commands(source, {'compact': '0'}))
+
+    def test_permute_of_for_with_wildcards(self):
+        self.assertUnrolled('test t {\n    permute {\n        for i in [0:2] {\n            A[i] = *;\n        }\n'
+                            '        assert B == 1;\n    }\n}\n')
+        for mode in ('gray', 'sample 3', 'cover 2'):
+            self.assertUnrolled('test t {\n    permute ' + mode + ' {\n        for i in [0:2] {\n            A[i] = *;\n'
+                                '        }\n        assert B == 1;\n    }\n}\n')
+
+    def test_integer_operator_of_true_division(self):
+        self.assertUnrolled('test t {\n    for i in [0:3] {\n        for j in [0:1] {\n'
+                            '            A[0] = bin((i*4+j)/(2**j)%2, 1);\n            assert B == 1;\n        }\n    }\n}\n')
+        self.assertUnrolled('test t {\n    for i in [0:7] {\n        A[2:0] = bin(i/2//1, 3);\n        assert B == 1;\n    }\n}\n')
+
+    def test_true_division_is_looped(self):
+        self.compile('test t {\n    for i in [0:7] {\n        A[3:0] = bin(i*8/3, 4);\n        assert B == 1;\n    }\n}\n',
+                     {'compact': '1'})
+        self.assertIn('for {set _i 0}', self.read('out.do'))
+
+    def test_bus_slices_of_loop_variables(self):
+        source = ('test t {\n    for i in [0:3] {\n        A[i:0] = bin(2**(i+1)-1, i+1);\n        assert A[i:0] == bin(2**i, i+1);\n'
+                  '        assert B[i:0] == bin(0, i+1);\n    }\n}\n')
+        for manifest in ('0', '1'):
+            self.assertSameVerdicts(source, {'bus': '1', 'manifest': manifest}, {'compact': '1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
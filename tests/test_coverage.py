@@ -0,0 +1,105 @@
+"""
+Tests of the permute blocks which run a subset of the permutations (sampled
+or covering arrays), and of the coverage reported for them.
+"""
+
+import itertools
+import unittest
+
+import msimunitgen
+from tests.support import META, GeneratorTestCase
+
+
+def covered_tuples(combinations, stars, strength):
+    """
+    Return the number of t-wise tuples of the combinations, and how many of
+    them the combinations cover, by going through every tuple.
+    """
+    total = covered = 0
+    for columns in itertools.combinations(range(stars), strength):
+        seen = set(tuple((c >> (stars - 1 - k)) & 1 for k in columns) for c in combinations)
+        total += 1 << strength
+        covered += len(seen)
+    return total, covered
+
+
+class CoveringArrayTest(unittest.TestCase):
+
+    def test_every_tuple_is_covered(self):
+        for stars, strength in ((2, 2), (3, 2), (6, 2), (10, 2), (5, 3), (8, 3), (6, 4)):
+            combinations = msimunitgen.covering_array(stars, strength)
+            total, covered = covered_tuples(combinations, stars, strength)
+            self.assertEqual(covered, total, (stars, strength))
+            self.assertEqual(msimunitgen.tuple_coverage(combinations, stars, strength), 1.0)
+            self.assertTrue(all(0 <= c < 1 << stars for c in combinations))
+
+    def test_fewer_combinations_than_the_full_space(self):
+        self.assertLessEqual(len(msimunitgen.covering_array(10, 2)), 12)
+        self.assertLess(len(msimunitgen.covering_array(8, 3)), 1 << 8)
+        self.assertEqual(sorted(msimunitgen.covering_array(3, 5)), list(range(8)))
+
+    def test_partial_coverage(self):
+        combinations = (0b0010, 0b0011, 0b0101, 0b1000, 0b1001)
+        total, covered = covered_tuples(combinations, 4, 2)
+        self.assertEqual((total, covered), (24, 20))
+        self.assertEqual(msimunitgen.tuple_coverage(combinations, 4, 2), 20 / 24.0)
+        self.assertEqual(msimunitgen.tuple_coverage((), 4, 2), 0.0)
+
+
+class SampleTest(unittest.TestCase):
+
+    def test_samples_are_seeded(self):
+        for stars, count in ((4, 5), (4, 12), (20, 100)):
+            sample = msimunitgen.sample_combinations(stars, count, 7)
+            self.assertEqual(len(set(sample)), count)
+            self.assertEqual(list(sample), sorted(sample))
+            msimunitgen.sample_combinations.cache_clear()
+            self.assertEqual(msimunitgen.sample_combinations(stars, count, 7), sample)
+            self.assertNotEqual(msimunitgen.sample_combinations(stars, count, 8), sample)
+
+    def test_samples_of_the_full_space(self):
+        self.assertEqual(msimunitgen.sample_combinations(3, 8, 1), tuple(range(8)))
+        self.assertEqual(msimunitgen.sample_combinations(3, 100, 1), tuple(range(8)))
+
+    def test_modes(self):
+        self.assertEqual(msimunitgen.parse_permute_mode(['pairwise']), ('cover', (2,)))
+        self.assertEqual(msimunitgen.parse_permute_mode(['cover', '3']), ('cover', (3,)))
+        self.assertEqual(msimunitgen.parse_permute_mode(['sample', '5']), ('sample', (5, 0)))
+        self.assertEqual(msimunitgen.parse_permute_mode(['sample', '5', 'seed', '9']), ('sample', (5, 9)))
+        for words in (['cover', '0'], ['sample', 'x'], ['sample', '5', 'seed'], ['sample', '5', 'salt', '9']):
+            self.assertIsNone(msimunitgen.parse_permute_mode(words))
+
+
+class SubsetPermuteTest(GeneratorTestCase):
+
+    SOURCE = ('test t {\n    permute sample 5 seed S {\n        A[3:0] = *;\n        assert B == 1;\n    }\n'
+              '    permute cover 2 {\n        C[4:0] = *;\n        assert B == 1;\n    }\n}\n')
+
+    def test_generation_is_deterministic(self):
+        outputs = []
+        for seed, name in (('3', 'a'), ('3', 'b'), ('4', 'c')):
+            self.compile(self.SOURCE.replace('S', seed), name=name)
+            outputs.append(self.read(name + '.do').replace(name + '.log', 'out.log'))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertNotEqual(outputs[0], outputs[2])
+
+    def test_coverage_report(self):
+        result = self.compile(self.SOURCE.replace('S', '3'))
+        line = META.count('\n') + 2
+        sample = msimunitgen.sample_combinations(4, 5, 3)
+        total, covered = covered_tuples(sample, 4, 2)
+        cover = len(msimunitgen.covering_array(5, 2))
+        self.assertEqual([message for message in result.messages if message.startswith('Permute block')], [
+            'Permute block on line {0:d}: 5 of 2^4 combinations (31.25%), covering {1:.2f}% of 2-wise tuples'.format(
+                line, 100.0 * covered / total),
+            'Permute block on line {0:d}: {1:d} of 2^5 combinations ({2:.4g}%), covering 100.00% of 2-wise tuples'.format(
+                line + 4, cover, 100.0 * cover / 32)])
+
+    def test_simulated_permutations(self):
+        checker, failures, blocks = self.simulate(self.SOURCE.replace('S', '3'))
+        cover = len(msimunitgen.covering_array(5, 2))
+        self.assertEqual([(block.tests, block.failed) for block in blocks], [(5 + cover, 5 + cover)])
+
+
+if __name__ == '__main__':
+    unittest.main()
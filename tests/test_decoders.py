@@ -0,0 +1,77 @@
+"""
+Tests of the decoders declared in the meta block, which the values of a
+compilation can call like the built-in functions.
+"""
+
+import os
+import unittest
+
+import msimunitgen
+from tests.support import META, GeneratorTestCase
+
+DECODERS = ('    decoder digits = bcd 2;\n    decoder state = table 001 010 100;\n'
+            '    decoder code = gray 3;\n    decoder select = onehot 4;\n')
+
+SOURCE = ('test t {\n    A[7:0] = digits(25);\n    B[2:0] = state(2);\n    C[2:0] = code(5);\n    D[3:0] = select(1);\n'
+          '    assert E[7:0] == digits(25);\n    assert E[7:0] == bin(25, 8);\n}\n')
+
+
+class DecoderTest(GeneratorTestCase):
+
+    meta = META.replace('}', DECODERS + '}')
+
+    def messages(self, decoders, source):
+        """
+        Compile a source whose meta block declares decoders, returning the
+        messages of the failed compilation.
+        """
+        defaults = {'genfile': self.path('out.do'), 'logfile': self.path('out.log')}
+        result = msimunitgen.compile(META.replace('}', decoders + '}') + source, None, defaults)
+        self.assertFalse(result.success)
+        return result.messages
+
+    def test_calls(self):
+        self.compile(SOURCE)
+        forces = [line for line in self.read('out.do').splitlines() if line.startswith('force ')]
+        self.assertEqual([force[-1] for force in forces], list('00100101' '100' '111' '0010'))
+
+    def test_verdicts(self):
+        for options in ({}, {'bus': '1'}, {'compact': '1'}, {'manifest': '1'}, {'backend': 'sv'}):
+            source = SOURCE.replace('A[7:0]', 'E[7:0]')
+            checker, failures, blocks = self.simulate(source, options)
+            self.assertEqual([(block.tests, block.failed) for block in blocks], [(2, 1)], options)
+            self.assertEqual(len(failures), 1, options)
+
+    def test_unknown_functions(self):
+        messages = self.messages('', 'test t {\n    A[3:0] = digits(1);\n}\n')
+        self.assertIn('Semantic Error - unknown function "digits()".', messages)
+
+    def test_arguments_outside_of_the_table(self):
+        messages = self.messages('    decoder digits = bcd 1;\n', 'test t {\n    A[3:0] = digits(10);\n}\n')
+        self.assertTrue(any('digits() decoder' in message for message in messages), messages)
+
+    def test_invalid_declarations(self):
+        for decoders, error in (
+                ('    decoder d = bcd 1;\n    decoder d = gray 2;\n', 'the decoder "d" is declared more than once'),
+                ('    decoder bin = gray 2;\n', 'cannot replace the built-in bin() function'),
+                ('    decoder d = ascii 2;\n', 'decoders are declared as'),
+                ('    decoder d = gray 0;\n', 'decoders are declared as'),
+                ('    decoder d = gray 17;\n', 'would have more than 65536 entries'),
+                ('    decoder d = table 01 1;\n', 'must have entries of the same width')):
+            messages = self.messages(decoders, 'test t {\n    A[3:0] = 0000;\n}\n')
+            self.assertTrue(any(error in message for message in messages), messages)
+
+    def test_declarations_change_the_cache_key(self):
+        options = {'cache': self.path('cache')}
+        self.compile(SOURCE, options)
+        entries = len(os.listdir(self.path('cache')))
+        self.compile(SOURCE, options)
+        self.assertEqual(len(os.listdir(self.path('cache'))), entries)
+        self.meta = self.meta.replace('table 001 010 100', 'table 001 100 010')
+        self.compile(SOURCE, options)
+        self.assertEqual(len(os.listdir(self.path('cache'))), 2 * entries)
+        self.assertIn('force {B[1]} 1', self.read('out.do'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests of --dry-run, whose reported sizes and commands should be those of the
+files which would be written.
+"""
+
+import re
+import unittest
+
+import msimunitgen
+from tests.support import META, GeneratorTestCase
+
+SOURCE = '''test gray {
+    permute gray {
+        A[3:0] = *;
+        B[7:0] = 10100101;
+        run 2ns;
+        C = *;
+        echo checking;
+        assert D[3:0] == 0101;
+        assert E == 1;
+    }
+}
+test nested {
+    for i in [0:3] {
+        permute {
+            X[1:0] = *;
+            Y = 1;
+            assert Z[1:0] == bin(i, 2);
+        }
+    }
+    permute sample 5 seed 2 {
+        S[5:0] = *;
+        T = 0;
+        assert U == 0;
+    }
+    permute cover 2 {
+        V[4:0] = *;
+        run 1ns;
+        assert W[1:0] == 11;
+    }
+}
+'''
+
+REPORT = re.compile(r'^(\S+): \d+ test blocks, (\d+) bytes$')
+COMMANDS = re.compile(r'^(\d+) force, (\d+) run and (\d+) examine commands would be executed$')
+
+
+class DryRunTest(GeneratorTestCase):
+
+    def dry_run(self, options, source=SOURCE):
+        """
+        Return the size and force, run and examine commands reported by a dry run.
+        """
+        defaults = {'genfile': self.path('out.do'), 'logfile': self.path('out.log')}
+        result = msimunitgen.compile(META + source, options, defaults, dry=True)
+        self.assertTrue(result.success, result.messages)
+        size = commands = None
+        for message in result.messages:
+            if REPORT.match(message):
+                size = int(REPORT.match(message).group(2))
+            elif COMMANDS.match(message):
+                commands = tuple(int(count) for count in COMMANDS.match(message).groups())
+        return size, commands
+
+    def written(self, options, source=SOURCE):
+        """
+        Return the size and force, run and examine commands of the file written.
+        """
+        self.compile(source, options)
+        text = self.read('out_tb.sv' if options.get('backend') == 'sv' else 'out.do')
+        counts = {'force': 0, 'run': 0, 'examine': 0}
+        for line in text.splitlines(True):
+            command = msimunitgen.line_command(line)
+            if command in counts:
+                counts[command] += 1
+        return len(text), (counts['force'], counts['run'], counts['examine'])
+
+    def test_unrolled(self):
+        for options in ({}, {'bus': '1'}, {'backend': 'sv'}, {'backend': 'sv', 'bus': '1'}):
+            self.assertEqual(self.dry_run(options), self.written(options), options)
+
+    def test_optimized(self):
+        for options in ({}, {'bus': '1'}, {'backend': 'sv'}):
+            options = dict(options, optimize='1')
+            self.assertEqual(self.dry_run(options), self.written(options), options)
+
+    def test_optimized_forces_around_permute_blocks(self):
+        # Forces repeating those before a permute block, or those of its last combination after it, are left out
+        for source in ('test t {\n    B = 1;\n    permute {\n        A[1:0] = *;\n        B = 1;\n        assert C == 1;\n    }\n'
+                       '    B = 1;\n    A[1:0] = 11;\n    assert C == 0;\n}\n',
+                       'test t {\n    permute gray {\n        A[2:0] = *;\n        assert C == 1;\n    }\n'
+                       '    A[2:0] = 100;\n    A[2] = 1;\n    assert C == 0;\n}\n',
+                       'test t {\n    for i in [0:2] {\n        permute sample 3 seed 1 {\n            A[3:0] = *;\n'
+                       '            B = 1;\n            assert C == 1;\n        }\n        A[3:0] = bin(i, 4);\n    }\n}\n',
+                       'test t {\n    B = 1;\n    permute {\n        A = *;\n        restart;\n        B = 1;\n'
+                       '        assert C == 1;\n    }\n    B = 1;\n}\n'):
+            self.assertEqual(self.dry_run({'optimize': '1'}, source), self.written({'optimize': '1'}, source))
+
+    def test_optimized_runs_around_permute_blocks(self):
+        # The runs before and after the block are merged with those at its start and end, but counted on their own
+        source = ('test t {\n    run 2ns;\n    permute {\n        assert C == 1;\n        B = *;\n        run 1ns;\n    }\n'
+                  '    run 3ns;\n    assert C == 0;\n}\n')
+        size, (forces, runs, examines) = self.dry_run({'optimize': '1'}, source)
+        written_size, (written_forces, written_runs, written_examines) = self.written({'optimize': '1'}, source)
+        self.assertEqual((forces, runs - 2, examines), (written_forces, written_runs, written_examines))
+
+    def test_compact(self):
+        # The Tcl loops execute the commands of every permutation, as unrolled binary permute blocks do
+        binary = SOURCE.replace('permute gray', 'permute')
+        self.assertEqual(self.dry_run({'compact': '1'})[0], self.written({'compact': '1'})[0])
+        self.assertEqual(self.dry_run({'compact': '1'}, binary)[1], self.written({}, binary)[1])
+
+    def test_large_permute_is_not_expanded(self):
+        source = 'test t {\n    permute gray {\n        A[39:0] = *;\n        B[7:0] = 10101010;\n        assert C == 1;\n    }\n}\n'
+        forces, runs, examines = self.dry_run({}, source)[1]
+        self.assertEqual((forces, runs, examines), (40 + 8 + (1 << 40) - 1, 1 << 40, 1 << 40))
+
+
+if __name__ == '__main__':
+    unittest.main()
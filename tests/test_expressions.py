@@ -0,0 +1,44 @@
+"""
+Tests of the integer expressions of indices and function arguments, which are
+compiled from their syntax tree instead of being passed to eval().
+"""
+
+import unittest
+
+import msimunitgen
+from tests.support import META
+
+
+class ExpressionTest(unittest.TestCase):
+
+    def assertRejected(self, value):
+        result = msimunitgen.compile(META + 'test t {\n    A[3:0] = bin(' + value + ', 4);\n}\n', None,
+                                     {'genfile': 'unused.do', 'logfile': 'unused.log'}, dry=True)
+        self.assertFalse(result.success)
+        self.assertIn('cannot be evaluated', result.messages[-1])
+
+    def test_allowed_operators(self):
+        env = {'i': 6}
+        self.assertEqual(msimunitgen.evaluate('(i*3 + 2**3 - 1) % 16 // 2', env), 4)
+        self.assertEqual(msimunitgen.evaluate('(i << 2 | 1) ^ ~i & 0xF >> 1', env), 24)
+        self.assertEqual(msimunitgen.evaluate('-i + +i', env), 0)
+
+    def test_names_outside_the_loop_variables(self):
+        for value in ('__import__("os").getpid()', 'open("x")', 'abs(-1)', 'i', 'True'):
+            self.assertRejected(value)
+
+    def test_attributes_and_other_syntax(self):
+        for value in ('(1).real', '"1"', '[1][0]', 'lambda: 1', '1 if 1 else 0', '1 < 2', '1.5', 'not 1'):
+            self.assertRejected(value)
+
+    def test_values_too_large(self):
+        for value in ('2**15000', '1 << 15000', '2**8000 * 2**8000', '(2**8000 * 2**8000) % 16'):
+            self.assertRejected(value)
+        result = msimunitgen.compile(META + 'test t {\n    A[3:0] = bin(1 << 8000, 4);\n}\n', None,
+                                     {'genfile': 'unused.do', 'logfile': 'unused.log'}, dry=True)
+        self.assertFalse(result.success)
+        self.assertIn('overflow from the bin() function', result.messages[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests of following a transcript while the simulator writes it, and of
+checking many transcripts in a process pool.
+"""
+
+import shlex
+import sys
+import time
+import unittest
+
+import msim_unittest
+from tests.support import GeneratorTestCase
+
+# A simulator which copies a finished transcript a line at a time, in two
+# writes per line, then sleeps for the given number of seconds
+SLOW_SIMULATOR = (
+    'import sys, time\n'
+    'with open(sys.argv[1]) as source, open(sys.argv[2], "w") as transcript:\n'
+    '    for line in source:\n'
+    '        for part in (line[:3], line[3:]):\n'
+    '            transcript.write(part)\n'
+    '            transcript.flush()\n'
+    '            time.sleep(0.0005)\n'
+    'time.sleep(float(sys.argv[3]))\n')
+
+# 16 assertions, of which 15 fail
+SOURCE = 'test t {\n    permute {\n        A[3:0] = *;\n        run 1ns;\n        assert A[3:0] == 0000;\n    }\n}\n'
+
+
+class FollowTranscriptTest(GeneratorTestCase):
+
+    def test_simulator_without_transcript(self):
+        with self.assertRaises(FileNotFoundError) as raised:
+            msim_unittest.follow_transcript(self.path('missing.log'), msim_unittest.TranscriptChecker(), lambda: False, poll=0)
+        self.assertEqual(raised.exception.strerror, 'the simulator finished without writing it')
+
+    def test_finished_transcript(self):
+        with open(self.path('out.log'), 'w') as transcript:
+            transcript.write('run 4ns\necho "assert 1 t"\n# assert 1 t\nexamine {A}\n# St0\n')
+        checker = msim_unittest.TranscriptChecker(report=lambda message: None)
+        checker, stopped = msim_unittest.follow_transcript(self.path('out.log'), checker, lambda: False, poll=0)
+        self.assertEqual((checker.num_tests, checker.num_failed, stopped), (1, 1, False))
+
+    def follow(self, max_failures, sleep):
+        """
+        Follow the transcript of SOURCE as a slow simulator writes it,
+        returning the checker, whether it was stopped, its test blocks and
+        the seconds it took.
+        """
+        self.simulate(SOURCE, name='full')
+        blocks = []
+        checker = msim_unittest.TranscriptChecker(report=lambda message: None, results=blocks.append)
+        process = msim_unittest.start_simulator(' '.join(shlex.quote(argument) for argument in (
+            sys.executable, '-c', SLOW_SIMULATOR, self.path('full.log'), self.path('out.log'), str(sleep))))
+        start = time.monotonic()
+        try:
+            checker, stopped = msim_unittest.follow_transcript(self.path('out.log'), checker, lambda: process.poll() is None,
+                                                               lambda: msim_unittest.stop_simulator(process), max_failures, poll=0.01)
+        finally:
+            msim_unittest.stop_simulator(process)
+            process.wait()
+        return checker, stopped, blocks, time.monotonic() - start
+
+    def test_running_simulator(self):
+        checker, stopped, blocks, seconds = self.follow(0, 0)
+        self.assertFalse(stopped)
+        self.assertEqual((checker.num_tests, checker.num_failed), (16, 15))
+        self.assertEqual([(block.test, block.tests, block.failed) for block in blocks], [('t', 16, 15)])
+
+    def test_stop_after_failures(self):
+        checker, stopped, blocks, seconds = self.follow(3, 60)
+        self.assertTrue(stopped)
+        self.assertLess(seconds, 30)
+        self.assertEqual(checker.num_failed, 3)
+        self.assertEqual([(block.test, block.failed) for block in blocks], [('t', 3)])
+
+
+class CheckTranscriptsTest(GeneratorTestCase):
+
+    def test_merged_counts(self):
+        filenames = []
+        scanned = []
+        for i in range(6):
+            name = 'out{0:d}'.format(i)
+            checker, failures, blocks = self.simulate(SOURCE.replace('0000', format(i, '04b')).replace('test t', 'test t' + str(i % 2)),
+                                                      name=name)
+            filenames.append(self.path(name + '.log'))
+            self.assertEqual((checker.num_tests, checker.num_failed), (16, 15))
+            scanned += blocks
+        filenames.append(self.path('missing.log'))
+
+        messages = []
+        blocks = []
+        merged = msim_unittest.check_transcripts(filenames, jobs=3, report=messages.append, results=blocks.append)
+        self.assertEqual((merged.num_tests, merged.num_failed), (6 * 16, 6 * 15))
+        self.assertEqual(blocks, scanned)
+        self.assertEqual(len([message for message in messages if 'failed on line' in message]), 6 * 15)
+        self.assertTrue(messages[-1].startswith(self.path('missing.log') + ': Cannot read the transcript'), messages[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Tests of sized Verilog literals and the bit vectors values are evaluated into.
+"""
+
+import unittest
+
+import msimunitgen
+from msimunitgen import Vector
+from tests.support import META, GeneratorTestCase
+
+
+class LiteralTest(unittest.TestCase):
+
+    def assertRejected(self, statement, error):
+        result = msimunitgen.compile(META + 'test t {\n    ' + statement + ';\n}\n', None,
+                                     {'genfile': 'unused.do', 'logfile': 'unused.log'}, dry=True)
+        self.assertFalse(result.success)
+        self.assertTrue(any(error in message for message in result.messages), result.messages)
+
+    def test_sized_literals(self):
+        self.assertEqual(msimunitgen.parse_value("32'hDEADBEEF"), (Vector(0xDEADBEEF, 32),))
+        self.assertEqual(msimunitgen.parse_value("4'b1"), (Vector(1, 4),))
+        self.assertEqual(msimunitgen.parse_value("8'h0F"), (Vector(15, 8),))
+        self.assertEqual(msimunitgen.parse_value("12'o7_7_7"), (Vector(0o777, 12),))
+        self.assertEqual(msimunitgen.parse_value("8'D255"), (Vector(255, 8),))
+        self.assertEqual(msimunitgen.parse_value("256'h" + 'F' * 64), (Vector((1 << 256) - 1, 256),))
+        self.assertEqual(msimunitgen.parse_value("2'b10 01 1'h1"), (Vector(2, 2), Vector(1, 2), Vector(1, 1)))
+
+    def test_literals_which_do_not_fit(self):
+        for literal in ("4'h1F", "8'd256", "1'b10", "0'h0"):
+            with self.assertRaises(msimunitgen.GenerationError) as raised:
+                msimunitgen.parse_value(literal)
+            self.assertIn('does not fit in', str(raised.exception))
+
+    def test_invalid_digits(self):
+        for literal in ("8'b102", "8'o9", "8'dA"):
+            with self.assertRaises(msimunitgen.GenerationError) as raised:
+                msimunitgen.parse_value(literal)
+            self.assertIn('invalid digits', str(raised.exception))
+        self.assertRejected("A[3:0] = 4'hG", 'values must be binary digits, or sized literals')
+
+    def test_values_wider_or_narrower_than_their_variables(self):
+        self.assertRejected("A[3:0] = 8'h0F", 'wrong amount of values passed to assignment')
+        self.assertRejected("A[7:0] = 4'hF", 'wrong amount of values passed to assignment')
+        self.assertRejected("assert A[3:0] == 5'h0F", 'wrong amount of values passed to assert')
+        self.assertRejected('A[3:0] = bin(20, 4)', 'overflow from the bin() function')
+
+    def test_vectors(self):
+        self.assertEqual(msimunitgen.vector_bits(Vector(1, 4)), '0001')
+        self.assertEqual(msimunitgen.vector_bits(Vector(0, 1)), '0')
+        self.assertEqual(msimunitgen.vector_literal(Vector(31, 5)), "5'h1F")
+        self.assertEqual(msimunitgen.vector_literal(Vector(1, 9)), "9'h001")
+        self.assertEqual(msimunitgen.vector_literal(Vector(0xDEADBEEF, 32)), "32'hDEADBEEF")
+        self.assertEqual([msimunitgen.vector_bit(Vector(0b100, 3), k) for k in range(3)], [Vector(1, 1), Vector(0, 1), Vector(0, 1)])
+        self.assertEqual(msimunitgen.evaluate_value(msimunitgen.parse_value("bin(5, 3)2'b01"), {}), Vector(0b10101, 5))
+
+
+class LiteralVerdictTest(GeneratorTestCase):
+
+    def test_same_verdicts_with_every_backend(self):
+        source = ("test t {\n    A[4:0] = 5'b10101;\n    B[8:0] = 9'h1_0F;\n    run 1ns;\n"
+                  "    assert A[4:0] == 5'h15;\n    assert A[4:0] == 5'h1F;\n    assert B[8:0] == 9'o417;\n    assert B[8:0] == 9'd15;\n}\n")
+        blocks, failures = self.verdicts(source)
+        self.assertEqual([(failure.expected, failure.actual) for failure in failures], [(0x1F, 0x15), (15, 0x10F)])
+        for options in ({'bus': '1'}, {'compact': '1'}, {'manifest': '1'}, {'backend': 'sv'}, {'bus': '1', 'backend': 'sv'}):
+            self.assertEqual(self.verdicts(source, options), (blocks, failures), options)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Tests of manifests of expected values, which the checker matches with the
+examined values of the transcript in order.
+"""
+
+import unittest
+
+import msimunitgen
+from tests.support import META, GeneratorTestCase
+
+SOURCE = '''test t {
+    A[3:0] = 1010;
+    run 2ns;
+    echo [examine {A[3:0]}];
+    assert A[3:0] == 1010;
+    assert A[1] == 0;
+    for i in [0:3] {
+        B[1:0] = bin(i, 2);
+        assert B[1:0] == 01;
+    }
+}
+'''
+
+
+class ManifestTest(GeneratorTestCase):
+
+    def test_same_verdicts_as_echoed_assertions(self):
+        checker, failures, blocks = self.simulate(SOURCE)
+        self.assertEqual((checker.num_tests, checker.num_failed), (6, 4))
+        self.assertSameVerdicts(SOURCE, {}, {'manifest': '1'})
+
+    def test_examine_statements_are_rejected(self):
+        source = 'test t {\n    A = 1;\n    examine {A};\n    assert A == 1;\n}\n'
+        defaults = {'genfile': self.path('out.do'), 'logfile': self.path('out.log')}
+        for options in ({'manifest': '1'}, {'manifest': '1', 'compact': '1'}):
+            result = msimunitgen.compile(META + source, options, defaults)
+            self.assertFalse(result.success)
+            self.assertIn('examine statements', result.messages[0])
+        self.compile(source)
+
+
+if __name__ == '__main__':
+    unittest.main()
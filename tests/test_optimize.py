@@ -0,0 +1,35 @@
+"""
+Tests of optimized .do files, which must simulate to the same verdicts as the
+.do files written without optimize.
+"""
+
+import unittest
+
+from tests.support import GeneratorTestCase
+
+OPTIMIZE = {'optimize': '1'}
+
+
+class OptimizeTest(GeneratorTestCase):
+
+    def test_redundant_forces_around_runs(self):
+        self.assertSameVerdicts('test t {\n    A = 1;\n    B = 0;\n    assert C == 1;\n    run 10ns;\n    A = 1;\n'
+                                '    run 5ns;\n    run 5ns;\n    B = 0;\n    assert A == 1;\n    assert C == 0;\n'
+                                '    B = 1;\n    assert B == 0;\n}\n', {}, OPTIMIZE)
+
+    def test_raw_statements_force_again(self):
+        self.assertSameVerdicts('test t {\n    A = 1;\n    assert A == 1;\n    restart -f;\n    A = 1;\n    assert A == 1;\n'
+                                '    echo "again";\n    A = 1;\n    assert A == 0;\n}\n', {}, OPTIMIZE)
+        self.assertSameVerdicts('test t {\n    permute gray {\n        A[1:0] = *;\n        assert A[1] == 1;\n'
+                                '        restart -f;\n    }\n}\n', {}, OPTIMIZE)
+
+    def test_bus_slices(self):
+        source = ('test t {\n    A[3:0] = 0101;\n    assert A[3:0] == 0101;\n    A[1:0] = 01;\n    assert A[3:0] == 0100;\n'
+                  '    A[3:0] = 0101;\n    A[2] = 1;\n    assert A[3:2] == 10;\n    restart -f;\n    A[3:0] = 0101;\n'
+                  '    assert A[3:0] == 0101;\n}\n')
+        self.assertSameVerdicts(source, {}, OPTIMIZE)
+        self.assertSameVerdicts(source, {'bus': '1'}, OPTIMIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
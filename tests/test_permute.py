@@ -0,0 +1,37 @@
+"""
+Tests of permute blocks and the orders in which they go through the permutations.
+"""
+
+import unittest
+
+from tests.support import GeneratorTestCase
+
+
+class GrayPermuteTest(GeneratorTestCase):
+
+    def forces(self, source):
+        self.compile(source)
+        return [line for line in self.read('out.do').splitlines() if line.startswith('force ')]
+
+    def test_run_and_echo_keep_forces(self):
+        forces = self.forces('test t {\n    permute gray {\n        A[3:0] = *;\n        B = 1;\n        run 2ns;\n'
+                             '        echo checking;\n        assert C == 0;\n    }\n}\n')
+        # Every variable once, then one changed variable for each of the other 15 permutations
+        self.assertEqual(len(forces), 5 + 15)
+
+    def test_other_statements_force_again(self):
+        forces = self.forces('test t {\n    permute gray {\n        A[1:0] = *;\n        B = 1;\n        restart;\n'
+                             '        assert C == 0;\n    }\n}\n')
+        self.assertEqual(len(forces), 3 * 4)
+
+    def test_same_verdicts_as_binary_order(self):
+        source = 'test t {\n    permute MODE {\n        A[2:0] = *;\n        run 1ns;\n        assert A[2:0] == 101;\n    }\n}\n'
+        binary, binary_failures, binary_blocks = self.simulate(source.replace('MODE ', ''))
+        gray, gray_failures, gray_blocks = self.simulate(source.replace('MODE', 'gray'))
+        self.assertEqual(gray_blocks, binary_blocks)
+        self.assertEqual(sorted(failure.actual for failure in gray_failures),
+                         sorted(failure.actual for failure in binary_failures))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests of the JSON lines and JUnit XML reports of msim_results.py.
+"""
+
+import json
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+import msim_results
+import msim_unittest
+from tests.support import GeneratorTestCase
+
+SOURCE = ('test passing {\n    run 2ns;\n    assert B == 0;\n    run 3ns;\n    assert B == 0;\n}\n'
+          'test failing {\n    A[1:0] = 10;\n    run 4ns;\n    assert A[1:0] == 01;\n    run 1ns;\n    assert B == 1;\n'
+          '    assert A[1:0] == 10;\n}\n')
+
+# Characters which JSON and XML have to escape
+SPECIAL = '<&"\'>\t\\é'
+
+
+class ResultsTest(GeneratorTestCase):
+
+    def write(self, transcripts):
+        """
+        Pass the (transcript, checker, failures, blocks) results to both
+        writers, returning the JSON records and the JUnit XML root.
+        """
+        writers = msim_results.open_writers(self.path('results.json'), self.path('results.xml'))
+        for transcript, checker, failures, blocks in transcripts:
+            for writer in writers:
+                for failure in failures:
+                    writer.failure(transcript, failure)
+                for block in blocks:
+                    writer.test(transcript, block)
+                writer.transcript(transcript, checker)
+        for writer in writers:
+            writer.close()
+        with open(self.path('results.json'), 'r') as file:
+            records = [json.loads(line) for line in file]
+        return records, ElementTree.parse(self.path('results.xml')).getroot()
+
+    def test_simulated_results(self):
+        for options in ({}, {'manifest': '1'}, {'backend': 'sv'}):
+            checker, failures, blocks = self.simulate(SOURCE, options)
+            records, root = self.write([('out.log', checker, failures, blocks)])
+
+            self.assertEqual([record['type'] for record in records], ['failure', 'failure', 'test', 'test', 'transcript'])
+            self.assertEqual([(record['test'], record['expected'], record['actual'], record['time_ns']) for record in records[:2]],
+                             [('failing', '01', '10', 21.0), ('failing', '1', '0', 26.0)])
+            self.assertEqual([(record['test'], record['passed'], record['failed'], record['end_ns'] - record['start_ns'])
+                              for record in records[2:4]], [('passing', 2, 0, 13.0), ('failing', 1, 2, 17.0)])
+            self.assertEqual((records[4]['tests'], records[4]['failed'], records[4]['time_ns']), (5, 2, 30.0))
+
+            self.assertEqual((root.get('tests'), root.get('failures')), ('2', '1'))
+            suite, = root
+            self.assertEqual((suite.get('name'), suite.get('tests'), suite.get('failures'), suite.get('time')),
+                             ('out.log', '2', '1', '0.00000003'))
+            cases = dict((case.get('name'), case) for case in suite)
+            self.assertEqual(sorted(cases), ['failing', 'passing'])
+            self.assertEqual((cases['passing'].get('assertions'), cases['passing'].get('time'), list(cases['passing'])),
+                             ('2', '0.000000013', []))
+            failure, = cases['failing']
+            self.assertEqual((cases['failing'].get('assertions'), cases['failing'].get('time')), ('3', '0.000000017'))
+            self.assertEqual(failure.get('message'), '2 of 3 assertions failed')
+            self.assertEqual(len(failure.text.splitlines()), 2)
+            self.assertIn('Expected 01, Actual: 10', failure.text)
+
+    def test_blocks_of_the_same_name_are_added_up(self):
+        checker = msim_unittest.TranscriptChecker()
+        checker.num_tests, checker.num_failed = 4, 1
+        blocks = [msim_unittest.TestBlock('t', 2, 0, 0, 5), msim_unittest.TestBlock('u', 1, 0, 5, 6),
+                  msim_unittest.TestBlock('t', 2, 1, 6, 9)]
+        records, root = self.write([('a.log', checker, [msim_unittest.Failure('t', 7, '1', '0', 8)], blocks)])
+        self.assertEqual(len([record for record in records if record['type'] == 'test']), 3)
+        self.assertEqual([(case.get('name'), case.get('assertions'), len(case)) for case in root.find('testsuite')],
+                         [('t', '4', 1), ('u', '1', 0)])
+
+    def test_special_characters(self):
+        checker = msim_unittest.TranscriptChecker()
+        checker.num_tests = checker.num_failed = 1
+        transcript = 'out' + SPECIAL + '.log'
+        failure = msim_unittest.Failure('t' + SPECIAL, 3, '1' + SPECIAL, SPECIAL, 0)
+        records, root = self.write([(transcript, checker, [failure], [msim_unittest.TestBlock(failure.test, 1, 1, 0, 0)])])
+
+        self.assertEqual([(record['transcript'], record['test']) for record in records[:2]], [(transcript, failure.test)] * 2)
+        self.assertEqual(records[2]['transcript'], transcript)
+        self.assertEqual((records[0]['expected'], records[0]['actual']), (failure.expected, failure.actual))
+        suite = root.find('testsuite')
+        case = suite.find('testcase')
+        self.assertEqual((suite.get('name'), case.get('name'), case.get('classname')), (transcript, failure.test, 'out' + SPECIAL))
+        self.assertEqual(case.find('failure').text, 'Line 3 at 0ns: Expected {0:s}, Actual: {1:s}'.format(failure.expected, failure.actual))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests of msim_runner.py, which simulates the shards of a unit test file with
+benchmarks/stub_vsim.py and merges their results.
+"""
+
+import contextlib
+import io
+import os
+import shlex
+import sys
+import unittest
+
+import msim_runner
+import msimunitgen
+from tests.support import GeneratorTestCase
+
+SIMULATOR = '{0:s} {1:s} {{dofile}}'.format(
+    shlex.quote(sys.executable), shlex.quote(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks', 'stub_vsim.py')))
+
+# Test blocks of 1 to 32 assertions, of which only the assertion of A = 1 passes
+SOURCE = ''.join('test t{0:d} {{\n    permute {{\n        A[{1:d}:0] = *;\n        run 1ns;\n        assert A[{1:d}:0] == {2:s};\n    }}\n}}\n'.format(
+    i, bits - 1, '0' * (bits - 1) + '1') for i, bits in enumerate((5, 1, 3, 4, 2, 3, 1)))
+
+
+class ResultsWriter(object):
+    """
+    Collects the results which run_shards passes to the writers of msim_results.
+    """
+
+    def __init__(self):
+        self.failures = []
+        self.blocks = {}
+
+    def failure(self, transcript, failure):
+        self.failures.append(failure)
+
+    def test(self, transcript, block):
+        self.blocks.setdefault(transcript, []).append(block)
+
+    def transcript(self, transcript, checker):
+        pass
+
+
+class RunnerTest(GeneratorTestCase):
+
+    def run_shards(self, options):
+        result = self.compile(SOURCE, dict(options, shards='3'))
+        writer = ResultsWriter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            checker, succeeded = msim_runner.run_shards(result.files, SIMULATOR, jobs=3, manifest=options.get('manifest') == '1',
+                                                        writers=[writer])
+        self.assertTrue(succeeded)
+        return checker, writer
+
+    def test_merged_verdicts(self):
+        for options in ({}, {'manifest': '1'}, {'backend': 'sv'}):
+            checker, writer = self.run_shards(options)
+            blocks, failures = self.verdicts(SOURCE, options)
+            self.assertEqual(len(writer.blocks), 3)
+            self.assertEqual(sorted((block.test, block.tests, block.failed, block.end - block.start)
+                                    for shard in writer.blocks.values() for block in shard),
+                             sorted((block.test, block.tests, block.failed, block.end - block.start) for block in blocks))
+            self.assertEqual(sorted((failure.test, int(failure.expected, 2), int(failure.actual, 2)) for failure in writer.failures),
+                             sorted((failure.test, failure.expected, failure.actual) for failure in failures))
+            self.assertEqual((checker.num_tests, checker.num_failed), (sum(block.tests for block in blocks), len(failures)))
+
+    def test_shards_are_balanced(self):
+        checker, writer = self.run_shards({})
+        settings = msimunitgen.Settings()
+        metablock, tests = msimunitgen.parse(msimunitgen.tokenize(SOURCE.splitlines()))
+        shards = msimunitgen.shard_tests(tests, 3, settings)
+        self.assertEqual([[block.test for block in writer.blocks[self.path('out_{0:d}.log'.format(i))]] for i in range(3)],
+                         [[test.name for test in shard] for shard in shards])
+        # The largest block is a shard of its own, the others share the rest
+        self.assertEqual(sorted(sum(block.tests for block in shard) for shard in writer.blocks.values())[-1], 32)
+
+    def test_shard_tests(self):
+        settings = msimunitgen.Settings()
+        metablock, tests = msimunitgen.parse(msimunitgen.tokenize(SOURCE.splitlines()))
+        shards = msimunitgen.shard_tests(tests, 3, settings)
+        self.assertEqual(sorted(test.name for shard in shards for test in shard), sorted(test.name for test in tests))
+        loads = [sum(msimunitgen.estimate_test(test, settings) for test in shard) for shard in shards]
+        for shard, load in zip(shards, loads):
+            self.assertEqual(shard, sorted(shard, key=tests.index))
+            # Without its smallest block, no shard is more loaded than the least loaded one
+            if len(shard) > 1:
+                self.assertLessEqual(load - min(msimunitgen.estimate_test(test, settings) for test in shard), min(loads))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+"""
+Tests of splitting unit test files into statements, and of their comments.
+"""
+
+import unittest
+
+import msimunitgen
+from tests.support import GeneratorTestCase
+
+
+class TokenizeTest(GeneratorTestCase):
+
+    def statements(self, source):
+        return [token.text for token in msimunitgen.tokenize(source.splitlines(True)) if token.kind == 'stmt']
+
+    def test_hash_inside_a_string(self):
+        source = 'test t {\n    echo "value #1 here";\n    A = 1;\n}\n'
+        self.assertEqual(self.statements(source), ['echo "value #1 here"', 'A = 1'])
+        self.compile(source)
+        self.assertIn('echo "value #1 here"\nforce {A} 1\n', self.read('out.do'))
+
+    def test_comments(self):
+        source = '# the first test\ntest t {\n    A = 1; # force A (and B)\n    B = 0;    # assert #2\n    # C = 1;\n}\n'
+        self.assertEqual(self.statements(source), ['A = 1', 'B = 0'])
+        self.assertTrue(msimunitgen.check_bracket_pairing(source.splitlines(True), report=self.fail))
+
+    def test_hash_inside_a_statement(self):
+        self.assertEqual(self.statements('test t {\n    echo value#1;\n    echo {#2};\n}\n'), ['echo value#1', 'echo {#2}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of watching a unit test file and compiling it again whenever it changes.
+"""
+
+import unittest
+
+import msimunitgen
+from tests.support import META, GeneratorTestCase
+
+
+class Stop(Exception):
+    pass
+
+
+class WatchFileTest(GeneratorTestCase):
+
+    def test_unreadable_file_is_reported(self):
+        filename = self.path('watched.txt')
+        messages = []
+
+        def report(message):
+            messages.append(message)
+            if 'File generation failed' in message:
+                with open(filename, 'w') as file:
+                    file.write(META.replace('}', '    genfile = ' + self.path('watched.do') + ';\n}')
+                               + 'test t {\n    A = 1;\n    assert B == 1;\n}\n')
+            elif 'generated' in message:
+                raise Stop()
+
+        with self.assertRaises(Stop):
+            msimunitgen.watch_file(filename, poll=0, report=report)
+        self.assertIn('No such file or directory', messages[0])
+        self.assertIn('generated 1 of 1 test blocks', messages[-1])
+        self.assertIn('force {A} 1', self.read('watched.do'))
+
+    def test_blocks_larger_than_the_cache_are_streamed(self):
+        source = ('test small {\n    A = 1;\n    assert B == 1;\n}\n'
+                  'test wide {\n    permute {\n        A[13:0] = *;\n        assert B == 1;\n    }\n}\n')
+        blocks = msimunitgen.BlockCache()
+        for i in range(2):
+            result = msimunitgen.compile(META.replace('}', '    cache_size = 1;\n}') + source, {'manifest': '1'},
+                                         {'genfile': self.path('out.do'), 'logfile': self.path('out.log')}, blocks=blocks)
+            self.assertTrue(result.success, result.messages)
+            self.assertEqual(blocks.built, 2 - i)
+            self.assertEqual([test for test, records in blocks.values()], ['force {A} 1\nrun 4ns\nexamine {B}\n'])
+        self.assertEqual(self.read('out.do').count('examine'), 1 + (1 << 14))
+
+
+if __name__ == '__main__':
+    unittest.main()